@@ -0,0 +1,372 @@
+"""
+Camada de atuação serial para o Arduino do Detector de Sonolência.
+
+Protocolo (ver sketch_nov29a.ino):
+- 'A' = olhos abertos (seguro), 'F' = olhos fechados (alarme), 'H' = heartbeat,
+  'D' = desarmar (encerramento normal: volta ao estado seguro e desliga o fail-safe)
+- O Arduino responde cada comando com o mesmo caractere em minúsculo ('a', 'f', 'h', 'd'),
+  o que permite medir a latência de ida e volta da atuação
+- Depois do primeiro 'A'/'F', se o Arduino ficar sem receber nada por muito tempo, entra
+  em alarme (fail-safe). O heartbeat só é enviado enquanto a detecção está produzindo
+  decisões (ver registrar_atividade): se a visão travar, o fail-safe dispara
+- No fim do setup() o Arduino manda 'R' (pronto): ao conectar, o atuador espera esse sinal
+  em vez de dormir um tempo fixo pelo reset da placa
+
+Os comandos só são enviados quando o estado muda (mais o heartbeat periódico), e a
+escrita acontece em uma thread própria: a thread de visão nunca bloqueia na serial.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from instrumentacao import REGISTRO
+
+COMANDOS_VALIDOS = ('A', 'F')
+COMANDO_HEARTBEAT = 'H'
+COMANDO_DESARMAR = 'D'
+SINAL_PRONTO = 'R'
+
+# Intervalo (em segundos) entre heartbeats de sondagem enquanto espera a placa ficar pronta
+# (placas que não reiniciam ao abrir a porta respondem ao heartbeat em vez de mandar 'R')
+INTERVALO_SONDAGEM = 0.25
+
+# Métricas da serial (expostas no endpoint /metrics do detector)
+_TEMPO_ESCRITA = REGISTRO.histograma('serial_escrita_segundos', 'Tempo de cada escrita na porta serial')
+_IDA_VOLTA = REGISTRO.histograma('serial_ida_volta_segundos', 'Tempo entre o envio de um comando e o ack do Arduino')
+_LATENCIA_ATUACAO = REGISTRO.histograma(
+    'serial_latencia_atuacao_segundos',
+    'Tempo entre o quadro que pediu a mudança de estado e a escrita do comando na serial',
+    rotulos=('comando',))
+_FALHAS_ESCRITA = REGISTRO.contador('serial_falhas_total', 'Falhas de escrita na serial (cada uma gera reconexão)')
+_CONEXOES = REGISTRO.contador('serial_conexoes_total', 'Conexões (e reconexões) com o Arduino')
+_HEARTBEATS_SUSPENSOS = REGISTRO.contador('serial_heartbeats_suspensos_total',
+                                          'Vezes que o heartbeat parou por falta de decisões da detecção')
+
+
+class AtuadorSerial:
+    """
+    Envia o estado do alerta ao Arduino por uma thread dedicada, com heartbeat e
+    reconexão automática.
+    """
+
+    def __init__(self, porta, baud_rate=9600, intervalo_heartbeat=1.0, intervalo_reconexao=2.0,
+                 espera_reset=2.0, abrir_porta=None, validade_atividade=1.5):
+        """
+        Args:
+            porta: Porta serial do Arduino (ex: 'COM6', '/dev/ttyUSB0' ou o lado escravo de um pty)
+            baud_rate: Velocidade da serial (deve ser a mesma do sketch)
+            intervalo_heartbeat: Intervalo (em segundos) entre heartbeats sem mudança de estado
+            intervalo_reconexao: Espera (em segundos) entre tentativas de reconexão
+            espera_reset: Tempo máximo (em segundos) esperando o Arduino ficar pronto depois
+                de abrir a porta (normalmente ele avisa bem antes, ver SINAL_PRONTO)
+            abrir_porta: Função sem argumentos que retorna a porta aberta
+                (por padrão usa serial.Serial; útil para testar com pty/loopback)
+            validade_atividade: Segundos sem decisão da detecção depois dos quais o heartbeat
+                para (o Arduino entra em fail-safe ~3s depois do último)
+        """
+        self.porta = porta
+        self.baud_rate = baud_rate
+        self.intervalo_heartbeat = intervalo_heartbeat
+        self.intervalo_reconexao = intervalo_reconexao
+        self.espera_reset = espera_reset
+        self.validade_atividade = validade_atividade
+        self._abrir_porta = abrir_porta or self._abrir_porta_serial
+
+        self._serial = None
+        self._estado_desejado = None  # Último estado pedido pela detecção
+        self._estado_enviado = None  # Último estado escrito com sucesso na porta
+        self._tempo_origem = None  # Momento (time.time) do quadro que pediu o estado desejado
+        self._ultima_atividade = None  # time.monotonic() da última decisão da detecção
+        self._heartbeat_suspenso = False
+        self._condicao = threading.Condition()
+        self._parar = threading.Event()
+        self._thread_escrita = None
+        self._thread_leitura = None
+        self._conectado = threading.Event()
+
+        # Envios aguardando ack: (caractere, instante_envio)
+        self._aguardando_ack = deque(maxlen=64)
+
+        # Estatísticas
+        self.comandos_enviados = 0
+        self.heartbeats_enviados = 0
+        self.conexoes = 0
+        self.tempo_ate_pronto = None  # Segundos entre abrir a porta e a placa ficar pronta (última conexão)
+        self._avisou_falha = False
+        self.latencias_ack = deque(maxlen=1000)
+
+    def _abrir_porta_serial(self):
+        import serial
+        return serial.Serial(self.porta, self.baud_rate, timeout=0.1, write_timeout=1)
+
+    @property
+    def conectado(self):
+        return self._serial is not None
+
+    def aguardar_conexao(self, timeout=None):
+        """Espera a placa estar conectada e pronta. Retorna False se o timeout expirou ou o atuador foi fechado."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while not self._conectado.wait(0.1):
+            if self._parar.is_set() or (limite is not None and time.monotonic() >= limite):
+                return False
+        return True
+
+    def iniciar(self):
+        """Inicia as threads de escrita e de leitura de acks."""
+        self._thread_escrita = threading.Thread(target=self._loop_escrita, name="serial-escrita", daemon=True)
+        self._thread_leitura = threading.Thread(target=self._loop_leitura, name="serial-leitura", daemon=True)
+        self._thread_escrita.start()
+        self._thread_leitura.start()
+
+    def definir_estado(self, comando, tempo_origem=None):
+        """
+        Informa o estado atual do alerta ('A' ou 'F'). Não bloqueia.
+        Só gera escrita na serial se o estado for diferente do último pedido.
+
+        Args:
+            comando: 'A' ou 'F'
+            tempo_origem: time.time() do quadro que gerou o comando, para medir a latência de atuação
+        """
+        if comando not in COMANDOS_VALIDOS:
+            raise ValueError(f"Comando inválido para o Arduino: {comando!r}")
+        self._ultima_atividade = time.monotonic()
+        if comando == self._estado_desejado:
+            return
+        with self._condicao:
+            self._estado_desejado = comando
+            self._tempo_origem = tempo_origem
+            self._condicao.notify()
+
+    def registrar_atividade(self):
+        """
+        Informa que a detecção processou um quadro sem decidir um estado (ex: sem rosto).
+        Mantém o heartbeat vivo; definir_estado já conta como atividade. Não bloqueia.
+        """
+        self._ultima_atividade = time.monotonic()
+
+    def _atividade_recente(self):
+        ultima = self._ultima_atividade
+        recente = ultima is not None and time.monotonic() - ultima <= self.validade_atividade
+        if not recente and ultima is not None and not self._heartbeat_suspenso:
+            print("⚠ Detecção sem decisões recentes: heartbeat suspenso (o Arduino vai entrar em fail-safe)")
+            _HEARTBEATS_SUSPENSOS.inc()
+        self._heartbeat_suspenso = not recente and ultima is not None
+        return recente
+
+    def _loop_escrita(self):
+        ultimo_envio = 0.0
+        while not self._parar.is_set():
+            if self._serial is None and not self._conectar():
+                self._parar.wait(self.intervalo_reconexao)
+                continue
+
+            with self._condicao:
+                tempo_ate_heartbeat = self.intervalo_heartbeat - (time.monotonic() - ultimo_envio)
+                if self._estado_desejado == self._estado_enviado:
+                    if tempo_ate_heartbeat > 0:
+                        self._condicao.wait(tempo_ate_heartbeat)
+                    elif not self._atividade_recente():
+                        # Sem decisões (detecção travada ou ainda iniciando): nada de heartbeat
+                        self._condicao.wait(0.1)
+                estado = self._estado_desejado
+                tempo_origem = self._tempo_origem
+
+            if self._parar.is_set():
+                break
+
+            if estado is not None and estado != self._estado_enviado:
+                caractere = estado
+            elif time.monotonic() - ultimo_envio >= self.intervalo_heartbeat and self._atividade_recente():
+                caractere = COMANDO_HEARTBEAT
+            else:
+                continue
+
+            if self._escrever(caractere):
+                ultimo_envio = time.monotonic()
+                if caractere == COMANDO_HEARTBEAT:
+                    self.heartbeats_enviados += 1
+                else:
+                    self._estado_enviado = caractere
+                    self.comandos_enviados += 1
+                    if tempo_origem is not None:
+                        _LATENCIA_ATUACAO.observar(time.time() - tempo_origem, comando=caractere)
+
+    def _conectar(self):
+        try:
+            porta = self._abrir_porta()
+        except Exception as e:
+            # Avisa só uma vez por queda, para não poluir o console a cada tentativa
+            if not self._avisou_falha:
+                print(f"ERRO: Arduino não encontrado na porta {self.porta} ({e}). Tentando reconectar...")
+                self._avisou_falha = True
+            return False
+
+        # Abrir a porta reinicia o Arduino; espera ele avisar que está pronto
+        inicio = time.monotonic()
+        try:
+            pronta = self._aguardar_placa_pronta(porta)
+        except Exception as e:
+            print(f"ERRO ao esperar o Arduino ficar pronto: {e}")
+            pronta = None
+        if pronta is None or self._parar.is_set():
+            porta.close()
+            return False
+        self.tempo_ate_pronto = time.monotonic() - inicio
+        if not pronta:
+            print(f"⚠ Arduino não confirmou que está pronto em {self.espera_reset:.1f}s; seguindo mesmo assim")
+
+        self._serial = porta
+        self._estado_enviado = None  # Após (re)conectar, o estado atual precisa ser reenviado
+        self._aguardando_ack.clear()
+        self.conexoes += 1
+        _CONEXOES.inc()
+        self._avisou_falha = False
+        self._conectado.set()
+        print(f"Conectado ao Arduino na porta {self.porta} (pronto em {self.tempo_ate_pronto:.2f}s)")
+        return True
+
+    def _aguardar_placa_pronta(self, porta):
+        """
+        Lê a porta até o 'R' do setup() ou o ack de um heartbeat de sondagem, por no
+        máximo espera_reset segundos.
+
+        Returns:
+            True se a placa respondeu, False se o tempo acabou
+        """
+        limite = time.monotonic() + self.espera_reset
+        proxima_sondagem = time.monotonic() + INTERVALO_SONDAGEM
+        while not self._parar.is_set() and time.monotonic() < limite:
+            if time.monotonic() >= proxima_sondagem:
+                porta.write(COMANDO_HEARTBEAT.encode())
+                proxima_sondagem += INTERVALO_SONDAGEM
+            dados = porta.read(1)  # Volta sozinho depois do timeout da porta
+            if dados in (SINAL_PRONTO.encode(), COMANDO_HEARTBEAT.lower().encode()):
+                return True
+        return False
+
+    def _escrever(self, caractere):
+        porta = self._serial
+        try:
+            inicio = time.perf_counter()
+            self._aguardando_ack.append((caractere.lower(), inicio))
+            porta.write(caractere.encode())
+            _TEMPO_ESCRITA.observar(time.perf_counter() - inicio)
+            return True
+        except Exception as e:
+            _FALHAS_ESCRITA.inc()
+            print(f"ERRO na comunicação com o Arduino: {e}. Reconectando...")
+            self._desconectar()
+            return False
+
+    def _loop_leitura(self):
+        while not self._parar.is_set():
+            porta = self._serial
+            if porta is None:
+                self._parar.wait(0.1)
+                continue
+            try:
+                dados = porta.read(1)
+            except Exception:
+                # A thread de escrita cuida da reconexão
+                self._parar.wait(0.1)
+                continue
+            if dados:
+                self._registrar_ack(dados.decode(errors='ignore'))
+
+    def _registrar_ack(self, caractere):
+        if caractere == SINAL_PRONTO:
+            # A placa reiniciou sozinha (queda de tensão, watchdog): reenvia o estado atual
+            print("⚠ Arduino reiniciou; reenviando o estado atual")
+            with self._condicao:
+                self._estado_enviado = None
+                self._condicao.notify()
+            return
+        agora = time.perf_counter()
+        while self._aguardando_ack:
+            esperado, instante_envio = self._aguardando_ack.popleft()
+            if esperado == caractere:
+                self.latencias_ack.append(agora - instante_envio)
+                _IDA_VOLTA.observar(agora - instante_envio)
+                return
+
+    def _desconectar(self):
+        porta = self._serial
+        self._serial = None
+        self._conectado.clear()
+        if porta is not None:
+            try:
+                porta.close()
+            except Exception:
+                pass
+
+    def close(self, desarmar=True):
+        """
+        Para as threads e fecha a porta (mesmo nome do serial.Serial).
+
+        Args:
+            desarmar: Manda 'D' antes de fechar, para o Arduino voltar ao estado seguro em vez
+                de disparar o fail-safe quando os heartbeats pararem (encerramento normal)
+        """
+        self._parar.set()
+        with self._condicao:
+            self._condicao.notify_all()
+        for thread in (self._thread_escrita, self._thread_leitura):
+            if thread is not None:
+                thread.join(timeout=2)
+        if desarmar and self._serial is not None:
+            try:
+                self._serial.write(COMANDO_DESARMAR.encode())
+                self._serial.flush()
+            except Exception as e:
+                print(f"⚠ Não foi possível desarmar o Arduino: {e}")
+        self._desconectar()
+
+    def relatorio(self):
+        """Texto com contagem de envios, reconexões e latência de ida e volta."""
+        if self.latencias_ack:
+            ordenadas = sorted(self.latencias_ack)
+            media = sum(ordenadas) / len(ordenadas)
+            texto_latencia = f"média {media * 1000:.1f}ms | máx {ordenadas[-1] * 1000:.1f}ms"
+        else:
+            texto_latencia = "sem acks"
+        return (
+            f"[Arduino] Comandos: {self.comandos_enviados} | Heartbeats: {self.heartbeats_enviados} | "
+            f"Conexões: {self.conexoes} | Ida e volta: {texto_latencia}"
+        )
+
+
+def _simular_arduino(fd_mestre, parar):
+    """Imita o protocolo do sketch do lado mestre de um pty: avisa que está pronto e responde cada comando com ack."""
+    time.sleep(0.3)  # "Boot" da placa
+    os.write(fd_mestre, SINAL_PRONTO.encode())
+    while not parar.is_set():
+        try:
+            dados = os.read(fd_mestre, 1)
+        except OSError:
+            break
+        if dados in (b'A', b'F', b'H', b'D'):
+            os.write(fd_mestre, dados.lower())
+
+
+if __name__ == "__main__":
+    # Teste sem hardware: um pty faz o papel do Arduino
+    import pty
+    import tty
+
+    fd_mestre, fd_escravo = pty.openpty()
+    tty.setraw(fd_escravo)
+    parar = threading.Event()
+    threading.Thread(target=_simular_arduino, args=(fd_mestre, parar), daemon=True).start()
+
+    atuador = AtuadorSerial(os.ttyname(fd_escravo), intervalo_heartbeat=0.5)
+    atuador.iniciar()
+    atuador.aguardar_conexao(timeout=5)
+    for comando in ['A', 'A', 'F', 'F', 'F', 'A', 'F', 'A']:
+        atuador.definir_estado(comando)
+        time.sleep(0.3)
+    time.sleep(1)
+    print(atuador.relatorio())
+    atuador.close()
+    parar.set()
@@ -0,0 +1,235 @@
+"""
+Backends da malha facial do Detector de Sonolência.
+
+Todos os backends têm a interface do cvzone: findFaceMesh(img, draw=False) -> (img, faces),
+com cada face sendo a lista dos 468 pontos [x, y] (em pixels do quadro) na numeração da
+malha do MediaPipe. Por isso o cálculo do ratio (159/145/33/133 e 386/374/362/263) e o
+resto do detector funcionam igual com qualquer backend.
+
+- 'cvzone' (padrão): FaceMeshDetector do cvzone (MediaPipe completo)
+- 'onnx': modelo de pontos da malha do MediaPipe exportado para ONNX (ex: face_landmark,
+  entrada 192x192), rodando no ONNX Runtime ou no cv2.dnn, com número de threads
+  configurável e opcionalmente quantizado em INT8 (ver quantizar_modelo). O rosto é
+  localizado pelo YuNet (cv2.FaceDetectorYN) só quando necessário: nos outros quadros a
+  região vem dos pontos do quadro anterior, como o MediaPipe faz.
+
+Para comparar velocidade e concordância dos backends no mesmo vídeo:
+    python benchmark.py --comparar-backends cvzone onnx --video gravacoes/cabine01.mp4 \\
+        --modelo-onnx modelos/face_landmark.onnx --detector-rosto modelos/face_detection_yunet.onnx
+
+Para gerar a versão INT8 de um modelo:
+    python backends_deteccao.py --quantizar modelos/face_landmark.onnx
+"""
+
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+BACKEND_CVZONE = 'cvzone'
+BACKEND_ONNX = 'onnx'
+
+MOTOR_ONNXRUNTIME = 'onnxruntime'
+MOTOR_OPENCV = 'opencv'
+
+NUMERO_PONTOS_MALHA = 468
+
+
+class DetectorOnnx:
+    """Malha facial de 468 pontos com um modelo ONNX, no ONNX Runtime ou no cv2.dnn."""
+
+    def __init__(self, caminho_modelo, caminho_detector_rosto, motor=MOTOR_ONNXRUNTIME, threads=1,
+                 limiar_rosto=0.5, escala_regiao=1.5, tamanho_entrada=192):
+        """
+        Args:
+            caminho_modelo: Modelo de pontos da malha (.onnx) com saída de 468 x 3 valores
+                em pixels da entrada e, opcionalmente, a confiança de haver rosto (1 valor)
+            caminho_detector_rosto: Modelo YuNet (.onnx) usado para achar o rosto
+            motor: MOTOR_ONNXRUNTIME ou MOTOR_OPENCV (cv2.dnn)
+            threads: Threads usadas por inferência (no cv2.dnn vale para todo o OpenCV)
+            limiar_rosto: Confiança mínima para manter o rosto (abaixo disso, procura de novo)
+            escala_regiao: Tamanho da região enviada ao modelo em relação ao rosto
+            tamanho_entrada: Lado da entrada do modelo (no ONNX Runtime é lido do próprio modelo)
+        """
+        self.motor = motor
+        self.limiar_rosto = limiar_rosto
+        self.escala_regiao = escala_regiao
+        self.tamanho_entrada = tamanho_entrada
+        self.nchw = False
+
+        if motor == MOTOR_ONNXRUNTIME:
+            import onnxruntime
+
+            opcoes = onnxruntime.SessionOptions()
+            opcoes.intra_op_num_threads = threads
+            opcoes.inter_op_num_threads = 1
+            opcoes.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._sessao = onnxruntime.InferenceSession(caminho_modelo, opcoes,
+                                                        providers=['CPUExecutionProvider'])
+            entrada = self._sessao.get_inputs()[0]
+            self._nome_entrada = entrada.name
+            # (1, 192, 192, 3) no modelo convertido do TFLite; (1, 3, 192, 192) em alguns exports
+            self.nchw = entrada.shape[1] == 3
+            lado = entrada.shape[2] if self.nchw else entrada.shape[1]
+            if isinstance(lado, int):
+                self.tamanho_entrada = lado
+        elif motor == MOTOR_OPENCV:
+            cv2.setNumThreads(threads)
+            self._rede = cv2.dnn.readNetFromONNX(caminho_modelo)
+            self._rede.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self._rede.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            self._saidas = self._rede.getUnconnectedOutLayersNames()
+            self.nchw = True  # cv2.dnn trabalha com blobs NCHW
+        else:
+            raise ValueError(f"Motor desconhecido: {motor!r} (use '{MOTOR_ONNXRUNTIME}' ou '{MOTOR_OPENCV}')")
+
+        self._detector_rosto = cv2.FaceDetectorYN.create(caminho_detector_rosto, "", (320, 320), 0.6)
+        self._tamanho_detector = None
+        self._regiao = None  # (centro_x, centro_y, lado) usada no próximo quadro
+
+        # Estatísticas
+        self.quadros_rastreados = 0
+        self.deteccoes_rosto = 0
+
+        # Aquecimento: a primeira inferência paga a alocação dos buffers do motor
+        self._inferir(np.zeros((self.tamanho_entrada, self.tamanho_entrada, 3), dtype=np.uint8))
+
+    def findFaceMesh(self, img, draw=False):
+        """Mesma interface do cvzone. O parâmetro draw é ignorado (o backend nunca desenha)."""
+        if self._regiao is not None:
+            pontos = self._pontos_na_regiao(img, self._regiao)
+            if pontos is not None:
+                self.quadros_rastreados += 1
+                return img, [pontos]
+
+        self._regiao = self._localizar_rosto(img)
+        if self._regiao is None:
+            return img, []
+        pontos = self._pontos_na_regiao(img, self._regiao)
+        return img, [pontos] if pontos is not None else []
+
+    def reiniciar(self):
+        """Esquece o último rosto: o próximo quadro passa pelo detector de rosto."""
+        self._regiao = None
+
+    def _localizar_rosto(self, img):
+        """Roda o YuNet e devolve a região do rosto mais confiável, ou None."""
+        self.deteccoes_rosto += 1
+        altura, largura = img.shape[:2]
+        if self._tamanho_detector != (largura, altura):
+            self._detector_rosto.setInputSize((largura, altura))
+            self._tamanho_detector = (largura, altura)
+        _, rostos = self._detector_rosto.detect(img)
+        if rostos is None or not len(rostos):
+            return None
+        x, y, w, h = rostos[np.argmax(rostos[:, -1]), :4]
+        return x + w / 2, y + h / 2, max(w, h) * self.escala_regiao
+
+    def _pontos_na_regiao(self, img, regiao):
+        """
+        Roda o modelo na região e atualiza a região para o próximo quadro.
+
+        Returns:
+            Lista de 468 [x, y] em pixels do quadro, ou None se o modelo não vê um rosto
+        """
+        centro_x, centro_y, lado = regiao
+        escala = self.tamanho_entrada / lado
+        # Recorte + redimensionamento numa operação só; partes fora do quadro ficam pretas
+        matriz = np.float32([[escala, 0, self.tamanho_entrada / 2 - centro_x * escala],
+                             [0, escala, self.tamanho_entrada / 2 - centro_y * escala]])
+        recorte = cv2.warpAffine(img, matriz, (self.tamanho_entrada, self.tamanho_entrada))
+
+        pontos, confianca = self._inferir(recorte)
+        if confianca is not None and confianca < self.limiar_rosto:
+            self._regiao = None
+            return None
+
+        # Pixels da entrada -> pixels do quadro
+        pontos = (pontos - self.tamanho_entrada / 2) / escala + (centro_x, centro_y)
+        minimo, maximo = pontos.min(axis=0), pontos.max(axis=0)
+        centro = (minimo + maximo) / 2
+        self._regiao = (centro[0], centro[1], (maximo - minimo).max() * self.escala_regiao)
+        return pontos.astype(np.int32).tolist()
+
+    def _inferir(self, recorte):
+        """Returns: (pontos 468 x 2 em pixels da entrada, confiança de rosto ou None)"""
+        entrada = cv2.cvtColor(recorte, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+        if self.motor == MOTOR_ONNXRUNTIME:
+            entrada = entrada.transpose(2, 0, 1)[None] if self.nchw else entrada[None]
+            saidas = self._sessao.run(None, {self._nome_entrada: entrada})
+        else:
+            self._rede.setInput(entrada.transpose(2, 0, 1)[None])
+            saidas = self._rede.forward(self._saidas)
+
+        pontos = confianca = None
+        for saida in saidas:
+            valores = np.asarray(saida, dtype=np.float32).ravel()
+            if valores.size == NUMERO_PONTOS_MALHA * 3:
+                pontos = valores.reshape(NUMERO_PONTOS_MALHA, 3)[:, :2]
+            elif valores.size == 1:
+                confianca = float(1.0 / (1.0 + np.exp(-valores[0])))  # Saída em logit
+        if pontos is None:
+            raise ValueError(f"O modelo não tem saída com {NUMERO_PONTOS_MALHA} x 3 valores")
+        return pontos, confianca
+
+    def relatorio(self):
+        total = self.quadros_rastreados + self.deteccoes_rosto
+        proporcao = self.quadros_rastreados / total * 100 if total else 0.0
+        return (
+            f"[Backend ONNX/{self.motor}] Quadros pela região anterior: {self.quadros_rastreados} "
+            f"({proporcao:.0f}%) | Detector de rosto: {self.deteccoes_rosto}"
+        )
+
+
+def criar_backend(nome=BACKEND_CVZONE, caminho_modelo=None, caminho_detector_rosto=None,
+                  motor=MOTOR_ONNXRUNTIME, threads=1):
+    """
+    Cria o detector de malha facial do backend escolhido.
+
+    Args:
+        nome: BACKEND_CVZONE ou BACKEND_ONNX
+        caminho_modelo, caminho_detector_rosto, motor, threads: Só para o backend ONNX
+            (ver DetectorOnnx)
+
+    Returns:
+        Objeto com findFaceMesh(img, draw=False) -> (img, faces)
+    """
+    if nome == BACKEND_CVZONE:
+        # Import pesado (carrega o mediapipe)
+        from cvzone.FaceMeshModule import FaceMeshDetector
+        return FaceMeshDetector(maxFaces=1)
+    if nome == BACKEND_ONNX:
+        for caminho in (caminho_modelo, caminho_detector_rosto):
+            if not caminho or not os.path.exists(caminho):
+                raise FileNotFoundError(f"Modelo do backend ONNX não encontrado: {caminho!r}")
+        return DetectorOnnx(caminho_modelo, caminho_detector_rosto, motor=motor, threads=threads)
+    raise ValueError(f"Backend desconhecido: {nome!r} (use '{BACKEND_CVZONE}' ou '{BACKEND_ONNX}')")
+
+
+def quantizar_modelo(caminho_entrada, caminho_saida=None):
+    """
+    Gera a versão INT8 do modelo (pesos quantizados, ativações calculadas na hora).
+    O arquivo fica ~4x menor; confira a concordância com o benchmark de backends.
+
+    Returns:
+        Caminho do modelo quantizado
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    if caminho_saida is None:
+        raiz, extensao = os.path.splitext(caminho_entrada)
+        caminho_saida = f"{raiz}_int8{extensao}"
+    quantize_dynamic(caminho_entrada, caminho_saida, weight_type=QuantType.QInt8)
+    tamanho_antes = os.path.getsize(caminho_entrada) / 1024
+    tamanho_depois = os.path.getsize(caminho_saida) / 1024
+    print(f"✓ Modelo quantizado: {caminho_saida} ({tamanho_antes:.0f}KB -> {tamanho_depois:.0f}KB)")
+    return caminho_saida
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ferramentas dos backends da malha facial.")
+    parser.add_argument('--quantizar', metavar='MODELO', required=True, help="Modelo .onnx a quantizar em INT8")
+    parser.add_argument('--saida', default=None, help="Arquivo de saída (padrão: <modelo>_int8.onnx)")
+    args = parser.parse_args()
+    quantizar_modelo(args.quantizar, args.saida)
@@ -0,0 +1,492 @@
+"""
+Benchmark do pipeline de detecção (sem câmera e sem Arduino).
+
+Fontes de dados:
+- Vídeos gravados (--video): mede todos os estágios, incluindo decodificação e malha facial
+- Malha sintética (--sintetico): gera pontos da malha com piscadas e fechamentos longos,
+  medindo só os estágios depois da inferência (não precisa de OpenCV nem cvzone)
+
+Estágios medidos separadamente: captura/decodificação, findFaceMesh, cálculo do ratio,
+timer de alerta, escrita serial, sobreposições/renderização e envio de notificação.
+
+Com --comparar-backends, os mesmos quadros de vídeo passam por cada backend da malha
+facial (ver backends_deteccao.py): mede o tempo de cada um e compara os ratios e a
+classificação olho aberto/fechado com os do primeiro backend da lista (a referência).
+
+O resultado (vazão, p50/p95/p99 e pico de memória) é gravado em JSON em output/.
+Com um baseline salvo, o benchmark falha (código de saída 1) se algum estágio piorar
+além da tolerância.
+
+Uso:
+    python benchmark.py --sintetico 20000
+    python benchmark.py --video gravacoes/cabine01.mp4 --rastreamento
+    python benchmark.py --sintetico 20000 --salvar-baseline
+    python benchmark.py --video gravacoes/cabine01.mp4 --comparar-backends cvzone onnx \
+        --modelo-onnx modelos/face_landmark_int8.onnx --detector-rosto modelos/face_detection_yunet.onnx
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from atuador_serial import AtuadorSerial
+from deteccao import CORES_ESTADO, calcular_ratios
+from maquina_estados import MaquinaEstadosSonolencia
+from metricas_olhos import CalculadoraEAR
+from notifications import NotificationManager
+from servidores_locais import ServidorSmtpLocal
+
+PASTA_SAIDA = 'output'
+ARQUIVO_BASELINE = 'benchmark_baseline.json'
+TOLERANCIA_PADRAO = 0.25  # 25% de piora permitida antes de acusar regressão
+
+NUMERO_PONTOS_MALHA = 468
+FPS_SINTETICO = 30.0
+RATIO_THRESHOLD = 23  # Mesmo valor do eyes_detector.py (classificação aberto/fechado na comparação)
+
+
+class Cronometro:
+    """Acumula as durações de cada estágio."""
+
+    def __init__(self):
+        self.duracoes = defaultdict(list)
+        self.itens = defaultdict(int)  # Quantos itens (quadros) cada estágio processou
+
+    @contextmanager
+    def medir(self, estagio, itens=1):
+        inicio = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.registrar(estagio, time.perf_counter_ns() - inicio, itens)
+
+    def registrar(self, estagio, duracao_ns, itens=1):
+        """Soma uma duração medida fora do `medir` (ex: um trecho com `break` no meio)."""
+        self.duracoes[estagio].append(duracao_ns)
+        self.itens[estagio] += itens
+
+    def resumo(self):
+        """Estatísticas por estágio, em milissegundos (vazão em itens por segundo)."""
+        estagios = {}
+        for estagio, duracoes in self.duracoes.items():
+            ms = np.asarray(duracoes, dtype=np.float64) / 1e6
+            total_s = ms.sum() / 1000
+            estagios[estagio] = {
+                'amostras': int(ms.size),
+                'media_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'max_ms': float(ms.max()),
+                'vazao_por_s': float(self.itens[estagio] / total_s) if total_s > 0 else None,
+            }
+        return estagios
+
+
+class PortaNula:
+    """Porta serial de mentira: aceita escritas e nunca responde."""
+
+    def write(self, dados):
+        return len(dados)
+
+    def read(self, tamanho=1):
+        time.sleep(0.1)
+        return b''
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def pico_memoria_mb():
+    """Pico de memória residente (RSS) do processo, em MB, ou None se não disponível."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: o módulo resource não existe
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def gerar_ratios_sinteticos(quadros, semente=0):
+    """
+    Sequência de ratios (quadros x 2) com olhos abertos, piscadas curtas e alguns
+    fechamentos longos o suficiente para acionar o alerta.
+    """
+    rng = np.random.default_rng(semente)
+    ratios = rng.normal(32, 2.0, size=(quadros, 2))
+
+    # Piscadas: ~1 a cada 4s, duração de 3-5 quadros
+    for inicio in rng.integers(0, quadros, size=max(1, quadros // int(FPS_SINTETICO * 4))):
+        ratios[inicio:inicio + rng.integers(3, 6)] = rng.normal(12, 1.5, size=2)
+
+    # Fechamentos longos (4s) de tempos em tempos, para exercitar o alerta
+    passo = int(FPS_SINTETICO * 60)
+    for inicio in range(passo // 2, quadros, passo):
+        fim = inicio + int(FPS_SINTETICO * 4)
+        ratios[inicio:fim] = rng.normal(10, 1.5, size=(min(fim, quadros) - inicio, 2))
+
+    return np.clip(ratios, 1, None)
+
+
+def malha_sintetica(ratios, semente=0):
+    """
+    Converte ratios (quadros x 2) em malhas completas (quadros x 468 x 2) cujos pontos dos
+    olhos reproduzem exatamente esses ratios (nas configurações de 2 e de 6 pontos).
+    """
+    rng = np.random.default_rng(semente)
+    quadros = len(ratios)
+    base = rng.uniform(150, 450, size=(1, NUMERO_PONTOS_MALHA, 2)).astype(np.float32)
+    malhas = np.repeat(base, quadros, axis=0)
+
+    largura_olho = 40.0
+    olhos = [
+        # (ratio, centro, canto_a, canto_b, pares verticais)
+        (ratios[:, 0], (280.0, 200.0), 33, 133, [(160, 144), (159, 145), (158, 153)]),
+        (ratios[:, 1], (360.0, 200.0), 362, 263, [(385, 380), (386, 374), (387, 373)]),
+    ]
+    for ratio, (cx, cy), canto_a, canto_b, pares in olhos:
+        malhas[:, canto_a] = (cx - largura_olho / 2, cy)
+        malhas[:, canto_b] = (cx + largura_olho / 2, cy)
+        abertura = ratio / 100 * largura_olho
+        for deslocamento, (cima, baixo) in zip((-8.0, 0.0, 8.0), pares):
+            malhas[:, cima, 0] = cx + deslocamento
+            malhas[:, cima, 1] = cy - abertura / 2
+            malhas[:, baixo, 0] = cx + deslocamento
+            malhas[:, baixo, 1] = cy + abertura / 2
+    return malhas
+
+
+def _mensagem_alerta(ratio_esq, ratio_dir, timer):
+    return (
+        f"⚠️ <b>ALERTA DE SONOLÊNCIA DETECTADA!</b>\n\n"
+        f"👁️ Ratio Olho Esquerdo: {ratio_esq:.1f}\n"
+        f"👁️ Ratio Olho Direito: {ratio_dir:.1f}\n"
+        f"⏱️ Tempo com olhos fechados: {timer.tempo_com_olhos_fechados:.1f}s"
+    )
+
+
+def _decidir_e_atuar(cronometro, face, tempo_s, calculadora, timer, atuador, notificador):
+    """Estágios depois da inferência, iguais aos do detector ao vivo."""
+    with cronometro.medir('ratio'):
+        ratio_esq, ratio_dir = calcular_ratios(face, calculadora)
+    with cronometro.medir('timer'):
+        decisao = timer.processar(ratio_esq, ratio_dir, tempo_s)
+    with cronometro.medir('serial'):
+        atuador.definir_estado(decisao.comando)
+    if decisao.alerta_disparado:
+        with cronometro.medir('notificacao'):
+            notificador.enviar_notificacao(_mensagem_alerta(ratio_esq, ratio_dir, timer))
+    return ratio_esq, ratio_dir, decisao.estado, CORES_ESTADO[decisao.estado], decisao.alerta_disparado
+
+
+def rodar_sintetico(quadros, cronometro, calculadora, timer, atuador, notificador):
+    """Benchmark com malha sintética. Retorna (quadros processados, alertas)."""
+    malhas = malha_sintetica(gerar_ratios_sinteticos(quadros))
+
+    # Cálculo em lote (caminho usado pelo processamento offline)
+    with cronometro.medir('ratio_lote', itens=quadros):
+        calculadora.calcular(malhas)
+
+    alertas = 0
+    for indice in range(quadros):
+        with cronometro.medir('total'):
+            _, _, _, _, alerta_disparado = _decidir_e_atuar(
+                cronometro, malhas[indice], indice / FPS_SINTETICO, calculadora, timer, atuador, notificador)
+        alertas += alerta_disparado
+    return quadros, alertas
+
+
+def rodar_video(caminhos, cronometro, calculadora, timer, atuador, notificador, rastreamento=False,
+                limite_quadros=None):
+    """Benchmark com vídeos gravados. Retorna (quadros processados, alertas)."""
+    import cv2
+    from cvzone.FaceMeshModule import FaceMeshDetector
+
+    from rastreamento_rosto import DetectorRastreado
+
+    if rastreamento:
+        detector = DetectorRastreado(FaceMeshDetector(maxFaces=1), FaceMeshDetector(maxFaces=1))
+    else:
+        detector = FaceMeshDetector(maxFaces=1)
+
+    quadros = 0
+    alertas = 0
+    for caminho in caminhos:
+        cap = cv2.VideoCapture(caminho)
+        fps_video = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        quadro_video = 0
+        while limite_quadros is None or quadros < limite_quadros:
+            inicio_quadro = time.perf_counter_ns()
+            with cronometro.medir('captura'):
+                success, img = cap.read()
+            if not success:
+                break
+
+            with cronometro.medir('findFaceMesh'):
+                _, faces = detector.findFaceMesh(img, draw=False)
+
+            if faces:
+                ratio_esq, ratio_dir, estado, cor, alerta_disparado = _decidir_e_atuar(
+                    cronometro, faces[0], quadro_video / fps_video, calculadora, timer, atuador, notificador)
+                alertas += alerta_disparado
+                with cronometro.medir('render'):
+                    _renderizar_sem_janela(cv2, img, faces[0], ratio_esq, ratio_dir, estado, cor)
+
+            # A leitura que encontra o fim do vídeo não conta no total
+            cronometro.registrar('total', time.perf_counter_ns() - inicio_quadro)
+            quadro_video += 1
+            quadros += 1
+        cap.release()
+    return quadros, alertas
+
+
+def comparar_backends(caminhos, nomes, cronometro, calculadora, opcoes_onnx, limite_quadros=None):
+    """
+    Roda os mesmos quadros em cada backend e compara com o primeiro (a referência).
+
+    Returns:
+        (quadros processados, {backend: concordância com a referência})
+    """
+    import cv2
+
+    from backends_deteccao import criar_backend
+
+    backends = {nome: criar_backend(nome, **opcoes_onnx) for nome in nomes}
+    referencia = nomes[0]
+    estatisticas = {nome: {'com_rosto': 0, 'ambos_com_rosto': 0, 'diferencas': [], 'mesma_classe': 0}
+                    for nome in nomes}
+
+    quadros = 0
+    for caminho in caminhos:
+        cap = cv2.VideoCapture(caminho)
+        while limite_quadros is None or quadros < limite_quadros:
+            success, img = cap.read()
+            if not success:
+                break
+
+            ratios = {}
+            for nome, backend in backends.items():
+                with cronometro.medir(f'malha_{nome}'):
+                    _, faces = backend.findFaceMesh(img, draw=False)
+                if faces:
+                    ratios[nome] = np.asarray(calcular_ratios(faces[0], calculadora))
+                    estatisticas[nome]['com_rosto'] += 1
+
+            if referencia in ratios:
+                fechado_referencia = ratios[referencia] < RATIO_THRESHOLD
+                for nome, ratio in ratios.items():
+                    dados = estatisticas[nome]
+                    dados['ambos_com_rosto'] += 1
+                    dados['diferencas'].extend(np.abs(ratio - ratios[referencia]))
+                    dados['mesma_classe'] += bool(np.all((ratio < RATIO_THRESHOLD) == fechado_referencia))
+            quadros += 1
+        cap.release()
+
+    comparacao = {}
+    for nome, dados in estatisticas.items():
+        diferencas = np.asarray(dados['diferencas'], dtype=np.float64)
+        comparado = dados['ambos_com_rosto']
+        comparacao[nome] = {
+            'rosto_encontrado': dados['com_rosto'] / quadros if quadros else 0.0,
+            'erro_medio_ratio': float(diferencas.mean()) if diferencas.size else None,
+            'erro_p95_ratio': float(np.percentile(diferencas, 95)) if diferencas.size else None,
+            'mesma_classificacao': dados['mesma_classe'] / comparado if comparado else None,
+        }
+    return quadros, comparacao
+
+
+def imprimir_comparacao(comparacao, referencia):
+    print(f"\n{'Backend':<14}{'rosto':>8}{'erro médio':>12}{'erro p95':>10}{'mesma classe':>14}"
+          f"   (referência: {referencia})")
+    def _formatar(valor, formato):
+        return '-' if valor is None else format(valor, formato)
+
+    for nome, dados in comparacao.items():
+        print(f"{nome:<14}{dados['rosto_encontrado']:>8.1%}{_formatar(dados['erro_medio_ratio'], '.2f'):>12}"
+              f"{_formatar(dados['erro_p95_ratio'], '.2f'):>10}"
+              f"{_formatar(dados['mesma_classificacao'], '.1%'):>14}")
+
+
+def _renderizar_sem_janela(cv2, img, face, ratio_esq, ratio_dir, estado, cor):
+    """Mesmo trabalho de desenho do detector (cópia, textos, pontos e resize), sem imshow."""
+    img_limpa = img.copy()
+    cv2.putText(img, f'Ratio Esq: {int(ratio_esq)}', (50, 50), cv2.FONT_HERSHEY_PLAIN, 2, (255, 0, 0), 2)
+    cv2.putText(img, f'Ratio Dir: {int(ratio_dir)}', (50, 90), cv2.FONT_HERSHEY_PLAIN, 2, (255, 0, 0), 2)
+    cv2.putText(img, estado, (50, 130), cv2.FONT_HERSHEY_PLAIN, 2, cor, 2)
+    for ponto in (159, 145, 386, 374):
+        cv2.circle(img, tuple(int(v) for v in face[ponto]), 3, cor, cv2.FILLED)
+    cv2.resize(img, (960, 720))
+    cv2.resize(img_limpa, (960, 720))
+
+
+def comparar_com_baseline(resultado, baseline, tolerancia):
+    """
+    Compara p95 e vazão de cada estágio com o baseline.
+
+    Returns:
+        Lista de textos descrevendo as regressões (vazia se tudo ok)
+    """
+    regressoes = []
+    for estagio, atual in resultado['estagios'].items():
+        anterior = baseline.get('estagios', {}).get(estagio)
+        if not anterior:
+            continue
+        if anterior['p95_ms'] > 0 and atual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regressoes.append(f"{estagio}: p95 {atual['p95_ms']:.3f}ms > baseline {anterior['p95_ms']:.3f}ms")
+        if anterior.get('vazao_por_s') and atual.get('vazao_por_s') is not None:
+            if atual['vazao_por_s'] < anterior['vazao_por_s'] * (1 - tolerancia):
+                regressoes.append(f"{estagio}: vazão {atual['vazao_por_s']:.0f}/s < "
+                                  f"baseline {anterior['vazao_por_s']:.0f}/s")
+
+    pico_anterior = baseline.get('pico_memoria_mb')
+    pico_atual = resultado.get('pico_memoria_mb')
+    if pico_anterior and pico_atual and pico_atual > pico_anterior * (1 + tolerancia):
+        regressoes.append(f"memória: pico {pico_atual:.0f}MB > baseline {pico_anterior:.0f}MB")
+    return regressoes
+
+
+def imprimir_resultado(resultado):
+    print(f"\n{'Estágio':<14}{'amostras':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'vazão/s':>12}")
+    for estagio, dados in resultado['estagios'].items():
+        vazao = f"{dados['vazao_por_s']:.0f}" if dados['vazao_por_s'] else '-'
+        print(f"{estagio:<14}{dados['amostras']:>10}{dados['p50_ms']:>10.3f}{dados['p95_ms']:>10.3f}"
+              f"{dados['p99_ms']:>10.3f}{vazao:>12}")
+    print(f"\nQuadros: {resultado['quadros']} | Alertas: {resultado['alertas']} | "
+          f"Vazão total: {resultado['quadros_por_s']:.1f} quadros/s")
+    if resultado['pico_memoria_mb'] is not None:
+        print(f"Pico de memória (RSS): {resultado['pico_memoria_mb']:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do detector de sonolência.")
+    fonte = parser.add_mutually_exclusive_group(required=True)
+    fonte.add_argument('--video', nargs='+', help="Vídeos gravados a usar como fonte")
+    fonte.add_argument('--sintetico', type=int, metavar='QUADROS', help="Quantidade de quadros sintéticos")
+    parser.add_argument('--limite-quadros', type=int, default=None, help="Máximo de quadros de vídeo")
+    parser.add_argument('--rastreamento', action='store_true', help="Usa o DetectorRastreado (recorte do rosto)")
+    parser.add_argument('--comparar-backends', nargs='+', metavar='BACKEND',
+                        help="Compara backends da malha facial no vídeo (o primeiro é a referência)")
+    parser.add_argument('--modelo-onnx', default='modelos/face_landmark.onnx', help="Modelo do backend onnx")
+    parser.add_argument('--detector-rosto', default='modelos/face_detection_yunet_2023mar.onnx',
+                        help="Modelo YuNet do backend onnx")
+    parser.add_argument('--motor', default='onnxruntime', choices=('onnxruntime', 'opencv'),
+                        help="Motor do backend onnx")
+    parser.add_argument('--threads', type=int, default=1, help="Threads por inferência do backend onnx")
+    parser.add_argument('--metodo', default='dois_pontos', help="Configuração de pontos do ratio")
+    parser.add_argument('--baseline', default=ARQUIVO_BASELINE, help="Arquivo de baseline para comparar")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="Piora relativa permitida (padrão: 0.25 = 25%%)")
+    parser.add_argument('--salvar-baseline', action='store_true', help="Grava o resultado como novo baseline")
+    args = parser.parse_args()
+    if args.comparar_backends and not args.video:
+        parser.error("--comparar-backends precisa de --video")
+
+    cronometro = Cronometro()
+    calculadora = CalculadoraEAR(args.metodo)
+    timer = MaquinaEstadosSonolencia()
+    atuador = AtuadorSerial('(porta nula)', espera_reset=0, abrir_porta=PortaNula)
+    atuador.iniciar()
+    # Canal de email apontando para um SMTP local e caixa de saída em disco, como no detector:
+    # o estágio 'notificacao' mede a gravação real na caixa, não um retorno sem canais
+    smtp = ServidorSmtpLocal().iniciar()
+    pasta_caixa = tempfile.mkdtemp(prefix='benchmark_notificacoes_')
+    notificador = NotificationManager(cooldown_segundos=0, caminho_caixa=os.path.join(pasta_caixa, 'notificacoes.db'))
+    notificador.configurar_email('127.0.0.1', smtp.porta, 'benchmark@local', '', 'destino@local', usar_tls=False)
+
+    inicio = time.perf_counter()
+    comparacao = None
+    if args.comparar_backends:
+        opcoes_onnx = {'caminho_modelo': args.modelo_onnx, 'caminho_detector_rosto': args.detector_rosto,
+                       'motor': args.motor, 'threads': args.threads}
+        quadros, comparacao = comparar_backends(args.video, args.comparar_backends, cronometro, calculadora,
+                                                opcoes_onnx, args.limite_quadros)
+        alertas = 0
+        fonte = {'tipo': 'backends', 'arquivos': args.video, 'backends': args.comparar_backends,
+                 'motor': args.motor, 'threads': args.threads}
+    elif args.video:
+        quadros, alertas = rodar_video(args.video, cronometro, calculadora, timer, atuador, notificador,
+                                       args.rastreamento, args.limite_quadros)
+        fonte = {'tipo': 'video', 'arquivos': args.video, 'rastreamento': args.rastreamento}
+    else:
+        quadros, alertas = rodar_sintetico(args.sintetico, cronometro, calculadora, timer, atuador, notificador)
+        fonte = {'tipo': 'sintetico', 'quadros': args.sintetico}
+    duracao = time.perf_counter() - inicio
+
+    atuador.close()
+    notificador.encerrar(timeout=1)
+    smtp.parar()
+    shutil.rmtree(pasta_caixa, ignore_errors=True)
+
+    resultado = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'maquina': {'sistema': platform.platform(), 'processador': platform.processor(),
+                    'python': platform.python_version(), 'nucleos': os.cpu_count()},
+        'fonte': fonte,
+        'metodo_ratio': args.metodo,
+        'quadros': quadros,
+        'alertas': int(alertas),
+        'duracao_s': duracao,
+        'quadros_por_s': quadros / duracao if duracao > 0 else 0.0,
+        'pico_memoria_mb': pico_memoria_mb(),
+        'estagios': cronometro.resumo(),
+    }
+    if comparacao is not None:
+        resultado['comparacao'] = comparacao
+    imprimir_resultado(resultado)
+    if comparacao is not None:
+        imprimir_comparacao(comparacao, args.comparar_backends[0])
+
+    os.makedirs(PASTA_SAIDA, exist_ok=True)
+    caminho_saida = os.path.join(PASTA_SAIDA, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(caminho_saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultado gravado em {caminho_saida}")
+
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f"Baseline atualizado em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ Baseline '{args.baseline}' não encontrado. Use --salvar-baseline para criar um.")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as arquivo:
+        baseline = json.load(arquivo)
+    if baseline.get('fonte', {}).get('tipo') != fonte['tipo']:
+        print("⚠ Baseline foi gerado com outra fonte de dados; comparação ignorada.")
+        return 0
+
+    regressoes = comparar_com_baseline(resultado, baseline, args.tolerancia)
+    if regressoes:
+        print("\n✗ REGRESSÃO DE DESEMPENHO:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        return 1
+
+    print("\n✓ Sem regressões em relação ao baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
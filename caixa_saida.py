@@ -0,0 +1,175 @@
+"""
+Caixa de saída durável das notificações remotas.
+
+Cada alerta é gravado num banco SQLite local (output/notificacoes.db) antes de qualquer
+tentativa de envio: gravar custa dezenas de microssegundos (modo WAL, sem fsync a cada
+linha) e não depende da rede. Uma linha por canal, apagada só depois que o canal confirma
+o envio. Se o veículo ficar sem sinal ou o programa for desligado, os alertas continuam
+no disco e são entregues quando a conexão voltar (inclusive na próxima execução).
+
+O anexo de um alerta (a evidência, ver evidencias.py) é gravado uma única vez, numa
+tabela própria, e referenciado só pelas linhas dos canais que enviam anexos.
+
+Também tem o balde de fichas usado para limitar a taxa de envio de cada canal.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class CaixaSaida:
+    """Fila persistente de mensagens pendentes, separada por canal."""
+
+    def __init__(self, caminho='output/notificacoes.db'):
+        """
+        Args:
+            caminho: Arquivo SQLite (None = só em memória, sem durabilidade)
+        """
+        self.caminho = caminho or ':memory:'
+        if caminho:
+            os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        # Uma conexão compartilhada (protegida pela trava) entre a detecção e o envio
+        self._conexao = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+        self._trava = threading.Lock()
+        with self._trava:
+            if caminho:
+                # WAL + synchronous=NORMAL: grava sem esperar o disco a cada linha e
+                # continua consistente se a energia cair (perde no máximo as últimas linhas)
+                self._conexao.execute("PRAGMA journal_mode=WAL")
+                self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS pendentes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " canal TEXT NOT NULL,"
+                " criada REAL NOT NULL,"
+                " mensagem TEXT NOT NULL,"
+                " tentativas INTEGER NOT NULL DEFAULT 0,"
+                " id_anexo INTEGER)"
+            )
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS anexos (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL,"
+                " dados BLOB NOT NULL)"
+            )
+            colunas = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(pendentes)")}
+            if 'id_anexo' not in colunas:
+                # Banco criado por uma versão sem anexos
+                self._conexao.execute("ALTER TABLE pendentes ADD COLUMN id_anexo INTEGER")
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS pendentes_canal ON pendentes (canal, id)")
+
+    def adicionar(self, mensagem, canais, criada=None, anexo=None, canais_anexo=None):
+        """
+        Grava a mensagem como pendente em cada canal.
+
+        Args:
+            anexo: (nome_arquivo, bytes) opcional, entregue junto com a mensagem
+            canais_anexo: Canais que recebem o anexo (padrão: todos). O anexo é gravado uma
+                vez só, e só se algum desses canais estiver em `canais`
+        """
+        criada = time.time() if criada is None else criada
+        canais_anexo = canais if canais_anexo is None else canais_anexo
+        with self._trava:
+            self._conexao.execute("BEGIN")
+            try:
+                id_anexo = None
+                if anexo and any(canal in canais_anexo for canal in canais):
+                    id_anexo = self._conexao.execute("INSERT INTO anexos (nome, dados) VALUES (?, ?)",
+                                                     anexo).lastrowid
+                self._conexao.executemany(
+                    "INSERT INTO pendentes (canal, criada, mensagem, id_anexo) VALUES (?, ?, ?, ?)",
+                    [(canal, criada, mensagem, id_anexo if canal in canais_anexo else None) for canal in canais],
+                )
+                self._conexao.execute("COMMIT")
+            except sqlite3.Error:
+                self._conexao.execute("ROLLBACK")
+                raise
+
+    def pendentes(self, canal, limite=None):
+        """
+        Returns:
+            Lista de (id, criada, mensagem) do canal, da mais antiga para a mais nova
+        """
+        consulta = "SELECT id, criada, mensagem FROM pendentes WHERE canal = ? ORDER BY id"
+        parametros = (canal,)
+        if limite is not None:
+            consulta += " LIMIT ?"
+            parametros += (limite,)
+        with self._trava:
+            return self._conexao.execute(consulta, parametros).fetchall()
+
+    def anexo(self, id_mensagem):
+        """
+        Returns:
+            (nome_arquivo, bytes) da mensagem, ou None se ela não tem anexo
+        """
+        with self._trava:
+            linha = self._conexao.execute(
+                "SELECT anexos.nome, anexos.dados FROM pendentes JOIN anexos ON anexos.id = pendentes.id_anexo"
+                " WHERE pendentes.id = ?", (id_mensagem,)).fetchone()
+        if linha is None:
+            return None
+        return linha[0], bytes(linha[1])
+
+    def remover(self, ids):
+        """Apaga as mensagens já entregues (e os anexos que nenhuma pendente usa mais)."""
+        with self._trava:
+            self._conexao.execute("BEGIN")
+            try:
+                self._conexao.executemany("DELETE FROM pendentes WHERE id = ?", [(i,) for i in ids])
+                self._conexao.execute(
+                    "DELETE FROM anexos WHERE id NOT IN (SELECT id_anexo FROM pendentes WHERE id_anexo IS NOT NULL)")
+                self._conexao.execute("COMMIT")
+            except sqlite3.Error:
+                self._conexao.execute("ROLLBACK")
+                raise
+
+    def registrar_falha(self, ids):
+        with self._trava:
+            self._conexao.executemany("UPDATE pendentes SET tentativas = tentativas + 1 WHERE id = ?",
+                                      [(i,) for i in ids])
+
+    def total_pendentes(self, canal=None):
+        with self._trava:
+            if canal is None:
+                return self._conexao.execute("SELECT COUNT(*) FROM pendentes").fetchone()[0]
+            return self._conexao.execute("SELECT COUNT(*) FROM pendentes WHERE canal = ?", (canal,)).fetchone()[0]
+
+    def fechar(self):
+        with self._trava:
+            self._conexao.close()
+
+
+class BaldeFichas:
+    """
+    Limite de taxa por balde de fichas: permite rajadas de até `capacidade` envios e,
+    depois disso, no máximo `taxa` envios por segundo.
+    """
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._fichas = float(capacidade)
+        self._ultima_recarga = time.monotonic()
+
+    def _recarregar(self):
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._ultima_recarga) * self.taxa)
+        self._ultima_recarga = agora
+
+    def retirar(self):
+        """
+        Tenta usar uma ficha.
+
+        Returns:
+            0 se a ficha foi usada, ou quantos segundos faltam para haver uma
+        """
+        self._recarregar()
+        if self._fichas >= 1:
+            self._fichas -= 1
+            return 0.0
+        return (1 - self._fichas) / self.taxa
+
+    def devolver(self):
+        """Devolve a ficha de um envio que falhou (as novas tentativas são limitadas pelo backoff)."""
+        self._fichas = min(self.capacidade, self._fichas + 1)
@@ -0,0 +1,314 @@
+"""
+Fontes de vídeo do Detector de Sonolência, com a interface do cv2.VideoCapture (read/release).
+
+- FonteCamera: abre a câmera com backend, resolução, FPS, formato (MJPG/YUYV) e tamanho
+  do buffer do driver escolhidos. Com o padrão do OpenCV o driver pode guardar vários
+  quadros velhos (100ms ou mais de atraso em câmeras USB); com buffer 1 o quadro lido é
+  sempre o mais novo.
+- FonteArquivo: reproduz um vídeo gravado no lugar da câmera, em tempo real (quadros
+  atrasados são pulados, como numa câmera com buffer 1) ou o mais rápido possível.
+
+Cada quadro é marcado no momento da captura (grab), antes da decodificação:
+ultimo_tempo (time.time(), usado pelo timer) e ultimo_instante (perf_counter, usado
+para medir a latência até a decisão). O pipeline usa essas marcas quando existem.
+
+Uso:
+    python captura.py --fonte 0 --largura 640 --altura 480 --fps 30 --formato MJPG
+    python captura.py --fonte gravacoes/cabine01.mp4 --sem-limite
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from instrumentacao import REGISTRO
+
+_TEMPO_LEITURA = REGISTRO.histograma('captura_leitura_segundos',
+                                     'Tempo para pegar e decodificar um quadro da fonte')
+_ATRASO_DRIVER = REGISTRO.histograma('captura_atraso_driver_segundos',
+                                     'Tempo entre o quadro entrar no buffer do driver (V4L2) e ser lido',
+                                     limites=(0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5))
+_PULADOS = REGISTRO.contador('captura_replay_pulados_total',
+                             'Quadros do vídeo pulados no replay em tempo real (leitura atrasada)')
+
+# Nome -> constante do OpenCV (resolvida na hora: nem todo build tem todos os backends)
+BACKENDS_CAPTURA = {
+    'auto': 'CAP_ANY',
+    'v4l2': 'CAP_V4L2',
+    'dshow': 'CAP_DSHOW',
+    'msmf': 'CAP_MSMF',
+    'gstreamer': 'CAP_GSTREAMER',
+    'avfoundation': 'CAP_AVFOUNDATION',
+}
+
+# Atraso do driver acima disso é descartado (relógio do buffer diferente do monotônico)
+ATRASO_DRIVER_MAXIMO = 5.0
+
+# Diferença aceita entre o valor pedido e o lido (ex: 30 quadros/s lido como 30.0 ou 29.97)
+TOLERANCIA_CONFIGURACAO = 0.5
+
+
+def _valor_aceito(aceito, pedido):
+    """Compara o valor lido da câmera com o pedido: formato como texto, números com tolerância."""
+    if isinstance(pedido, str):
+        return str(aceito).upper() == pedido.upper()
+    return abs(float(aceito or 0) - float(pedido)) <= TOLERANCIA_CONFIGURACAO
+
+
+def _fourcc_texto(valor):
+    valor = int(valor)
+    return ''.join(chr((valor >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00')
+
+
+class FonteCamera:
+    """Câmera com as configurações de captura aplicadas e marcação do momento de cada quadro."""
+
+    def __init__(self, indice=0, backend='auto', largura=None, altura=None, fps=None, formato=None,
+                 tamanho_buffer=1):
+        """
+        Args:
+            indice: Índice da câmera (0 geralmente é a integrada)
+            backend: Nome em BACKENDS_CAPTURA ('v4l2' no Linux, 'dshow'/'msmf' no Windows)
+            largura, altura: Resolução pedida (None = padrão do driver)
+            fps: Quadros por segundo pedidos (None = padrão do driver)
+            formato: 'MJPG' (comprimido, permite resoluções/FPS maiores pela USB) ou 'YUYV'
+                (sem compressão, sem custo de decodificação). None = padrão do driver
+            tamanho_buffer: Quadros guardados pelo driver (1 = sempre o mais novo; nem todo
+                backend respeita)
+        """
+        if backend not in BACKENDS_CAPTURA:
+            raise ValueError(f"Backend de captura desconhecido: {backend!r} (use um de {sorted(BACKENDS_CAPTURA)})")
+        self.indice = indice
+        self.backend = backend
+        self.cap = cv2.VideoCapture(indice, getattr(cv2, BACKENDS_CAPTURA[backend], cv2.CAP_ANY))
+
+        # Ordem importa no V4L2: o formato antes da resolução, a resolução antes do FPS
+        pedidas = []
+        if formato:
+            pedidas.append((cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*formato), 'formato', formato))
+        if largura:
+            pedidas.append((cv2.CAP_PROP_FRAME_WIDTH, largura, 'largura', largura))
+        if altura:
+            pedidas.append((cv2.CAP_PROP_FRAME_HEIGHT, altura, 'altura', altura))
+        if fps:
+            pedidas.append((cv2.CAP_PROP_FPS, fps, 'fps', fps))
+        if tamanho_buffer:
+            pedidas.append((cv2.CAP_PROP_BUFFERSIZE, tamanho_buffer, 'buffer', tamanho_buffer))
+        for propriedade, valor, _, _ in pedidas:
+            self.cap.set(propriedade, valor)
+
+        self.configuracao = self._ler_configuracao()
+        diferentes = [f"{nome} {pedido} -> {self.configuracao[nome]}" for _, _, nome, pedido in pedidas
+                      if not _valor_aceito(self.configuracao[nome], pedido)]
+        if diferentes:
+            print(f"⚠ A câmera {indice} não aceitou tudo que foi pedido: {', '.join(diferentes)}")
+
+        self.fps = self.configuracao['fps'] or 30.0
+        self.ultimo_tempo = None
+        self.ultimo_instante = None
+        self.atraso_driver = None
+        self.quadros_lidos = 0
+
+    def _ler_configuracao(self):
+        return {
+            'formato': _fourcc_texto(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            'largura': int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'altura': int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': self.cap.get(cv2.CAP_PROP_FPS),
+            'buffer': int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+            'backend': self.cap.getBackendName() if self.cap.isOpened() else None,
+        }
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, destino=None):
+        """
+        Pega o próximo quadro (marcando o momento) e decodifica.
+
+        Args:
+            destino: Array opcional onde decodificar (evita alocar um quadro novo)
+
+        Returns:
+            (sucesso, img), como no cv2.VideoCapture
+        """
+        inicio = time.perf_counter()
+        if not self.cap.grab():
+            return False, None
+        self.ultimo_instante = time.perf_counter()
+        self.ultimo_tempo = time.time()
+
+        # No V4L2 a posição é o horário do buffer no relógio monotônico: mede quanto o
+        # quadro esperou no driver antes de ser lido
+        marca_buffer = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        self.atraso_driver = None
+        if marca_buffer > 0:
+            atraso = time.monotonic() - marca_buffer / 1000
+            if 0 <= atraso < ATRASO_DRIVER_MAXIMO:
+                self.atraso_driver = atraso
+                _ATRASO_DRIVER.observar(atraso)
+
+        sucesso, img = self.cap.retrieve(destino) if destino is not None else self.cap.retrieve()
+        _TEMPO_LEITURA.observar(time.perf_counter() - inicio)
+        if sucesso:
+            self.quadros_lidos += 1
+        return sucesso, img
+
+    def release(self):
+        self.cap.release()
+
+    def descricao(self):
+        c = self.configuracao
+        return (f"Câmera {self.indice} ({c['backend']}): {c['largura']}x{c['altura']} "
+                f"@ {c['fps']:.0f} quadros/s, formato {c['formato'] or '?'}, buffer {c['buffer']}")
+
+
+class FonteArquivo:
+    """Vídeo gravado com a mesma interface da FonteCamera."""
+
+    def __init__(self, caminho, tempo_real=True, repetir=False):
+        """
+        Args:
+            caminho: Arquivo de vídeo
+            tempo_real: True = entrega cada quadro no seu horário e pula os que ficaram para
+                trás (como uma câmera com buffer 1); False = o mais rápido possível
+            repetir: Volta ao começo quando o vídeo acaba
+        """
+        self.caminho = caminho
+        self.tempo_real = tempo_real
+        self.repetir = repetir
+        self.cap = cv2.VideoCapture(caminho)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.configuracao = {
+            'largura': int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'altura': int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': self.fps,
+        }
+        self.ultimo_tempo = None
+        self.ultimo_instante = None
+        self.atraso_driver = None
+        self.quadros_lidos = 0
+        self.quadros_pulados = 0
+        self._proximo = 0  # Número do próximo quadro do vídeo (contando as voltas)
+        self._inicio_parede = None
+        self._inicio_monotonico = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _pegar(self):
+        """grab() do próximo quadro, voltando ao começo se for para repetir."""
+        if self.cap.grab():
+            return True
+        if not self.repetir:
+            return False
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self.cap.grab()
+
+    def read(self, destino=None):
+        """
+        Returns:
+            (sucesso, img). ultimo_tempo é o horário do quadro no vídeo (a partir do
+            início da reprodução), então o timer vê o tempo da gravação nos dois modos
+        """
+        inicio = time.perf_counter()
+        if self._inicio_monotonico is None:
+            self._inicio_monotonico = time.perf_counter()
+            self._inicio_parede = time.time()
+
+        if self.tempo_real:
+            devido = int((time.perf_counter() - self._inicio_monotonico) * self.fps)
+            # Quadros que já passaram do horário: pula sem decodificar
+            while self._proximo < devido:
+                if not self._pegar():
+                    return False, None
+                self._proximo += 1
+                self.quadros_pulados += 1
+                _PULADOS.inc()
+            espera = self._inicio_monotonico + self._proximo / self.fps - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+
+        if not self._pegar():
+            return False, None
+        self.ultimo_instante = time.perf_counter()
+        self.ultimo_tempo = self._inicio_parede + self._proximo / self.fps
+        self._proximo += 1
+
+        sucesso, img = self.cap.retrieve(destino) if destino is not None else self.cap.retrieve()
+        _TEMPO_LEITURA.observar(time.perf_counter() - inicio)
+        if sucesso:
+            self.quadros_lidos += 1
+        return sucesso, img
+
+    def release(self):
+        self.cap.release()
+
+    def descricao(self):
+        c = self.configuracao
+        modo = 'tempo real' if self.tempo_real else 'sem limite de velocidade'
+        return f"Vídeo {self.caminho}: {c['largura']}x{c['altura']} @ {c['fps']:.0f} quadros/s ({modo})"
+
+
+def abrir_fonte(fonte=0, tempo_real=True, repetir=False, **configuracao_camera):
+    """
+    Abre uma câmera (fonte numérica) ou um vídeo (caminho).
+
+    Args:
+        fonte: Índice da câmera ou caminho do vídeo
+        tempo_real, repetir: Só para vídeos (ver FonteArquivo)
+        configuracao_camera: Só para câmeras (ver FonteCamera)
+
+    Returns:
+        FonteCamera ou FonteArquivo
+    """
+    if isinstance(fonte, int) or (isinstance(fonte, str) and fonte.isdigit()):
+        return FonteCamera(int(fonte), **configuracao_camera)
+    return FonteArquivo(fonte, tempo_real=tempo_real, repetir=repetir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Testa a captura: configuração aceita, taxa e atrasos.")
+    parser.add_argument('--fonte', default='0', help="Índice da câmera ou caminho de um vídeo")
+    parser.add_argument('--backend', default='auto', choices=sorted(BACKENDS_CAPTURA))
+    parser.add_argument('--largura', type=int, default=None)
+    parser.add_argument('--altura', type=int, default=None)
+    parser.add_argument('--fps', type=float, default=None)
+    parser.add_argument('--formato', default=None, choices=('MJPG', 'YUYV'))
+    parser.add_argument('--buffer', type=int, default=1, help="Tamanho do buffer do driver")
+    parser.add_argument('--sem-limite', action='store_true', help="Vídeo: lê o mais rápido possível")
+    parser.add_argument('--segundos', type=float, default=5.0, help="Duração do teste")
+    parser.add_argument('--processamento-ms', type=float, default=0.0,
+                        help="Simula o tempo de inferência por quadro (mostra os quadros pulados)")
+    args = parser.parse_args()
+
+    fonte = abrir_fonte(args.fonte, tempo_real=not args.sem_limite, backend=args.backend, largura=args.largura,
+                        altura=args.altura, fps=args.fps, formato=args.formato, tamanho_buffer=args.buffer)
+    if not fonte.isOpened():
+        raise SystemExit(f"ERRO: não foi possível abrir a fonte {args.fonte!r}")
+    print(f"✓ {fonte.descricao()}")
+
+    idades = []
+    destino = None
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < args.segundos:
+        sucesso, img = fonte.read(destino)
+        if not sucesso:
+            break
+        destino = img  # Os próximos quadros são decodificados no mesmo array
+        idades.append(time.perf_counter() - fonte.ultimo_instante)
+        if args.processamento_ms:
+            time.sleep(args.processamento_ms / 1000)
+    duracao = time.perf_counter() - inicio
+
+    print(f"{fonte.quadros_lidos} quadros em {duracao:.1f}s ({fonte.quadros_lidos / duracao:.1f} quadros/s)")
+    if idades:
+        print(f"Decodificação após a captura: p50 {np.percentile(idades, 50) * 1000:.1f}ms | "
+              f"p95 {np.percentile(idades, 95) * 1000:.1f}ms")
+    if getattr(fonte, 'quadros_pulados', 0):
+        print(f"Quadros pulados (leitura atrasada): {fonte.quadros_pulados}")
+    if fonte.atraso_driver is not None:
+        print(f"Último atraso no buffer do driver: {fonte.atraso_driver * 1000:.1f}ms")
+    fonte.release()
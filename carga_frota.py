@@ -0,0 +1,159 @@
+"""
+Gerador de carga para o coletor da frota.
+
+Sobe um coletor (processo separado) que repassa os alertas a servidores locais no lugar
+do Telegram/SMTP, e vários processos que simulam milhares de veículos mandando heartbeats
+e alertas por UDP (com uma fração de alertas reenviados, como faz a caixa de saída após
+uma falha). No fim compara o que foi enviado com o que o coletor processou.
+
+Uso:
+    python carga_frota.py --veiculos 5000 --taxa 20000 --duracao 10
+    python carga_frota.py --taxa 0 --processos 4     # o mais rápido possível
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import socket
+import time
+
+from protocolo_frota import codificar, evento_alerta, evento_heartbeat
+
+# Datagramas enviados entre duas verificações do ritmo
+TAMANHO_RAJADA = 200
+
+
+def _porta_livre(tipo=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, tipo) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _rodar_coletor(porta_udp, porta_http, porta_smtp, url_telegram):
+    """Processo do coletor, repassando para os servidores locais."""
+    import asyncio
+
+    from coletor_frota import ColetorFrota
+    from notifications import NotificationManager
+
+    notificador = NotificationManager(cooldown_segundos=0, caminho_caixa=None)
+    notificador.configurar_email('127.0.0.1', porta_smtp, 'coletor@local', '', 'frota@local', usar_tls=False)
+    notificador.configurar_telegram('token', 'chat', url_api=url_telegram)
+    coletor = ColetorFrota(notificador)
+    try:
+        asyncio.run(coletor.servir('127.0.0.1', porta_udp, porta_http))
+    except KeyboardInterrupt:
+        pass
+
+
+def _enviar_carga(indice, veiculos, taxa, duracao, porta_udp, prob_alerta, prob_repeticao, semente):
+    """
+    Processo gerador: cada datagrama é o heartbeat (ou, às vezes, o alerta) de um veículo.
+
+    Returns:
+        (eventos enviados, alertas únicos, alertas repetidos)
+    """
+    aleatorio = random.Random(semente)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    destino = ('127.0.0.1', porta_udp)
+    nomes = [f"V{indice:02d}-{numero:05d}" for numero in range(veiculos)]
+
+    enviados = alertas = repetidos = 0
+    ja_enviados = []
+    inicio = time.perf_counter()
+    while True:
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= duracao:
+            break
+        # Segura o ritmo: não passa da taxa pedida (0 = sem limite)
+        if taxa and enviados > decorrido * taxa:
+            time.sleep(min(0.01, enviados / taxa - decorrido))
+            continue
+        for _ in range(TAMANHO_RAJADA):
+            veiculo = nomes[enviados % veiculos]
+            sorteio = aleatorio.random()
+            if ja_enviados and sorteio < prob_repeticao * prob_alerta:
+                evento = aleatorio.choice(ja_enviados)
+                repetidos += 1
+            elif sorteio < prob_alerta:
+                evento = evento_alerta(veiculo, time.time(), "Alerta de sonolência (carga simulada)")
+                ja_enviados.append(evento)
+                alertas += 1
+            else:
+                evento = evento_heartbeat(veiculo, time.time())
+            sock.sendto(codificar(evento), destino)
+            enviados += 1
+    sock.close()
+    return enviados, alertas, repetidos
+
+
+def _consultar_coletor(porta_http):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta_http, timeout=5)
+    conexao.request('GET', '/frota')
+    dados = json.loads(conexao.getresponse().read())
+    conexao.close()
+    return dados['coletor']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga simulada de detectores para o coletor da frota.")
+    parser.add_argument('--veiculos', type=int, default=2000, help="Veículos simulados (no total)")
+    parser.add_argument('--taxa', type=float, default=20000, help="Eventos por segundo no total (0 = sem limite)")
+    parser.add_argument('--duracao', type=float, default=10.0, help="Duração da carga em segundos")
+    parser.add_argument('--processos', type=int, default=2, help="Processos geradores")
+    parser.add_argument('--prob-alerta', type=float, default=0.001, help="Fração dos eventos que são alertas")
+    parser.add_argument('--prob-repeticao', type=float, default=0.2,
+                        help="Fração dos alertas reenviados (devem ser descartados pelo coletor)")
+    args = parser.parse_args()
+
+    from servidores_locais import ServidorHttpLocal, ServidorSmtpLocal
+    telegram = ServidorHttpLocal().iniciar()
+    smtp = ServidorSmtpLocal().iniciar()
+
+    porta_udp = _porta_livre(socket.SOCK_DGRAM)
+    porta_http = _porta_livre()
+    coletor = multiprocessing.Process(target=_rodar_coletor, args=(porta_udp, porta_http, smtp.porta, telegram.url),
+                                      daemon=True)
+    coletor.start()
+    for _ in range(100):
+        try:
+            base = _consultar_coletor(porta_http)
+            break
+        except OSError:
+            time.sleep(0.05)
+    else:
+        raise SystemExit("ERRO: o coletor não subiu")
+
+    print(f"Carga: {args.veiculos} veículos, {args.processos} processos, "
+          f"{'sem limite' if not args.taxa else f'{args.taxa:.0f} eventos/s'} por {args.duracao:.0f}s")
+    por_processo = max(1, args.veiculos // args.processos)
+    tarefas = [(indice, por_processo, args.taxa / args.processos, args.duracao, porta_udp,
+                args.prob_alerta, args.prob_repeticao, indice) for indice in range(args.processos)]
+    with multiprocessing.Pool(args.processos) as pool:
+        resultados = pool.starmap(_enviar_carga, tarefas)
+    time.sleep(0.5)  # Deixa o coletor esvaziar o buffer do socket
+
+    estatisticas = _consultar_coletor(porta_http)
+    time.sleep(2)  # Dá tempo dos repasses saírem pela caixa de saída do coletor
+    coletor.terminate()
+    coletor.join()
+
+    enviados = sum(r[0] for r in resultados)
+    alertas = sum(r[1] for r in resultados)
+    repetidos = sum(r[2] for r in resultados)
+    recebidos = estatisticas['eventos'] - base['eventos']
+    print(f"Enviados: {enviados} eventos ({enviados / args.duracao:.0f}/s) | alertas: {alertas} | reenvios: {repetidos}")
+    print(f"Coletor: {recebidos} eventos ({recebidos / args.duracao:.0f}/s sustentados) | "
+          f"perda: {(1 - recebidos / enviados) * 100 if enviados else 0:.2f}% | "
+          f"alertas únicos: {estatisticas['alertas']} | repetidos descartados: {estatisticas['duplicados']} | "
+          f"veículos: {estatisticas['veiculos']}")
+    print(f"Repasse: {len(smtp.mensagens)} email(s), {len(telegram.mensagens)} mensagem(ns) Telegram "
+          f"(alertas simultâneos agrupados pelo limite de taxa de cada canal)")
+    telegram.parar()
+    smtp.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Coletor central de eventos da frota.
+
+Recebe alertas e heartbeats de muitos detectores (canal "Frota" do NotificationManager)
+por UDP e/ou HTTP, descarta repetidos, guarda o estado de cada veículo em memória e
+repassa os alertas ao Telegram/Email por um único NotificationManager: uma sessão HTTP,
+um login SMTP, caixa de saída em disco e limite de taxa por canal para a frota inteira.
+
+Tudo roda num único loop asyncio; nenhum evento espera por rede externa nem pelo disco (a
+gravação na caixa de saída, em SQLite, roda numa thread à parte). Veículos que perdem ou
+recuperam o contato na mesma verificação geram um único aviso agrupado.
+
+Endpoints HTTP:
+    POST /eventos   Um evento ou uma lista (ver protocolo_frota.py)
+    GET  /frota     Estado de cada veículo e estatísticas do coletor (JSON)
+    GET  /metrics   Métricas no formato do Prometheus
+
+Uso:
+    python coletor_frota.py --porta-udp 9200 --porta-http 9201 --config config_notificacoes.py
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentacao import REGISTRO
+from protocolo_frota import TIPO_ALERTA, TIPO_HEARTBEAT, decodificar
+
+_EVENTOS = REGISTRO.contador('coletor_eventos_total', 'Eventos recebidos dos detectores', rotulos=('tipo',))
+_DUPLICADOS = REGISTRO.contador('coletor_alertas_duplicados_total', 'Alertas repetidos descartados')
+_INVALIDOS = REGISTRO.contador('coletor_mensagens_invalidas_total', 'Datagramas/requisições com formato inválido')
+_REPASSADOS = REGISTRO.contador('coletor_notificacoes_total', 'Notificações repassadas aos canais externos')
+
+# Buffer de recepção do socket UDP (bytes)
+TAMANHO_BUFFER_UDP = 4 * 1024 * 1024
+
+# Veículos citados pelo nome num aviso agrupado de conexão (os demais só entram na contagem)
+MAXIMO_VEICULOS_NO_AVISO = 20
+
+
+class EstadoVeiculo:
+    """O que o coletor sabe de um veículo."""
+
+    __slots__ = ('veiculo', 'primeiro_contato', 'ultimo_contato', 'online', 'alertas',
+                 'ultimo_alerta', 'pendentes_no_detector', 'eventos')
+
+    def __init__(self, veiculo, agora):
+        self.veiculo = veiculo
+        self.primeiro_contato = agora
+        self.ultimo_contato = agora
+        self.online = True
+        self.alertas = 0
+        self.ultimo_alerta = None
+        self.pendentes_no_detector = 0
+        self.eventos = 0
+
+    def como_dict(self):
+        return {nome: getattr(self, nome) for nome in self.__slots__}
+
+
+class Deduplicador:
+    """Lembra os ids vistos mais recentemente (LRU de tamanho fixo)."""
+
+    def __init__(self, capacidade=100_000):
+        self.capacidade = capacidade
+        self._vistos = OrderedDict()
+
+    def novo(self, identificador):
+        """True na primeira vez que o id aparece; False nas repetições."""
+        if identificador in self._vistos:
+            self._vistos.move_to_end(identificador)
+            return False
+        self._vistos[identificador] = None
+        if len(self._vistos) > self.capacidade:
+            self._vistos.popitem(last=False)
+        return True
+
+
+class ColetorFrota:
+    """Processa os eventos da frota e mantém o estado por veículo."""
+
+    def __init__(self, notificador=None, timeout_offline=90.0, capacidade_dedup=100_000):
+        """
+        Args:
+            notificador: NotificationManager usado para repassar os alertas (None = só registra)
+            timeout_offline: Segundos sem nenhum evento para considerar o veículo desligado/sem sinal
+            capacidade_dedup: Quantos ids de alerta lembrar para descartar reenvios
+        """
+        self.notificador = notificador
+        self.timeout_offline = timeout_offline
+        self.veiculos = {}
+        self._dedup = Deduplicador(capacidade_dedup)
+        self.inicio = time.time()
+        # Mudanças de contato desde a última verificação, avisadas juntas
+        self._voltaram = []
+        self._sem_contato = []  # (veículo, segundos sem contato)
+        # Uma única thread grava na caixa de saída, na ordem de chegada dos eventos
+        self._executor_repasse = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coletor-repasse")
+
+        # --- ESTATÍSTICAS ---
+        self.eventos = 0
+        self.alertas = 0
+        self.duplicados = 0
+        self.invalidos = 0
+
+        REGISTRO.medidor('coletor_veiculos_online', 'Veículos com contato recente',
+                         funcao=lambda: sum(1 for estado in self.veiculos.values() if estado.online))
+
+    def receber(self, dados, agora=None):
+        """Processa um datagrama ou corpo de POST. Retorna quantos eventos foram lidos."""
+        try:
+            eventos = decodificar(dados)
+        except ValueError:
+            self.invalidos += 1
+            _INVALIDOS.inc()
+            return 0
+        agora = time.time() if agora is None else agora
+        for evento in eventos:
+            self.processar(evento, agora)
+        return len(eventos)
+
+    def processar(self, evento, agora):
+        self.eventos += 1
+        veiculo = evento['v']
+        estado = self.veiculos.get(veiculo)
+        if estado is None:
+            estado = self.veiculos[veiculo] = EstadoVeiculo(veiculo, agora)
+        elif not estado.online:
+            estado.online = True
+            self._voltaram.append(veiculo)
+        estado.ultimo_contato = agora
+        estado.eventos += 1
+
+        tipo = evento['k']
+        if tipo == TIPO_HEARTBEAT:
+            _EVENTOS.inc(tipo='heartbeat')
+            estado.pendentes_no_detector = evento.get('p', 0)
+        elif tipo == TIPO_ALERTA:
+            _EVENTOS.inc(tipo='alerta')
+            if not self._dedup.novo(evento.get('id') or f"{veiculo}-{evento.get('ts')}"):
+                self.duplicados += 1
+                _DUPLICADOS.inc()
+                return
+            self.alertas += 1
+            estado.alertas += 1
+            estado.ultimo_alerta = evento.get('ts', agora)
+            self._repassar(f"🚗 Veículo <b>{veiculo}</b>\n\n{evento.get('m', 'Alerta de sonolência')}")
+        else:
+            _EVENTOS.inc(tipo='desconhecido')
+
+    def verificar_offline(self, agora=None):
+        """
+        Marca como offline os veículos sem contato há mais de timeout_offline e avisa, num
+        único aviso por tipo, quem perdeu e quem recuperou o contato desde a última verificação.
+        """
+        agora = time.time() if agora is None else agora
+        for estado in self.veiculos.values():
+            if estado.online and agora - estado.ultimo_contato > self.timeout_offline:
+                estado.online = False
+                self._sem_contato.append((estado.veiculo, agora - estado.ultimo_contato))
+        self._avisar_mudancas_de_contato()
+
+    def _avisar_mudancas_de_contato(self):
+        sem_contato, self._sem_contato = self._sem_contato, []
+        voltaram, self._voltaram = self._voltaram, []
+        if len(sem_contato) == 1:
+            veiculo, segundos = sem_contato[0]
+            self._repassar(f"📵 Veículo <b>{veiculo}</b> sem contato há {segundos:.0f}s (desligado ou sem sinal).")
+        elif sem_contato:
+            self._repassar(f"📵 <b>{len(sem_contato)} veículos</b> sem contato há mais de "
+                           f"{self.timeout_offline:.0f}s (desligados ou sem sinal): "
+                           f"{_listar_veiculos([veiculo for veiculo, _ in sem_contato])}.")
+        if len(voltaram) == 1:
+            self._repassar(f"✅ Veículo <b>{voltaram[0]}</b> voltou a se comunicar com a central.")
+        elif voltaram:
+            self._repassar(f"✅ <b>{len(voltaram)} veículos</b> voltaram a se comunicar com a central: "
+                           f"{_listar_veiculos(voltaram)}.")
+
+    def _repassar(self, mensagem):
+        """Grava o aviso na caixa de saída do notificador sem travar o loop asyncio."""
+        if self.notificador is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._gravar_aviso(mensagem)  # Fora do loop (ex: testes): grava direto
+            return
+        loop.run_in_executor(self._executor_repasse, self._gravar_aviso, mensagem)
+
+    def _gravar_aviso(self, mensagem):
+        if self.notificador.enviar_notificacao(mensagem):
+            _REPASSADOS.inc()
+
+    def resumo(self):
+        duracao = time.time() - self.inicio
+        return {
+            'eventos': self.eventos,
+            'eventos_por_segundo': self.eventos / duracao if duracao > 0 else 0.0,
+            'alertas': self.alertas,
+            'duplicados': self.duplicados,
+            'invalidos': self.invalidos,
+            'veiculos': len(self.veiculos),
+            'veiculos_online': sum(1 for estado in self.veiculos.values() if estado.online),
+        }
+
+    # --- SERVIDORES ---
+
+    async def servir(self, host='0.0.0.0', porta_udp=9200, porta_http=9201, intervalo_verificacao=5.0):
+        """Sobe os endpoints UDP e HTTP e roda até ser cancelado."""
+        loop = asyncio.get_running_loop()
+        transportes = []
+        if porta_udp:
+            transporte, _ = await loop.create_datagram_endpoint(lambda: _ProtocoloUdp(self),
+                                                                local_addr=(host, porta_udp))
+            # Buffer maior absorve picos (muitos veículos mandando heartbeat ao mesmo tempo)
+            transporte.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, TAMANHO_BUFFER_UDP)
+            transportes.append(transporte)
+        servidor_http = None
+        if porta_http:
+            servidor_http = await asyncio.start_server(self._atender_http, host, porta_http)
+        print(f"✓ Coletor da frota ouvindo em {host} (UDP {porta_udp or '-'}, HTTP {porta_http or '-'})")
+
+        try:
+            while True:
+                await asyncio.sleep(intervalo_verificacao)
+                self.verificar_offline()
+        finally:
+            for transporte in transportes:
+                transporte.close()
+            if servidor_http is not None:
+                servidor_http.close()
+                await servidor_http.wait_closed()
+            # Termina de gravar os avisos já repassados antes do notificador ser encerrado
+            self._executor_repasse.shutdown(wait=True)
+
+    async def _atender_http(self, leitor, escritor):
+        # HTTP/1.1 mínimo com keep-alive: os detectores mantêm a conexão aberta
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                metodo, caminho, _ = linha.decode('latin-1').split(' ', 2)
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                corpo = await leitor.readexactly(int(cabecalhos.get('content-length', 0)))
+
+                caminho = caminho.split('?')[0]
+                if metodo == 'POST' and caminho == '/eventos':
+                    status, resposta, tipo = (204, b'', 'text/plain') if self.receber(corpo) else \
+                        (400, b'formato invalido', 'text/plain')
+                elif metodo == 'GET' and caminho == '/frota':
+                    conteudo = {'coletor': self.resumo(),
+                                'veiculos': [estado.como_dict() for estado in self.veiculos.values()]}
+                    status, resposta, tipo = 200, json.dumps(conteudo).encode('utf-8'), 'application/json'
+                elif metodo == 'GET' and caminho == '/metrics':
+                    status, resposta, tipo = 200, REGISTRO.exportar().encode('utf-8'), 'text/plain; version=0.0.4'
+                else:
+                    status, resposta, tipo = 404, b'nao encontrado', 'text/plain'
+
+                escritor.write(
+                    f"HTTP/1.1 {status} {_TEXTOS_STATUS[status]}\r\nContent-Type: {tipo}\r\n"
+                    f"Content-Length: {len(resposta)}\r\n\r\n".encode('latin-1') + resposta
+                )
+                await escritor.drain()
+                if cabecalhos.get('connection', '').lower() == 'close':
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+
+_TEXTOS_STATUS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found'}
+
+
+def _listar_veiculos(veiculos):
+    """'A, B, C' com no máximo MAXIMO_VEICULOS_NO_AVISO nomes, mais a contagem dos demais."""
+    texto = ", ".join(f"<b>{veiculo}</b>" for veiculo in veiculos[:MAXIMO_VEICULOS_NO_AVISO])
+    omitidos = len(veiculos) - MAXIMO_VEICULOS_NO_AVISO
+    return f"{texto} e mais {omitidos}" if omitidos > 0 else texto
+
+
+class _ProtocoloUdp(asyncio.DatagramProtocol):
+    def __init__(self, coletor):
+        self.coletor = coletor
+
+    def datagram_received(self, dados, endereco):
+        self.coletor.receber(dados)
+
+
+def carregar_notificador(caminho, caminho_caixa='output/notificacoes_coletor.db'):
+    """
+    Cria o NotificationManager do coletor a partir de um arquivo no formato do
+    config_notificacoes.py (TELEGRAM_*, EMAIL_*).
+
+    Args:
+        caminho: Arquivo de configuração
+        caminho_caixa: Caixa de saída do gerenciador (ver caixa_saida.py)
+
+    Returns:
+        NotificationManager, ou None se o arquivo não existe
+    """
+    if not caminho or not os.path.exists(caminho):
+        print("ℹ Sem arquivo de configuração: os alertas só ficam registrados no coletor")
+        return None
+    from notifications import NotificationManager
+
+    spec = importlib.util.spec_from_file_location("config_coletor", caminho)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+
+    # Sem cooldown: vários veículos podem alertar ao mesmo tempo; o limite de taxa por
+    # canal e o resumo da caixa de saída evitam a rajada de mensagens
+    notificador = NotificationManager(cooldown_segundos=0, caminho_caixa=caminho_caixa)
+    if getattr(config, 'TELEGRAM_HABILITADO', False):
+        token = getattr(config, 'TELEGRAM_BOT_TOKEN', None)
+        chat_id = getattr(config, 'TELEGRAM_CHAT_ID', None)
+        url_api = getattr(config, 'TELEGRAM_URL_API', None) or 'https://api.telegram.org'
+        if token and chat_id:
+            notificador.configurar_telegram(token, chat_id, url_api=url_api)
+        else:
+            print(f"ERRO: TELEGRAM_BOT_TOKEN e TELEGRAM_CHAT_ID faltando em {caminho}; Telegram desabilitado")
+    if getattr(config, 'EMAIL_HABILITADO', False):
+        obrigatorios = ('EMAIL_SMTP_SERVER', 'EMAIL_SMTP_PORT', 'EMAIL_FROM', 'EMAIL_TO')
+        faltando = [nome for nome in obrigatorios if not getattr(config, nome, None)]
+        if faltando:
+            print(f"ERRO: {', '.join(faltando)} faltando em {caminho}; Email desabilitado")
+        else:
+            notificador.configurar_email(config.EMAIL_SMTP_SERVER, config.EMAIL_SMTP_PORT, config.EMAIL_FROM,
+                                         getattr(config, 'EMAIL_SENHA', None) or '', config.EMAIL_TO,
+                                         usar_tls=getattr(config, 'EMAIL_USAR_TLS', True))
+    notificador.conectar_canais()
+    return notificador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coletor central de alertas da frota.")
+    parser.add_argument('--host', default='0.0.0.0', help="Interface de rede")
+    parser.add_argument('--porta-udp', type=int, default=9200, help="Porta UDP (0 = desabilitada)")
+    parser.add_argument('--porta-http', type=int, default=9201, help="Porta HTTP (0 = desabilitada)")
+    parser.add_argument('--config', default='config_notificacoes.py',
+                        help="Configuração dos canais de repasse (mesmo formato do config_notificacoes.py)")
+    parser.add_argument('--timeout-offline', type=float, default=90.0,
+                        help="Segundos sem eventos para considerar o veículo sem contato")
+    args = parser.parse_args()
+
+    notificador = carregar_notificador(args.config)
+    coletor = ColetorFrota(notificador, timeout_offline=args.timeout_offline)
+    try:
+        asyncio.run(coletor.servir(args.host, args.porta_udp, args.porta_http))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(coletor.resumo(), indent=2))
+        if notificador is not None:
+            notificador.encerrar()
+
+
+if __name__ == "__main__":
+    main()
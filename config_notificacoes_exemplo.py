@@ -49,6 +49,16 @@ EMAIL_FROM = "seu_email@gmail.com"  # Seu email
 EMAIL_SENHA = "sua_senha_de_app"  # Senha de app (não a senha normal!)
 EMAIL_TO = "email_destino@gmail.com"  # Email que receberá as notificações
 
+# ===== CONFIGURAÇÃO FROTA (COLETOR CENTRAL) =====
+# Para vários veículos: em vez de cada detector falar direto com Telegram/Email,
+# todos mandam eventos a um coletor central (python coletor_frota.py)
+FROTA_HABILITADO = False  # Mude para True para habilitar
+FROTA_HOST = "192.168.0.10"  # Endereço da máquina onde roda o coletor
+FROTA_PORTA = 9200  # Porta UDP (9200) ou HTTP (9201) do coletor
+FROTA_PROTOCOLO = "udp"  # "udp" (mais leve) ou "http" (confirma cada envio)
+FROTA_ID_VEICULO = "ABC1D23"  # Identificação deste veículo (ex: a placa)
+FROTA_INTERVALO_HEARTBEAT = 30  # Segundos entre avisos de "estou ligado" ao coletor
+
 # ===== OUTRAS CONFIGURAÇÕES =====
 # Tempo mínimo entre notificações (em segundos) - evita spam
 COOLDOWN_NOTIFICACOES = 30  # 30 segundos entre notificações
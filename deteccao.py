@@ -0,0 +1,42 @@
+"""
+Lógica de detecção compartilhada entre o detector ao vivo (eyes_detector.py)
+e o processamento offline de vídeos gravados (processamento_offline.py).
+A lógica do timer de alerta fica em maquina_estados.py.
+"""
+
+from maquina_estados import ESTADO_ALERTA_ATIVO, ESTADO_AMBOS_FECHADOS, ESTADO_OLHOS_ABERTOS
+from metricas_olhos import calcular_ear
+
+# Pontos da malha facial desenhados na tela para cada olho: [cima, baixo, esquerda, direita]
+# (os pontos usados no cálculo do ratio ficam em metricas_olhos.py)
+PONTOS_OLHO_ESQUERDO = (159, 145, 33, 133)
+PONTOS_OLHO_DIREITO = (386, 374, 362, 263)
+
+# Cores usadas na tela para cada estado (BGR)
+COR_VERDE = (0, 255, 0)
+COR_LARANJA = (0, 165, 255)
+COR_VERMELHO = (0, 0, 255)
+
+CORES_ESTADO = {
+    ESTADO_OLHOS_ABERTOS: COR_VERDE,
+    ESTADO_AMBOS_FECHADOS: COR_VERMELHO,
+    ESTADO_ALERTA_ATIVO: COR_LARANJA,  # Laranja na tela para indicar alerta persistente
+}
+
+
+def calcular_ratios(face, calculadora=None):
+    """
+    Calcula o ratio (abertura vertical / largura horizontal * 100) de cada olho.
+
+    Se o rosto se afastar, as duas distâncias diminuem proporcionalmente,
+    então a razão se mantém constante. Isso é crucial!
+
+    Args:
+        face: Lista de pontos da malha facial retornada por findFaceMesh
+        calculadora: CalculadoraEAR a usar (padrão: mesmos pontos do ratio original)
+
+    Returns:
+        (ratio_esq, ratio_dir)
+    """
+    ratio_esq, ratio_dir = calcular_ear(face, calculadora)
+    return float(ratio_esq), float(ratio_dir)
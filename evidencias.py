@@ -0,0 +1,198 @@
+"""
+Evidência visual dos alertas: os últimos segundos de vídeo anexados à notificação.
+
+A captura grava cada quadro (reduzido e numa taxa menor) num buffer circular NumPy
+alocado uma única vez: cv2.resize escreve direto na posição do anel, sem img.copy()
+e sem alocar nada por quadro. Quando o alerta dispara, uma thread de fundo (com
+prioridade baixa) tira uma cópia do anel, codifica uma tira de JPEGs ou um clipe
+curto e entrega a notificação já com o anexo. A detecção não espera a codificação.
+"""
+
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from instrumentacao import REGISTRO
+
+_TEMPO_CODIFICACAO = REGISTRO.histograma('evidencia_codificacao_segundos',
+                                         'Tempo para copiar o buffer e codificar a evidência do alerta',
+                                         limites=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+_DESCARTADAS = REGISTRO.contador('evidencia_descartadas_total',
+                                 'Pedidos de evidência descartados (codificador ocupado)')
+
+FORMATO_JPEG = 'jpeg'
+FORMATO_VIDEO = 'video'
+
+
+class BufferQuadros:
+    """Anel pré-alocado com os últimos `segundos` de vídeo, reduzido para `largura` pixels."""
+
+    def __init__(self, segundos=5.0, fps=10, largura=320):
+        """
+        Args:
+            segundos: Quanto vídeo guardar
+            fps: Quadros por segundo guardados (os outros quadros da câmera são ignorados)
+            largura: Largura dos quadros guardados (a altura segue a proporção da câmera)
+        """
+        self.fps = fps
+        self.largura = largura
+        self.capacidade = max(1, int(round(segundos * fps)))
+        self._quadros = None  # Alocado no primeiro quadro, quando o tamanho da câmera é conhecido
+        self._tempos = np.zeros(self.capacidade, dtype=np.float64)
+        self._escritos = 0
+        self._proximo_tempo = 0.0
+        self._trava = threading.Lock()
+
+    def gravar(self, img, tempo):
+        """
+        Guarda o quadro se já passou 1/fps desde o último guardado. Chamado pela captura.
+
+        Args:
+            img: Quadro da câmera (não é modificado)
+            tempo: time.time() da captura
+        """
+        if tempo < self._proximo_tempo:
+            return
+        # Segue a cadência de 1/fps sem exigir o intervalo inteiro entre dois quadros
+        # (com a câmera na mesma taxa, o jitter descartaria metade dos quadros)
+        intervalo = 1.0 / self.fps
+        self._proximo_tempo = max(self._proximo_tempo + intervalo, tempo + intervalo / 2)
+
+        if self._quadros is None:
+            altura = max(1, round(img.shape[0] * self.largura / img.shape[1]))
+            self._quadros = np.zeros((self.capacidade, altura, self.largura, 3), dtype=np.uint8)
+
+        with self._trava:
+            posicao = self._escritos % self.capacidade
+            cv2.resize(img, (self.largura, self._quadros.shape[1]), dst=self._quadros[posicao],
+                       interpolation=cv2.INTER_AREA)
+            self._tempos[posicao] = tempo
+            self._escritos += 1
+
+    def instantaneo(self):
+        """
+        Cópia dos quadros guardados, do mais antigo para o mais novo (roda fora da captura).
+
+        Returns:
+            (quadros, tempos), ou (None, None) se nada foi gravado ainda
+        """
+        with self._trava:
+            if not self._escritos:
+                return None, None
+            if self._escritos <= self.capacidade:
+                ordem = np.arange(self._escritos)
+            else:
+                ordem = np.roll(np.arange(self.capacidade), -(self._escritos % self.capacidade))
+            return self._quadros[ordem], self._tempos[ordem]
+
+
+def codificar_tira_jpeg(quadros, tempos, quantidade=6, colunas=3, qualidade=80):
+    """Monta uma grade com `quantidade` quadros espaçados no tempo e codifica em JPEG."""
+    indices = np.linspace(0, len(quadros) - 1, min(quantidade, len(quadros))).round().astype(int)
+    escolhidos = []
+    for indice in indices:
+        quadro = quadros[indice]
+        # Tempo relativo ao quadro mais novo (o momento do alerta)
+        cv2.putText(quadro, f'{tempos[indice] - tempos[-1]:+.1f}s', (5, 18),
+                    cv2.FONT_HERSHEY_PLAIN, 1.2, (0, 0, 255), 2)
+        escolhidos.append(quadro)
+    while len(escolhidos) % colunas:
+        escolhidos.append(np.zeros_like(escolhidos[0]))
+    linhas = [np.hstack(escolhidos[i:i + colunas]) for i in range(0, len(escolhidos), colunas)]
+    ok, dados = cv2.imencode('.jpg', np.vstack(linhas), [cv2.IMWRITE_JPEG_QUALITY, qualidade])
+    if not ok:
+        raise RuntimeError("falha ao codificar JPEG")
+    return 'evidencia.jpg', dados.tobytes()
+
+
+def codificar_clipe(quadros, fps):
+    """Codifica os quadros num MP4 curto."""
+    altura, largura = quadros.shape[1:3]
+    descritor, caminho = tempfile.mkstemp(suffix='.mp4')
+    os.close(descritor)
+    try:
+        escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*'mp4v'), fps, (largura, altura))
+        if not escritor.isOpened():
+            raise RuntimeError("codec de vídeo indisponível")
+        for quadro in quadros:
+            escritor.write(quadro)
+        escritor.release()
+        with open(caminho, 'rb') as arquivo:
+            return 'evidencia.mp4', arquivo.read()
+    finally:
+        os.remove(caminho)
+
+
+class CodificadorEvidencias:
+    """Thread de fundo que transforma o buffer em anexo e entrega a notificação."""
+
+    def __init__(self, buffer, enviar, formato=FORMATO_JPEG, prioridade_baixa=True):
+        """
+        Args:
+            buffer: BufferQuadros alimentado pela captura
+            enviar: Função enviar(mensagem, anexo) chamada com o anexo pronto
+                (anexo = (nome_arquivo, bytes), ou None se a codificação falhou)
+            formato: FORMATO_JPEG (tira de quadros) ou FORMATO_VIDEO (clipe MP4)
+            prioridade_baixa: Baixa a prioridade da thread (Linux) para não roubar CPU da detecção
+        """
+        self.buffer = buffer
+        self.enviar = enviar
+        self.formato = formato
+        self.prioridade_baixa = prioridade_baixa
+        self.codificadas = 0
+        # Um alerta na fila basta: outro pedido durante a codificação é descartado
+        self._pedidos = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._loop, name="evidencias", daemon=True)
+        self._thread.start()
+
+    def solicitar(self, mensagem):
+        """Pede a evidência do alerta atual. Não bloqueia."""
+        try:
+            self._pedidos.put_nowait(mensagem)
+        except queue.Full:
+            _DESCARTADAS.inc()
+            # Sem evidência, mas o alerta não pode se perder
+            self.enviar(mensagem, None)
+
+    def _loop(self):
+        if self.prioridade_baixa and hasattr(os, 'setpriority') and hasattr(threading, 'get_native_id'):
+            try:
+                # No Linux a prioridade vale por thread
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+            except OSError:
+                pass
+        while True:
+            mensagem = self._pedidos.get()
+            if mensagem is None:
+                break
+            self.enviar(mensagem, self._codificar())
+
+    def _codificar(self):
+        inicio = time.perf_counter()
+        try:
+            quadros, tempos = self.buffer.instantaneo()
+            if quadros is None:
+                return None
+            if self.formato == FORMATO_VIDEO:
+                anexo = codificar_clipe(quadros, self.buffer.fps)
+            else:
+                anexo = codificar_tira_jpeg(quadros, tempos)
+        except Exception as e:
+            print(f"⚠ Não foi possível gerar a evidência do alerta: {e}")
+            return None
+        _TEMPO_CODIFICACAO.observar(time.perf_counter() - inicio)
+        self.codificadas += 1
+        return anexo
+
+    def encerrar(self, timeout=5):
+        """Termina a evidência em andamento e para a thread."""
+        try:
+            self._pedidos.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
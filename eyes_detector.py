@@ -1,16 +1,36 @@
-import cv2
-from cvzone.FaceMeshModule import FaceMeshDetector
-import serial
 import time
+# Marcado antes dos imports pesados: base do tempo até a primeira decisão
+INICIO_PROGRAMA = time.perf_counter()
+
+import cv2
+import numpy as np
 from datetime import datetime
 import os
 import importlib.util
+from pipeline import PipelineDeteccao
+from atuador_serial import AtuadorSerial
+from deteccao import CORES_ESTADO, calcular_ratios
+from maquina_estados import MOTIVO_FADIGA, MaquinaEstadosSonolencia
+from metricas_olhos import CalculadoraEAR
+from rastreamento_rosto import DetectorRastreado
+from instrumentacao import REGISTRO, iniciar_servidor_metricas
+from telemetria import GravadorTelemetria
+from taxa_adaptativa import AgendadorInferencia
+from inicializacao import Inicializacao
+from evidencias import FORMATO_JPEG, BufferQuadros, CodificadorEvidencias
+from backends_deteccao import BACKEND_CVZONE, MOTOR_ONNXRUNTIME, criar_backend
+from sinais_fadiga import CalculadoraSinais, MonitorFadiga
+from captura import abrir_fonte
 
 # --- CONFIGURAÇÕES ---
 # IMPORTANTE: Troque 'COM3' pela porta que aparece no seu Arduino IDE (ex: COM4, COM5, /dev/ttyUSB0)
 porta_arduino = 'COM6'
 baud_rate = 9600
 
+# Intervalo (em segundos) do heartbeat enviado ao Arduino quando o estado não muda.
+# Se a placa ficar 3s sem receber nada, ela dispara o alarme sozinha (fail-safe).
+INTERVALO_HEARTBEAT_ARDUINO = 1.0
+
 # Threshold do ratio para considerar olho fechado (quanto menor, mais tolerante)
 RATIO_THRESHOLD = 23
 
@@ -20,224 +40,509 @@ TEMPO_MINIMO_OLHOS_FECHADOS = 3.0
 # Tempo que os olhos devem ficar abertos após o alerta para desligar os sinais
 TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR = 3.0
 
+# Pontos usados no ratio de cada olho (ver metricas_olhos.py):
+# 'dois_pontos' = ratio original (1 par vertical por olho, calibrado para RATIO_THRESHOLD = 23)
+# 'seis_pontos' = EAR de 6 pontos (média de 3 pares verticais, menos ruidoso; recalibre o threshold)
+METODO_RATIO = 'dois_pontos'
+
+# --- SINAIS DE FADIGA ---
+# True: além da regra do fechamento longo, acompanha PERCLOS (tempo com olhos fechados no
+# último minuto), piscadas lentas/frequentes e bocejos (ver sinais_fadiga.py). Quando a
+# pontuação combinada passa de LIMIAR_FADIGA, aciona o mesmo alerta (Arduino + notificação).
+# Desligado por padrão: muda quando o alerta dispara. Ligado, a inferência roda sempre na
+# taxa máxima (TAXA_ADAPTATIVA é ignorada), pois quadros pulados perdem piscadas curtas e
+# distorcem o PERCLOS
+MONITOR_FADIGA = False
+
+# Pontuação (0 a 1) que aciona o alerta de fadiga; um novo alerta só depois de cair abaixo do rearme
+LIMIAR_FADIGA = 0.5
+LIMIAR_REARME_FADIGA = 0.35
+
+# Abertura da boca (MAR, mesma escala do ratio) considerada bocejo, se durar BOCEJO_SEGUNDOS
+LIMIAR_BOCEJO = 50.0
+BOCEJO_SEGUNDOS = 1.5
+
+# --- BACKEND DA MALHA FACIAL ---
+# 'cvzone': FaceMeshDetector do cvzone/MediaPipe (padrão)
+# 'onnx': modelo ONNX da malha do MediaPipe + YuNet para achar o rosto (ver backends_deteccao.py).
+#         Compare os dois com: python benchmark.py --comparar-backends cvzone onnx --video ...
+BACKEND_DETECCAO = BACKEND_CVZONE
+
+# Configurações do backend 'onnx'
+MODELO_ONNX = 'modelos/face_landmark.onnx'  # Ou a versão INT8: modelos/face_landmark_int8.onnx
+MODELO_DETECTOR_ROSTO = 'modelos/face_detection_yunet_2023mar.onnx'
+MOTOR_ONNX = MOTOR_ONNXRUNTIME  # Ou MOTOR_OPENCV (cv2.dnn, sem instalar o onnxruntime)
+THREADS_INFERENCIA = 1  # Threads por inferência (1 deixa os outros núcleos para captura e decisão)
+
+# --- RASTREAMENTO DO ROSTO ---
+# True: depois de achar o rosto, a malha facial roda só num recorte reduzido em volta dele
+# (bem mais leve); o quadro inteiro é reanalisado se o rastreamento se perder.
+# Só vale para o backend 'cvzone' (o backend 'onnx' já analisa só a região do rosto)
+MODO_RASTREAMENTO = True
+
+# Maior lado (em pixels) do recorte enviado para a malha facial
+LADO_RECORTE_RASTREAMENTO = 256
+
+# Margem em volta do rosto no recorte (fração do tamanho do rosto)
+MARGEM_RECORTE_RASTREAMENTO = 0.4
+
+# A cada quantos quadros o quadro inteiro é reanalisado mesmo com rastreamento estável
+INTERVALO_REDETECCAO = 30
+
+# --- TAXA DE INFERÊNCIA ADAPTATIVA ---
+# True: com os olhos claramente abertos, a malha facial roda menos vezes por segundo
+# (menos CPU e calor). Volta à taxa máxima quando o ratio chega perto do threshold,
+# o rosto some, os olhos fecham ou o alerta está ativo.
+TAXA_ADAPTATIVA = True
+
+# Ratio "claramente aberto" = RATIO_THRESHOLD * (1 + MARGEM_RATIO_ADAPTATIVA) nos dois olhos
+MARGEM_RATIO_ADAPTATIVA = 0.25
+
+# Maior intervalo (em segundos) entre duas inferências. É também o atraso máximo que a
+# taxa reduzida pode somar ao TEMPO_MINIMO_OLHOS_FECHADOS antes do alerta
+ATRASO_MAXIMO_DETECCAO = 0.25
+
+# --- CAPTURA ---
+# Índice da câmera (0 geralmente é a integrada) ou caminho de um vídeo gravado, que é
+# reproduzido no lugar da câmera (testes sem hardware)
+FONTE_VIDEO = 0
+
+# Backend do OpenCV: 'auto', 'v4l2' (Linux), 'dshow'/'msmf' (Windows), 'gstreamer', 'avfoundation'
+BACKEND_CAPTURA = 'auto'
+
+# Resolução e quadros/s pedidos à câmera (None = padrão do driver). O que a câmera
+# realmente aceitou aparece no console ao abrir
+LARGURA_CAPTURA = 640
+ALTURA_CAPTURA = 480
+FPS_CAPTURA = 30
+
+# 'MJPG': comprimido, necessário para 30 quadros/s em resoluções maiores em muitas câmeras USB
+# 'YUYV': sem compressão (sem custo de decodificação, mas mais banda). None = padrão do driver
+FORMATO_CAPTURA = 'MJPG'
+
+# Quadros guardados no buffer do driver. 1 = o quadro lido é sempre o mais novo
+# (o padrão do driver pode acumular 100ms ou mais de quadros velhos)
+BUFFER_CAPTURA = 1
+
+# Só para vídeos: True = reproduz na velocidade real (quadros atrasados são pulados, como
+# numa câmera); False = o mais rápido possível
+REPLAY_TEMPO_REAL = True
+
+# --- MODO DE EXIBIÇÃO ---
+# True: sem monitor (unidades instaladas). Nada é desenhado nem mostrado:
+# sem cópia, sem redimensionar, sem sobreposições e sem waitKey. Para sair, use Ctrl+C.
+MODO_HEADLESS = False
+
+# True: mostra só a janela com indicadores (a janela limpa de apresentação não é gerada)
+SOMENTE_JANELA_INDICADORES = False
+
+# Taxa máxima de atualização das janelas (quadros/s), independente da taxa de inferência.
+# 0 = atualiza a cada quadro processado
+FPS_MAXIMO_JANELA = 15
+
 # Tamanho das janelas de exibição (largura, altura)
 TAMANHO_JANELA_LARGURA = 960
 TAMANHO_JANELA_ALTURA = 720
 
+# --- CONFIGURAÇÃO DO PIPELINE ---
+# True: captura, inferência e decisão rodam em threads separadas (sempre usa o quadro mais novo)
+# False: tudo em sequência na mesma thread (comportamento original)
+MODO_PIPELINE = True
+
+# Quantos quadros cada fila entre estágios guarda (1 = só o mais recente, menor latência)
+TAMANHO_FILAS_PIPELINE = 1
+
+# Intervalo (em segundos) entre os relatórios de latência e quadros descartados
+INTERVALO_RELATORIO_PIPELINE = 10
+
+# --- MÉTRICAS ---
+# Porta do endpoint local de métricas (formato Prometheus), ex: 9108 para
+# http://127.0.0.1:9108/metrics. 0 = desabilitado (padrão: nenhuma porta é aberta sem pedir)
+PORTA_METRICAS = 0
+
+# --- TELEMETRIA ---
+# True: grava ratio_esq, ratio_dir, estado e horário de cada quadro em output/telemetria.bin
+# (arquivo circular de tamanho fixo; ler com telemetria.LeitorTelemetria). Desligado por
+# padrão: o arquivo é pré-alocado inteiro ao iniciar (ver CAPACIDADE_TELEMETRIA)
+TELEMETRIA_HABILITADA = False
+
+# Quantos quadros o arquivo guarda antes de sobrescrever os mais antigos (32 bytes cada)
+# Padrão: 3 dias a 30 quadros/s (~250MB)
+CAPACIDADE_TELEMETRIA = 30 * 60 * 60 * 24 * 3
+
+# --- EVIDÊNCIA DOS ALERTAS ---
+# True: as notificações remotas levam os últimos segundos de vídeo antes do alerta.
+# Os quadros ficam num buffer circular pré-alocado; a codificação roda numa thread de fundo.
+# Desligado por padrão: as imagens da cabine só saem do veículo se isso for pedido
+EVIDENCIA_HABILITADA = False
+
+# Quantos segundos antes do alerta guardar, a quantos quadros/s e com qual largura (pixels)
+SEGUNDOS_EVIDENCIA = 5.0
+FPS_EVIDENCIA = 10
+LARGURA_EVIDENCIA = 320
+
+# FORMATO_JPEG: uma imagem com 6 quadros espaçados (foto no Telegram, leve para enviar)
+# 'video': clipe MP4 com todos os quadros guardados (vídeo no Telegram)
+FORMATO_EVIDENCIA = FORMATO_JPEG
+
+# --- INICIALIZAÇÃO ---
+# Tempo máximo (em segundos) esperando o Arduino conectar e avisar que está pronto.
+# A detecção não espera por ele: os comandos ficam guardados até a placa responder.
+TEMPO_MAXIMO_ESPERA_ARDUINO = 10.0
+
+
 # --- CONFIGURAÇÃO DE NOTIFICAÇÕES REMOTAS ---
-# Carrega configurações de notificação se o arquivo existir
-try:
-    from notifications import NotificationManager
-    
-    # Tenta carregar configurações personalizadas
+def carregar_notificacoes():
+    """
+    Carrega config_notificacoes.py (se existir) e pré-conecta os canais habilitados.
+    Roda em paralelo com a câmera e o modelo.
+
+    Returns:
+        NotificationManager, ou None se as notificações estão desabilitadas
+    """
+    # Carrega configurações de notificação se o arquivo existir
     try:
-        config_notif = None
-        if os.path.exists('config_notificacoes.py'):
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("config_notificacoes", "config_notificacoes.py")
-            config_notif = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(config_notif)
+        from notifications import NotificationManager
+    
+        # Tenta carregar configurações personalizadas
+        try:
+            config_notif = None
+            if os.path.exists('config_notificacoes.py'):
+                import importlib.util
+                spec = importlib.util.spec_from_file_location("config_notificacoes", "config_notificacoes.py")
+                config_notif = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(config_notif)
         
-        if config_notif:
-            notif_manager = NotificationManager(cooldown_segundos=getattr(config_notif, 'COOLDOWN_NOTIFICACOES', 30))
+            if config_notif:
+                notif_manager = NotificationManager(cooldown_segundos=getattr(config_notif, 'COOLDOWN_NOTIFICACOES', 30))
             
-            # Configura Telegram se habilitado
-            if getattr(config_notif, 'TELEGRAM_HABILITADO', False):
-                notif_manager.configurar_telegram(
-                    getattr(config_notif, 'TELEGRAM_BOT_TOKEN', ''),
-                    getattr(config_notif, 'TELEGRAM_CHAT_ID', '')
-                )
+                # Configura Telegram se habilitado
+                if getattr(config_notif, 'TELEGRAM_HABILITADO', False):
+                    notif_manager.configurar_telegram(
+                        getattr(config_notif, 'TELEGRAM_BOT_TOKEN', ''),
+                        getattr(config_notif, 'TELEGRAM_CHAT_ID', '')
+                    )
             
-            # Configura Email se habilitado
-            if getattr(config_notif, 'EMAIL_HABILITADO', False):
-                notif_manager.configurar_email(
-                    getattr(config_notif, 'EMAIL_SMTP_SERVER', 'smtp.gmail.com'),
-                    getattr(config_notif, 'EMAIL_SMTP_PORT', 587),
-                    getattr(config_notif, 'EMAIL_FROM', ''),
-                    getattr(config_notif, 'EMAIL_SENHA', ''),
-                    getattr(config_notif, 'EMAIL_TO', '')
-                )
+                # Configura Email se habilitado
+                if getattr(config_notif, 'EMAIL_HABILITADO', False):
+                    notif_manager.configurar_email(
+                        getattr(config_notif, 'EMAIL_SMTP_SERVER', 'smtp.gmail.com'),
+                        getattr(config_notif, 'EMAIL_SMTP_PORT', 587),
+                        getattr(config_notif, 'EMAIL_FROM', ''),
+                        getattr(config_notif, 'EMAIL_SENHA', ''),
+                        getattr(config_notif, 'EMAIL_TO', '')
+                    )
+
+                # Configura o coletor da frota se habilitado
+                if getattr(config_notif, 'FROTA_HABILITADO', False):
+                    notif_manager.configurar_frota(
+                        getattr(config_notif, 'FROTA_HOST', '127.0.0.1'),
+                        getattr(config_notif, 'FROTA_PORTA', 9200),
+                        getattr(config_notif, 'FROTA_ID_VEICULO', 'veiculo'),
+                        protocolo=getattr(config_notif, 'FROTA_PROTOCOLO', 'udp'),
+                        intervalo_heartbeat=getattr(config_notif, 'FROTA_INTERVALO_HEARTBEAT', 30)
+                    )
             
-            print("✓ Sistema de notificações remotas carregado!")
-        else:
-            # Arquivo de configuração não existe, sistema de notificações desabilitado
-            notif_manager = None
-            print("ℹ Sistema de notificações disponível. Crie 'config_notificacoes.py' baseado em 'config_notificacoes_exemplo.py' para habilitar.")
-    except Exception as e:
-        print(f"⚠ Erro ao carregar notificações: {e}")
-        notif_manager = None
-except ImportError:
-    print("ℹ Módulo de notificações não encontrado. Notificações remotas desabilitadas.")
-    notif_manager = None
+                print("✓ Sistema de notificações remotas carregado!")
+                notif_manager.conectar_canais()
+                return notif_manager
+            else:
+                # Arquivo de configuração não existe, sistema de notificações desabilitado
+                print("ℹ Sistema de notificações disponível. Crie 'config_notificacoes.py' baseado em 'config_notificacoes_exemplo.py' para habilitar.")
+                return None
+        except Exception as e:
+            print(f"⚠ Erro ao carregar notificações: {e}")
+            return None
+    except ImportError:
+        print("ℹ Módulo de notificações não encontrado. Notificações remotas desabilitadas.")
+        return None
+
+
+def abrir_camera():
+    """Abre a fonte de vídeo (ver CAPTURA) e já lê o primeiro quadro, que costuma ser o mais lento."""
+    cap = abrir_fonte(FONTE_VIDEO, tempo_real=REPLAY_TEMPO_REAL, backend=BACKEND_CAPTURA,
+                      largura=LARGURA_CAPTURA, altura=ALTURA_CAPTURA, fps=FPS_CAPTURA,
+                      formato=FORMATO_CAPTURA, tamanho_buffer=BUFFER_CAPTURA)
+    if cap.isOpened():
+        print(f"✓ {cap.descricao()}")
+    else:
+        print(f"⚠ Não foi possível abrir a fonte de vídeo {FONTE_VIDEO!r}")
+    cap.read()
+    return cap
+
+
+def criar_detector():
+    """
+    Cria o detector de malha facial (detecta 1 rosto) e roda uma inferência de aquecimento,
+    para a primeira inferência de verdade não pagar a carga do modelo.
+    """
+    # Carregar o modelo (e o mediapipe, no cvzone) é pesado: roda em paralelo com a câmera
+    def novo_detector():
+        return criar_backend(BACKEND_DETECCAO, MODELO_ONNX, MODELO_DETECTOR_ROSTO, MOTOR_ONNX,
+                             THREADS_INFERENCIA)
+
+    imagem_vazia = np.zeros((480, 640, 3), dtype=np.uint8)
+    if MODO_RASTREAMENTO and BACKEND_DETECCAO == BACKEND_CVZONE:
+        detector = DetectorRastreado(
+            novo_detector(),
+            novo_detector(),
+            lado_alvo=LADO_RECORTE_RASTREAMENTO,
+            margem=MARGEM_RECORTE_RASTREAMENTO,
+            intervalo_redeteccao=INTERVALO_REDETECCAO,
+        )
+        detector.detector_completo.findFaceMesh(imagem_vazia, draw=False)
+        detector.detector_recorte.findFaceMesh(
+            np.zeros((LADO_RECORTE_RASTREAMENTO, LADO_RECORTE_RASTREAMENTO, 3), dtype=np.uint8), draw=False)
+    else:
+        detector = novo_detector()
+        detector.findFaceMesh(imagem_vazia, draw=False)
+    return detector
 
-# Inicializa a comunicação Serial com o Arduino
-try:
-    arduino = serial.Serial(porta_arduino, baud_rate)
-    time.sleep(2) # Espera 2 segundos pro Arduino reiniciar e estabilizar a conexão
-    print(f"Conectado ao Arduino na porta {porta_arduino}")
-except:
-    print("ERRO: Arduino não encontrado. Verifique a porta COM e se o cabo está conectado.")
-    arduino = None
 
-# Inicializa a Webcam (0 geralmente é a webcam integrada)
-cap = cv2.VideoCapture(0)
+def abrir_telemetria():
+    """Prepara o arquivo de telemetria (a primeira vez reserva o espaço todo em disco)."""
+    global telemetria
+    telemetria = GravadorTelemetria('output/telemetria.bin', CAPACIDADE_TELEMETRIA)
 
-# Inicializa o detector de malha facial (detecta 1 rosto)
-detector = FaceMeshDetector(maxFaces=1)
+
+# Quadros decididos antes do arquivo ficar pronto não são gravados
+telemetria = None
+
+# Câmera, modelo, Arduino, notificações e telemetria sobem ao mesmo tempo
+inicializacao = Inicializacao(INICIO_PROGRAMA)
+inicializacao.iniciar('camera', abrir_camera)
+inicializacao.iniciar('modelo', criar_detector)
+inicializacao.iniciar('notificacoes', carregar_notificacoes)
+if TELEMETRIA_HABILITADA:
+    inicializacao.iniciar('telemetria', abrir_telemetria)
+
+# Inicializa a comunicação Serial com o Arduino
+# A conexão, a espera pela placa ficar pronta e as reconexões acontecem na thread do atuador:
+# os comandos só são enviados quando o estado muda, sem nunca travar a detecção.
+arduino = AtuadorSerial(porta_arduino, baud_rate, intervalo_heartbeat=INTERVALO_HEARTBEAT_ARDUINO)
+arduino.iniciar()
+inicializacao.iniciar('arduino', arduino.aguardar_conexao, TEMPO_MAXIMO_ESPERA_ARDUINO)
 
 # IDs dos pontos dos olhos no MediaPipe (Olho Esquerdo e Direito)
-# Padrão: [ponto_cima, ponto_baixo, ponto_esquerda, ponto_direita]
-idList = [22, 23, 24, 26, 110, 157, 158, 159, 160, 161, 130, 243] 
-# Vamos usar pontos específicos para medir a abertura vertical e horizontal
 # Olho Esquerdo: Vertical (159, 145), Horizontal (33, 133)
+# Olho Direito: Vertical (386, 374), Horizontal (362, 263)
+# (ver PONTOS_OLHO_ESQUERDO / PONTOS_OLHO_DIREITO em deteccao.py)
+calculadora_ear = CalculadoraEAR(METODO_RATIO)
+# Com o monitor de fadiga, olhos e boca saem da malha numa única conta vetorizada
+calculadora_sinais = CalculadoraSinais(METODO_RATIO) if MONITOR_FADIGA else None
 
-# --- VARIÁVEIS DE CONTROLE DO TIMER ---
-tempo_inicio_olhos_fechados = None  # Quando os olhos foram fechados pela primeira vez
-alerta_sonolencia_acionado = False  # Se o alerta já foi acionado (e ainda está ativo)
-tempo_inicio_olhos_abertos = None  # Quando os olhos abriram após o alerta (para contar 3s)
+# --- MÉTRICAS DO DETECTOR ---
+# Registrar um valor é barato; o texto só é montado quando o endpoint é consultado
+metrica_quadros = REGISTRO.contador('detector_quadros_total', 'Quadros processados pela malha facial')
+metrica_sem_rosto = REGISTRO.contador('detector_sem_rosto_total', 'Quadros em que nenhum rosto foi encontrado')
+metrica_tempo_inferencia = REGISTRO.histograma('detector_inferencia_segundos',
+                                               'Tempo de malha facial + ratio por quadro')
+metrica_tempo_decisao = REGISTRO.histograma('detector_decisao_segundos',
+                                            'Tempo do timer + atuação + notificação por quadro')
+metrica_ratio = REGISTRO.histograma('detector_ratio', 'Distribuição do ratio de abertura dos olhos',
+                                    limites=range(0, 65, 5), rotulos=('olho',))
+metrica_alertas = REGISTRO.contador('detector_alertas_total', 'Alertas de sonolência acionados')
+metrica_atraso_alerta = REGISTRO.histograma(
+    'detector_alerta_apos_fechamento_segundos',
+    'Tempo entre o fechamento dos olhos e o acionamento do alerta',
+    limites=(2.5, 3.0, 3.1, 3.25, 3.5, 4.0, 5.0, 7.5, 10.0))
+metrica_latencia_pipeline = REGISTRO.histograma('detector_captura_decisao_segundos',
+                                                'Latência entre a captura do quadro e a decisão')
 
-while True:
-    success, img = cap.read()
-    if not success:
-        break
+if PORTA_METRICAS:
+    try:
+        iniciar_servidor_metricas(PORTA_METRICAS)
+        print(f"✓ Métricas disponíveis em http://127.0.0.1:{PORTA_METRICAS}/metrics")
+    except OSError as e:
+        print(f"⚠ Não foi possível abrir o endpoint de métricas na porta {PORTA_METRICAS}: {e}")
 
-    # Cria uma cópia da imagem original para a janela limpa (sem sobreposições)
-    img_limpa = img.copy()
+# --- TIMER DE ALERTA ---
+# A mesma lógica é usada pelo processamento offline de vídeos gravados
+timer = MaquinaEstadosSonolencia(RATIO_THRESHOLD, TEMPO_MINIMO_OLHOS_FECHADOS, TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR)
+
+# --- SINAIS DE FADIGA ---
+monitor_fadiga = MonitorFadiga(
+    RATIO_THRESHOLD,
+    limiar_bocejo=LIMIAR_BOCEJO,
+    duracao_minima_bocejo=BOCEJO_SEGUNDOS,
+    limiar_alerta=LIMIAR_FADIGA,
+    limiar_rearme=LIMIAR_REARME_FADIGA,
+) if MONITOR_FADIGA else None
 
-    # Passo 1: Detectar o rosto e a malha
+# --- AGENDADOR DA INFERÊNCIA ---
+# Os sinais de fadiga precisam de todos os quadros: com o monitor ligado, taxa sempre máxima
+agendador = AgendadorInferencia(
+    RATIO_THRESHOLD,
+    margem_ratio=MARGEM_RATIO_ADAPTATIVA,
+    atraso_maximo=ATRASO_MAXIMO_DETECCAO,
+) if TAXA_ADAPTATIVA and not MONITOR_FADIGA else None
+if TAXA_ADAPTATIVA and MONITOR_FADIGA:
+    print("ℹ Monitor de fadiga ligado: taxa adaptativa desativada (inferência em todos os quadros)")
+
+
+def enviar_alerta(mensagem, anexo=None):
+    """
+    Entrega o alerta ao gerenciador de notificações (se estiver configurado).
+    Nunca espera a inicialização: se as notificações ainda estão conectando os canais,
+    o alerta é entregue assim que elas ficarem prontas.
+    """
+    def _entregar(notif_manager):
+        if notif_manager:
+            notif_manager.enviar_notificacao(mensagem, anexo)
+
+    inicializacao.quando_pronta('notificacoes', _entregar)
+
+
+def notificacoes_desabilitadas():
+    """True só quando a inicialização já terminou sem gerenciador de notificações (não espera)."""
+    return inicializacao.pronta('notificacoes') and inicializacao.obter('notificacoes') is None
+
+
+# --- EVIDÊNCIA DOS ALERTAS ---
+# A captura grava no buffer; o codificador monta o anexo e chama enviar_alerta
+buffer_evidencia = BufferQuadros(SEGUNDOS_EVIDENCIA, FPS_EVIDENCIA, LARGURA_EVIDENCIA) if EVIDENCIA_HABILITADA else None
+evidencias = CodificadorEvidencias(buffer_evidencia, enviar_alerta, FORMATO_EVIDENCIA) if EVIDENCIA_HABILITADA else None
+
+
+def inferir(img):
+    """
+    Passo 1: Detecta o rosto e calcula o ratio de cada olho (e da boca, com o monitor de fadiga).
+
+    Returns:
+        (face, ratio_esq, ratio_dir, mar), ou None se nenhum rosto foi encontrado
+        (mar é None sem o monitor de fadiga)
+    """
+    inicio = time.perf_counter()
     img, faces = detector.findFaceMesh(img, draw=False) # draw=False deixa mais limpo
+    metrica_quadros.inc()
 
-    if faces:
-        face = faces[0] # Pega o primeiro rosto detectado
-        
-        # --- LÓGICA MATEMÁTICA DA VISÃO ---
-        # OLHO ESQUERDO: Pega as coordenadas dos pontos do olho esquerdo
-        ponto_cima_esq = face[159]
-        ponto_baixo_esq = face[145]
-        ponto_esq_esq = face[33]
-        ponto_dir_esq = face[133]
-
-        # OLHO DIREITO: Pega as coordenadas dos pontos do olho direito
-        ponto_cima_dir = face[386]
-        ponto_baixo_dir = face[374]
-        ponto_esq_dir = face[362]
-        ponto_dir_dir = face[263]
-
-        # Calcula a distância vertical (abertura do olho) e horizontal (largura) para OLHO ESQUERDO
-        distancia_vertical_esq, _ = detector.findDistance(ponto_cima_esq, ponto_baixo_esq)
-        distancia_horizontal_esq, _ = detector.findDistance(ponto_esq_esq, ponto_dir_esq)
-
-        # Calcula a distância vertical (abertura do olho) e horizontal (largura) para OLHO DIREITO
-        distancia_vertical_dir, _ = detector.findDistance(ponto_cima_dir, ponto_baixo_dir)
-        distancia_horizontal_dir, _ = detector.findDistance(ponto_esq_dir, ponto_dir_dir)
-
-        # Calcula a RAZÃO (Ratio) para cada olho. Multiplicamos por 100 para ficar um número inteiro legível.
-        # Se o rosto se afastar, as duas distâncias diminuem proporcionalmente, 
-        # então a razão se mantém constante. Isso é crucial!
-        ratio_esq = (distancia_vertical_esq / distancia_horizontal_esq) * 100
-        ratio_dir = (distancia_vertical_dir / distancia_horizontal_dir) * 100
-
-        # --- TOMADA DE DECISÃO ---
-        # Valor de corte: Quanto menor o threshold, mais tolerante o sistema será.
-        # Ajuste o RATIO_THRESHOLD nas configurações no topo do arquivo.
-        # Agora verificamos se AMBOS os olhos estão fechados
-        olho_esq_fechado = ratio_esq < RATIO_THRESHOLD
-        olho_dir_fechado = ratio_dir < RATIO_THRESHOLD
-        ambos_fechados_agora = olho_esq_fechado and olho_dir_fechado
-        
-        tempo_atual = time.time()
-        
-        # --- LÓGICA DO TIMER PARA ALERTAS ---
-        # Detecção visual é instantânea (mostra na tela imediatamente)
-        if ambos_fechados_agora:
-            estado = "AMBOS FECHADOS"
-            cor = (0, 0, 255) # Vermelho na tela
-            
-            # Se os olhos fecharem durante período de alerta ativo, reseta o contador de olhos abertos
-            if alerta_sonolencia_acionado and tempo_inicio_olhos_abertos is not None:
-                tempo_inicio_olhos_abertos = None  # Reseta o contador - alerta continua
-            
-            # Inicia o timer se os olhos acabaram de fechar
-            if tempo_inicio_olhos_fechados is None:
-                tempo_inicio_olhos_fechados = tempo_atual
-            
-            # Verifica se já passou o tempo mínimo para acionar o alerta
-            tempo_com_olhos_fechados = tempo_atual - tempo_inicio_olhos_fechados
-            
-            if tempo_com_olhos_fechados >= TEMPO_MINIMO_OLHOS_FECHADOS and not alerta_sonolencia_acionado:
-                # ACIONA ALERTAS: Arduino e notificações
-                comando = 'F' # Envia F para o Arduino
-                alerta_sonolencia_acionado = True
-                tempo_inicio_olhos_abertos = None  # Garante que está None quando alerta é acionado
-                
-                # Envia para o Arduino (se estiver conectado)
-                if arduino:
-                    arduino.write(comando.encode())
-                
-                # Envia notificação remota se configurado
-                if notif_manager:
-                    mensagem = (
-                        f"⚠️ <b>ALERTA DE SONOLÊNCIA DETECTADA!</b>\n\n"
-                        f"🕐 Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n"
-                        f"👁️ Ratio Olho Esquerdo: {ratio_esq:.1f}\n"
-                        f"👁️ Ratio Olho Direito: {ratio_dir:.1f}\n"
-                        f"⏱️ Tempo com olhos fechados: {tempo_com_olhos_fechados:.1f}s\n"
-                        f"⚠️ <b>Ambos os olhos foram detectados como fechados por {TEMPO_MINIMO_OLHOS_FECHADOS}s!</b>\n\n"
-                        f"🚨 O sistema emitiu alertas sonoros e visuais."
-                    )
-                    notif_manager.enviar_notificacao(mensagem)
-            
-            # Mantém o alerta enquanto os olhos estiverem fechados (após ter sido acionado)
-            if alerta_sonolencia_acionado:
-                comando = 'F'
-                if arduino:
-                    arduino.write(comando.encode())
-            else:
-                # Olhos fechados, mas ainda não passou o tempo mínimo
-                comando = 'A' # Mantém Arduino em estado normal
-                if arduino:
-                    arduino.write(comando.encode())
-                
+    if not faces:
+        metrica_sem_rosto.inc()
+        duracao = time.perf_counter() - inicio
+        metrica_tempo_inferencia.observar(duracao)
+        if agendador:
+            agendador.registrar_inferencia(duracao)
+        return None
+
+    face = faces[0] # Pega o primeiro rosto detectado
+    if calculadora_sinais:
+        ratio_esq, ratio_dir, mar = calculadora_sinais.calcular(face)
+    else:
+        ratio_esq, ratio_dir = calcular_ratios(face, calculadora_ear)
+        mar = None
+    duracao = time.perf_counter() - inicio
+    metrica_tempo_inferencia.observar(duracao)
+    if agendador:
+        agendador.registrar_inferencia(duracao)
+    metrica_ratio.observar(ratio_esq, olho='esquerdo')
+    metrica_ratio.observar(ratio_dir, olho='direito')
+    return face, ratio_esq, ratio_dir, mar
+
+
+def decidir(resultado, tempo_atual):
+    """
+    Passo 2: Aplica a lógica do timer e aciona Arduino/notificações.
+
+    Returns:
+        (estado, cor, ambos_fechados_agora), ou None se não há rosto no quadro
+    """
+    if resultado is None:
+        if arduino:
+            arduino.registrar_atividade()  # A detecção segue viva: mantém o heartbeat
+        if telemetria:
+            telemetria.gravar_sem_rosto(tempo_atual, timer.alerta_sonolencia_acionado)
+        if agendador:
+            agendador.atualizar(None, None, timer)
+        return None
+
+    inicio = time.perf_counter()
+    _, ratio_esq, ratio_dir, mar = resultado
+    alerta_fadiga = False
+    if monitor_fadiga:
+        monitor_fadiga.atualizar(tempo_atual, ratio_esq, ratio_dir, mar)
+        alerta_fadiga = monitor_fadiga.alerta_disparado
+    decisao = timer.processar(ratio_esq, ratio_dir, tempo_atual, alerta_fadiga=alerta_fadiga)
+    alerta_por_fadiga = decisao.alerta_disparado and timer.motivo_alerta == MOTIVO_FADIGA
+
+    # Ajusta a taxa de inferência conforme o quão longe os olhos estão de fechar
+    if agendador:
+        agendador.atualizar(ratio_esq, ratio_dir, timer)
+
+    # Envia para o Arduino (o atuador só escreve na serial quando o estado muda)
+    if arduino:
+        arduino.definir_estado(decisao.comando, tempo_origem=tempo_atual)
+
+    if telemetria:
+        telemetria.gravar(tempo_atual, ratio_esq, ratio_dir, decisao.estado, decisao.comando,
+                          timer.alerta_sonolencia_acionado)
+
+    if decisao.alerta_disparado:
+        metrica_alertas.inc()
+        if not alerta_por_fadiga:
+            metrica_atraso_alerta.observar(timer.tempo_com_olhos_fechados)
+
+    # Envia notificação remota se configurado
+    # (as notificações sobem em paralelo; um alerta antes delas ficarem prontas é entregue
+    # depois, sem travar o Arduino e a tela esperando a conexão dos canais)
+    notificar = decisao.alerta_disparado and not notificacoes_desabilitadas()
+    mensagem = None
+    if alerta_por_fadiga and notificar:
+        mensagem = (
+            f"⚠️ <b>SINAIS DE FADIGA DETECTADOS!</b>\n\n"
+            f"🕐 Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n"
+            f"📈 {monitor_fadiga.resumo()}\n\n"
+            f"🚨 O sistema emitiu alertas sonoros e visuais antes de um fechamento longo dos olhos."
+        )
+    elif notificar:
+        mensagem = (
+            f"⚠️ <b>ALERTA DE SONOLÊNCIA DETECTADA!</b>\n\n"
+            f"🕐 Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n"
+            f"👁️ Ratio Olho Esquerdo: {ratio_esq:.1f}\n"
+            f"👁️ Ratio Olho Direito: {ratio_dir:.1f}\n"
+            f"⏱️ Tempo com olhos fechados: {timer.tempo_com_olhos_fechados:.1f}s\n"
+            f"⚠️ <b>Ambos os olhos foram detectados como fechados por {TEMPO_MINIMO_OLHOS_FECHADOS}s!</b>\n\n"
+            f"🚨 O sistema emitiu alertas sonoros e visuais."
+        )
+    if mensagem:
+        if evidencias:
+            # A evidência é codificada fora da detecção e segue junto com a mensagem
+            evidencias.solicitar(mensagem)
         else:
-            # Olhos abertos
-            # Se o alerta está ativo, mantém ativo até passar 3 segundos com olhos abertos
-            if alerta_sonolencia_acionado:
-                estado = "ALERTA ATIVO"
-                cor = (0, 165, 255) # Laranja na tela para indicar alerta persistente
-                # Inicia o contador de olhos abertos se ainda não foi iniciado
-                if tempo_inicio_olhos_abertos is None:
-                    tempo_inicio_olhos_abertos = tempo_atual
-                
-                # Calcula quanto tempo os olhos estão abertos
-                tempo_com_olhos_abertos = tempo_atual - tempo_inicio_olhos_abertos
-                
-                # Se passou 3 segundos com olhos abertos, desliga o alerta
-                if tempo_com_olhos_abertos >= TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR:
-                    # DESLIGA O ALERTA
-                    estado = "OLHOS ABERTOS"
-                    cor = (0, 255, 0) # Verde na tela
-                    comando = 'A'
-                    alerta_sonolencia_acionado = False
-                    tempo_inicio_olhos_abertos = None
-                    tempo_inicio_olhos_fechados = None
-                    
-                    if arduino:
-                        arduino.write(comando.encode())
-                else:
-                    # Ainda não passou 3 segundos - mantém alerta ativo
-                    comando = 'F'
-                    if arduino:
-                        arduino.write(comando.encode())
-            else:
-                # Alerta não está ativo - estado normal
-                estado = "OLHOS ABERTOS"
-                cor = (0, 255, 0) # Verde na tela
-                comando = 'A'
-                tempo_inicio_olhos_fechados = None
-                tempo_inicio_olhos_abertos = None
-                
-                if arduino:
-                    arduino.write(comando.encode())
+            enviar_alerta(mensagem)
+
+    metrica_tempo_decisao.observar(time.perf_counter() - inicio)
+    return decisao.estado, CORES_ESTADO[decisao.estado], decisao.ambos_fechados
+
+
+# Momento em que as janelas foram atualizadas pela última vez (para limitar a taxa)
+ultima_exibicao = 0.0
+
+
+def renderizar(img, resultado, decisao, tempo_atual):
+    """
+    Passo 3: Desenha os indicadores e mostra as duas janelas.
+
+    Returns:
+        False se o usuário apertou 'q' para sair
+    """
+    global ultima_exibicao
+
+    # Sem monitor: nenhum trabalho de exibição, toda a CPU fica para a inferência
+    if MODO_HEADLESS:
+        return True
+
+    # Limita a taxa de atualização das janelas; os quadros pulados não são desenhados
+    agora = time.perf_counter()
+    if FPS_MAXIMO_JANELA and agora - ultima_exibicao < 1.0 / FPS_MAXIMO_JANELA:
+        return True
+    ultima_exibicao = agora
+
+    # Cria uma cópia da imagem original para a janela limpa (sem sobreposições)
+    img_limpa = None if SOMENTE_JANELA_INDICADORES else img.copy()
+
+    if resultado is not None:
+        face, ratio_esq, ratio_dir, _ = resultado
+        estado, cor, ambos_fechados_agora = decisao
 
         # ===== JANELA COM INDICADORES =====
         # Adiciona todos os indicadores na imagem com informações
@@ -247,14 +552,18 @@ while True:
         
         # Desenha na tela para feedback visual (fonte menor para evitar cortes)
         cv2.putText(img, estado, (50, 130), cv2.FONT_HERSHEY_PLAIN, 2, cor, 2)
+
+        if monitor_fadiga and monitor_fadiga.pontuacao is not None:
+            cv2.putText(img, f'Fadiga: {monitor_fadiga.pontuacao:.2f}', (50, 220),
+                        cv2.FONT_HERSHEY_PLAIN, 2, (255, 0, 0), 2)
         
         # Mostra contador de tempo se os olhos estão fechados (mas ainda não acionou alerta)
-        if ambos_fechados_agora and tempo_inicio_olhos_fechados is not None and not alerta_sonolencia_acionado:
-            tempo_decorrido = tempo_atual - tempo_inicio_olhos_fechados
+        if ambos_fechados_agora and timer.tempo_inicio_olhos_fechados is not None and not timer.alerta_sonolencia_acionado:
+            tempo_decorrido = tempo_atual - timer.tempo_inicio_olhos_fechados
             tempo_restante = max(0, TEMPO_MINIMO_OLHOS_FECHADOS - tempo_decorrido)
             cv2.putText(img, f'Aguardando: {tempo_restante:.1f}s', (50, 180), 
                        cv2.FONT_HERSHEY_PLAIN, 2, (0, 165, 255), 2)  # Laranja
-        elif alerta_sonolencia_acionado:
+        elif timer.alerta_sonolencia_acionado:
             # Alerta está ativo - mostra informação específica
             if ambos_fechados_agora:
                 # Olhos fechados durante alerta
@@ -262,8 +571,8 @@ while True:
                            cv2.FONT_HERSHEY_PLAIN, 2, (0, 0, 255), 2)  # Vermelho
             else:
                 # Olhos abertos, mas alerta ainda ativo (aguardando 3s para desligar)
-                if tempo_inicio_olhos_abertos is not None:
-                    tempo_decorrido_aberto = tempo_atual - tempo_inicio_olhos_abertos
+                if timer.tempo_inicio_olhos_abertos is not None:
+                    tempo_decorrido_aberto = tempo_atual - timer.tempo_inicio_olhos_abertos
                     tempo_restante_desligar = max(0, TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR - tempo_decorrido_aberto)
                     cv2.putText(img, f'Desligando em: {tempo_restante_desligar:.1f}s', (50, 180), 
                                cv2.FONT_HERSHEY_PLAIN, 1, (0, 0, 255), 1)  # Vermelho, fonte menor
@@ -273,28 +582,119 @@ while True:
         
         # Desenha os pontos dos olhos para ficar "tech"
         # Olho esquerdo
-        cv2.circle(img, ponto_cima_esq, 3, cor, cv2.FILLED)
-        cv2.circle(img, ponto_baixo_esq, 3, cor, cv2.FILLED)
+        cv2.circle(img, face[159], 3, cor, cv2.FILLED)
+        cv2.circle(img, face[145], 3, cor, cv2.FILLED)
         # Olho direito
-        cv2.circle(img, ponto_cima_dir, 3, cor, cv2.FILLED)
-        cv2.circle(img, ponto_baixo_dir, 3, cor, cv2.FILLED)
+        cv2.circle(img, face[386], 3, cor, cv2.FILLED)
+        cv2.circle(img, face[374], 3, cor, cv2.FILLED)
 
     # ===== MOSTRA AS DUAS JANELAS =====
     # Redimensiona as imagens para o tamanho configurado
     img_redimensionada = cv2.resize(img, (TAMANHO_JANELA_LARGURA, TAMANHO_JANELA_ALTURA))
-    img_limpa_redimensionada = cv2.resize(img_limpa, (TAMANHO_JANELA_LARGURA, TAMANHO_JANELA_ALTURA))
     
     # Janela 1: Com todos os indicadores e informações técnicas
     cv2.imshow("Detector de Sonolencia - UFG (Com Indicadores)", img_redimensionada)
     
     # Janela 2: Completamente limpa, ideal para apresentação
-    cv2.imshow("Detector de Sonolencia - UFG (Apresentacao)", img_limpa_redimensionada)
+    if img_limpa is not None:
+        img_limpa_redimensionada = cv2.resize(img_limpa, (TAMANHO_JANELA_LARGURA, TAMANHO_JANELA_ALTURA))
+        cv2.imshow("Detector de Sonolencia - UFG (Apresentacao)", img_limpa_redimensionada)
     
-    # Aperte 'q' para sair
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    return not tecla_saida_apertada()
+
+
+def tecla_saida_apertada():
+    """Processa os eventos das janelas e retorna True se o usuário apertou 'q' para sair."""
+    if MODO_HEADLESS:
+        return False
+    return cv2.waitKey(1) & 0xFF == ord('q')
+
+
+# A detecção começa assim que a câmera e o modelo estão prontos
+cap = inicializacao.obter('camera')
+detector = inicializacao.obter('modelo')
+print(f"✓ Câmera e modelo prontos em {time.perf_counter() - INICIO_PROGRAMA:.2f}s")
+
+if MODO_PIPELINE:
+    # Captura, inferência e decisão em threads separadas: a decisão sempre usa o quadro mais novo
+    pipeline = PipelineDeteccao(cap, inferir, capacidade_fila=TAMANHO_FILAS_PIPELINE, agendador=agendador,
+                                buffer_quadros=buffer_evidencia)
+    pipeline.iniciar()
+    ultimo_relatorio = time.time()
+
+    REGISTRO.medidor('pipeline_descartados_antes_inferencia', 'Quadros descartados antes da inferência',
+                     funcao=lambda: pipeline.fila_captura.descartados)
+    REGISTRO.medidor('pipeline_descartados_antes_decisao', 'Resultados descartados antes da decisão',
+                     funcao=lambda: pipeline.fila_resultados.descartados)
+
+    try:
+        while pipeline.ativo():
+            quadro = pipeline.proximo_resultado()
+            if quadro is None:
+                # Sem resultado novo (ex: taxa reduzida): as janelas continuam respondendo
+                if tecla_saida_apertada():
+                    break
+                continue
+
+            decisao = decidir(quadro.resultado, quadro.tempo_captura)
+            inicializacao.marcar_primeira_decisao()
+            metrica_latencia_pipeline.observar(pipeline.registrar_decisao(quadro))
+
+            if not renderizar(quadro.img, quadro.resultado, decisao, quadro.tempo_captura):
+                break
+
+            if time.time() - ultimo_relatorio >= INTERVALO_RELATORIO_PIPELINE:
+                print(pipeline.relatorio())
+                ultimo_relatorio = time.time()
+    except KeyboardInterrupt:
+        pass  # Ctrl+C encerra normalmente (único jeito de sair no modo headless)
+    finally:
+        pipeline.parar()
+        print(pipeline.relatorio())
+else:
+    try:
+        while True:
+            success, img = cap.read()
+            if not success:
+                break
+
+            tempo_atual = cap.ultimo_tempo  # Momento do grab (ver captura.py)
+            if buffer_evidencia:
+                buffer_evidencia.gravar(img, tempo_atual)
+            # Quadro pulado pela taxa adaptativa: olhos claramente abertos, nada a decidir
+            if agendador and not agendador.deve_inferir(tempo_atual):
+                # As janelas continuam respondendo (e o 'q' continua valendo) com a taxa reduzida
+                if tecla_saida_apertada():
+                    break
+                continue
+
+            resultado = inferir(img)
+            decisao = decidir(resultado, tempo_atual)
+            inicializacao.marcar_primeira_decisao()
+
+            if not renderizar(img, resultado, decisao, tempo_atual):
+                break
+    except KeyboardInterrupt:
+        pass  # Ctrl+C encerra normalmente (único jeito de sair no modo headless)
 
 cap.release()
-cv2.destroyAllWindows()
+if not MODO_HEADLESS:
+    cv2.destroyAllWindows()
+print(inicializacao.relatorio())
+if hasattr(detector, 'relatorio'):
+    print(detector.relatorio())
+if agendador:
+    print(agendador.relatorio())
 if arduino:
-    arduino.close()
\ No newline at end of file
+    print(arduino.relatorio())
+    arduino.close()
+if telemetria:
+    telemetria.fechar()
+if evidencias:
+    # Termina a evidência de um alerta recente antes de encerrar as notificações
+    evidencias.encerrar()
+notif_manager = inicializacao.obter('notificacoes')
+inicializacao.encerrar()
+if notif_manager:
+    # Dá um tempo para as notificações que ainda estão na fila serem enviadas
+    notif_manager.encerrar()
@@ -0,0 +1,96 @@
+"""
+Inicialização em paralelo do Detector de Sonolência.
+
+Câmera, malha facial (com uma inferência de aquecimento), serial do Arduino e canais de
+notificação sobem ao mesmo tempo, cada um numa thread. A detecção começa assim que a
+câmera e o modelo estão prontos; o resto termina em segundo plano.
+
+Uso:
+    inicializacao = Inicializacao()
+    inicializacao.iniciar('camera', abrir_camera)
+    inicializacao.iniciar('modelo', criar_detector)
+    cap = inicializacao.obter('camera')
+    ...
+    inicializacao.marcar_primeira_decisao()
+    print(inicializacao.relatorio())
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentacao import REGISTRO
+
+
+class Inicializacao:
+    """Roda as etapas de inicialização em paralelo e mede quanto cada uma levou."""
+
+    def __init__(self, inicio=None, max_etapas=8):
+        """
+        Args:
+            inicio: time.perf_counter() do começo do programa (padrão: agora)
+            max_etapas: Quantas etapas podem rodar ao mesmo tempo
+        """
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self._executor = ThreadPoolExecutor(max_workers=max_etapas, thread_name_prefix="inicializacao")
+        self._etapas = {}
+        self.duracoes = {}  # Etapa -> segundos desde o início do programa até ficar pronta
+        self.tempo_ate_primeira_decisao = None
+        self._trava = threading.Lock()
+
+        REGISTRO.medidor('detector_tempo_ate_primeira_decisao_segundos',
+                         'Tempo entre o início do programa e a primeira decisão',
+                         funcao=lambda: self.tempo_ate_primeira_decisao or 0)
+
+    def iniciar(self, nome, funcao, *args, **kwargs):
+        """Dispara uma etapa em segundo plano. Retorna o Future."""
+        def _rodar():
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                with self._trava:
+                    self.duracoes[nome] = time.perf_counter() - self.inicio
+
+        etapa = self._executor.submit(_rodar)
+        self._etapas[nome] = etapa
+        return etapa
+
+    def obter(self, nome, timeout=None):
+        """Espera a etapa terminar e retorna o resultado (relança a exceção, se ela falhou)."""
+        return self._etapas[nome].result(timeout)
+
+    def pronta(self, nome):
+        return self._etapas[nome].done()
+
+    def quando_pronta(self, nome, funcao):
+        """
+        Chama funcao(resultado) quando a etapa terminar, sem bloquear quem chama: na hora,
+        se ela já terminou, ou na thread da etapa. Não chama nada se a etapa falhou.
+        """
+        def _chamar(etapa):
+            if etapa.exception() is None:
+                funcao(etapa.result())
+
+        self._etapas[nome].add_done_callback(_chamar)
+
+    def marcar_primeira_decisao(self):
+        """Registra a primeira decisão (só a primeira chamada conta)."""
+        if self.tempo_ate_primeira_decisao is None:
+            self.tempo_ate_primeira_decisao = time.perf_counter() - self.inicio
+            print(f"✓ Primeira decisão em {self.tempo_ate_primeira_decisao:.2f}s")
+
+    def encerrar(self):
+        """Libera as threads de inicialização (não espera etapas ainda em andamento)."""
+        self._executor.shutdown(wait=False)
+
+    def relatorio(self):
+        """Texto com o tempo de cada etapa e o tempo até a primeira decisão."""
+        with self._trava:
+            etapas = sorted(self.duracoes.items(), key=lambda item: item[1])
+        texto_etapas = ' | '.join(f"{nome}: {duracao:.2f}s" for nome, duracao in etapas) or "nenhuma"
+        primeira = (f"{self.tempo_ate_primeira_decisao:.2f}s"
+                    if self.tempo_ate_primeira_decisao is not None else "nenhuma decisão")
+        return (
+            f"[Inicialização] Etapas prontas em: {texto_etapas}\n"
+            f"[Inicialização] Tempo até a primeira decisão: {primeira}"
+        )
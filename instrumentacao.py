@@ -0,0 +1,213 @@
+"""
+Instrumentação do Detector de Sonolência: contadores, medidores e histogramas de baixo custo,
+expostos em formato texto do Prometheus num endpoint HTTP local (/metrics).
+
+Registrar um valor custa só um lock e uma soma; a formatação do texto acontece apenas
+quando alguém consulta o endpoint, numa thread separada do loop de detecção.
+
+Uso:
+    from instrumentacao import REGISTRO, iniciar_servidor_metricas
+    quadros = REGISTRO.contador('detector_quadros_total', 'Quadros processados')
+    quadros.inc()
+    iniciar_servidor_metricas(porta=9108)
+    # curl http://127.0.0.1:9108/metrics
+"""
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites padrão de histogramas de tempo (em segundos)
+LIMITES_TEMPO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{valor}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatar_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._trava = threading.Lock()
+
+    def _chave(self, rotulos):
+        if len(rotulos) != len(self.rotulos):
+            raise ValueError(f"{self.nome} espera os rótulos {self.rotulos}, recebeu {tuple(rotulos)}")
+        return tuple(str(rotulos[nome]) for nome in self.rotulos)
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} {self.tipo}']
+        linhas.extend(self._amostras())
+        return linhas
+
+    def _amostras(self):
+        raise NotImplementedError
+
+
+class Contador(_Metrica):
+    """Valor que só cresce (ex: quadros processados, falhas de envio)."""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        super().__init__(nome, ajuda, rotulos)
+        self._valores = {} if self.rotulos else {(): 0}
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        return self._valores.get(self._chave(rotulos), 0)
+
+    def _amostras(self):
+        with self._trava:
+            itens = list(self._valores.items())
+        return [f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(valor)}'
+                for chave, valor in itens]
+
+
+class Medidor(_Metrica):
+    """
+    Valor que sobe e desce (ex: tamanho de fila). Com `funcao`, o valor é lido só na
+    hora da consulta, sem nenhum custo no loop.
+    """
+
+    tipo = 'gauge'
+
+    def __init__(self, nome, ajuda, funcao=None):
+        super().__init__(nome, ajuda)
+        self._valor = 0
+        self._funcao = funcao
+
+    def definir(self, valor):
+        self._valor = valor
+
+    def _amostras(self):
+        valor = self._funcao() if self._funcao is not None else self._valor
+        return [f'{self.nome} {_formatar_numero(valor)}']
+
+
+class Histograma(_Metrica):
+    """Distribuição de valores em faixas (ex: tempo por quadro, ratio dos olhos)."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, limites=LIMITES_TEMPO, rotulos=()):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites))
+        self._series = {}
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        indice = bisect_left(self.limites, valor)
+        with self._trava:
+            serie = self._series.get(chave)
+            if serie is None:
+                # [contagem por faixa (+ faixa infinita), soma, total]
+                serie = self._series[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def _amostras(self):
+        with self._trava:
+            series = [(chave, list(faixas), soma, total) for chave, (faixas, soma, total) in self._series.items()]
+        linhas = []
+        for chave, faixas, soma, total in series:
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float('inf'),), faixas):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, chave, f'le="{_formatar_numero(limite)}"')
+                linhas.append(f'{self.nome}_bucket{rotulos} {acumulado}')
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f'{self.nome}_sum{rotulos} {_formatar_numero(soma)}')
+            linhas.append(f'{self.nome}_count{rotulos} {total}')
+        return linhas
+
+
+class Registro:
+    """Conjunto de métricas exportadas juntas. Pedir a mesma métrica duas vezes devolve a mesma instância."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._trava = threading.Lock()
+
+    def _obter(self, classe, nome, *args, **kwargs):
+        with self._trava:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, *args, **kwargs)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"Métrica '{nome}' já registrada com outro tipo")
+            return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._obter(Contador, nome, ajuda, rotulos)
+
+    def medidor(self, nome, ajuda, funcao=None):
+        return self._obter(Medidor, nome, ajuda, funcao)
+
+    def histograma(self, nome, ajuda, limites=LIMITES_TEMPO, rotulos=()):
+        return self._obter(Histograma, nome, ajuda, limites, rotulos)
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus."""
+        with self._trava:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        return '\n'.join(linhas) + '\n'
+
+
+# Registro global usado por todos os módulos do detector
+REGISTRO = Registro()
+
+
+def iniciar_servidor_metricas(porta=9108, host='127.0.0.1', registro=REGISTRO):
+    """
+    Sobe o endpoint /metrics numa thread de fundo.
+
+    Args:
+        porta: Porta HTTP
+        host: Interface de rede ('127.0.0.1' = só acessível na própria máquina)
+        registro: Registro a exportar
+
+    Returns:
+        O servidor HTTP (use shutdown() para parar)
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            corpo = registro.exportar().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, formato, *args):
+            pass  # Não polui o console a cada consulta
+
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
@@ -0,0 +1,197 @@
+"""
+Máquina de estados do alerta de sonolência, independente de câmera, Arduino e relógio real.
+
+Consome eventos (timestamp, ratio_esq, ratio_dir) e emite eventos de atuação ('A'/'F' para
+o Arduino, só quando o comando muda) e de notificação (quando o alerta é acionado).
+O relógio é injetável: ao vivo usa time.time(); no replay de logs usa os timestamps
+gravados, o que permite reprocessar meses de dados milhares de vezes mais rápido que
+o tempo real (ver replay_ratios.py).
+"""
+
+import time
+from collections import namedtuple
+
+# Estados mostrados na tela
+ESTADO_OLHOS_ABERTOS = "OLHOS ABERTOS"
+ESTADO_AMBOS_FECHADOS = "AMBOS FECHADOS"
+ESTADO_ALERTA_ATIVO = "ALERTA ATIVO"
+
+# O que acionou o alerta
+MOTIVO_OLHOS_FECHADOS = "olhos_fechados"
+MOTIVO_FADIGA = "fadiga"  # Pontuação de fadiga (ver sinais_fadiga.py)
+
+# --- EVENTOS EMITIDOS ---
+# Mudança do comando do Arduino ('A' = seguro, 'F' = alarme)
+EventoAtuacao = namedtuple('EventoAtuacao', 'timestamp comando')
+# Alerta acionado: deve gerar notificação remota
+EventoNotificacao = namedtuple('EventoNotificacao', 'timestamp ratio_esq ratio_dir tempo_olhos_fechados motivo',
+                               defaults=(MOTIVO_OLHOS_FECHADOS,))
+# Alerta desligado depois de os olhos ficarem abertos tempo suficiente
+EventoAlertaEncerrado = namedtuple('EventoAlertaEncerrado', 'timestamp duracao')
+
+# Resultado de cada quadro processado
+Decisao = namedtuple('Decisao', 'estado comando ambos_fechados alerta_disparado eventos')
+
+
+class RelogioSimulado:
+    """Relógio controlado manualmente, para testes e simulações."""
+
+    def __init__(self, inicio=0.0):
+        self.agora = inicio
+
+    def __call__(self):
+        return self.agora
+
+    def avancar(self, segundos):
+        self.agora += segundos
+        return self.agora
+
+
+class MaquinaEstadosSonolencia:
+    """
+    Lógica do timer de alerta: os olhos precisam ficar fechados por um tempo mínimo
+    para acionar o alerta, e abertos por outro tempo para desligá-lo.
+    """
+
+    def __init__(self, ratio_threshold=23, tempo_minimo_olhos_fechados=3.0,
+                 tempo_olhos_abertos_para_desligar=3.0, relogio=time.time):
+        """
+        Args:
+            ratio_threshold: Ratio abaixo do qual o olho é considerado fechado
+            tempo_minimo_olhos_fechados: Segundos com os olhos fechados para acionar o alerta
+            tempo_olhos_abertos_para_desligar: Segundos com os olhos abertos para desligar o alerta
+            relogio: Função que retorna o tempo atual em segundos, usada quando o
+                timestamp não é informado (padrão: time.time)
+        """
+        self.ratio_threshold = ratio_threshold
+        self.tempo_minimo_olhos_fechados = tempo_minimo_olhos_fechados
+        self.tempo_olhos_abertos_para_desligar = tempo_olhos_abertos_para_desligar
+        self.relogio = relogio
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Volta ao estado inicial (olhos abertos, sem alerta)."""
+        # --- VARIÁVEIS DE CONTROLE DO TIMER ---
+        self.tempo_inicio_olhos_fechados = None  # Quando os olhos foram fechados pela primeira vez
+        self.alerta_sonolencia_acionado = False  # Se o alerta já foi acionado (e ainda está ativo)
+        self.tempo_inicio_olhos_abertos = None  # Quando os olhos abriram após o alerta (para contar 3s)
+        self.tempo_com_olhos_fechados = 0.0
+        self.tempo_inicio_alerta = None
+        self.motivo_alerta = None
+        self.ultimo_comando = None
+
+    def processar(self, ratio_esq, ratio_dir, timestamp=None, alerta_fadiga=False):
+        """
+        Processa um quadro com rosto detectado.
+
+        Args:
+            ratio_esq: Ratio do olho esquerdo
+            ratio_dir: Ratio do olho direito
+            timestamp: Momento do quadro, em segundos (padrão: lê o relógio injetado)
+            alerta_fadiga: True para acionar o alerta sem esperar o fechamento longo
+                (ex: pontuação de fadiga alta). Desliga como qualquer alerta, depois de
+                os olhos ficarem abertos pelo tempo configurado.
+
+        Returns:
+            Decisao(estado, comando, ambos_fechados, alerta_disparado, eventos)
+        """
+        tempo_atual = self.relogio() if timestamp is None else timestamp
+        eventos = []
+
+        # --- TOMADA DE DECISÃO ---
+        # Valor de corte: Quanto menor o threshold, mais tolerante o sistema será.
+        # Agora verificamos se AMBOS os olhos estão fechados
+        olho_esq_fechado = ratio_esq < self.ratio_threshold
+        olho_dir_fechado = ratio_dir < self.ratio_threshold
+        ambos_fechados_agora = olho_esq_fechado and olho_dir_fechado
+        alerta_disparado = False
+
+        # Tempo do episódio atual de olhos fechados: zera assim que os olhos abrem, para um
+        # alerta com os olhos abertos (fadiga) não levar o tempo de um episódio anterior
+        if not ambos_fechados_agora:
+            self.tempo_com_olhos_fechados = 0.0
+        elif self.tempo_inicio_olhos_fechados is not None:
+            self.tempo_com_olhos_fechados = tempo_atual - self.tempo_inicio_olhos_fechados
+
+        if alerta_fadiga and not self.alerta_sonolencia_acionado:
+            # ACIONA ALERTAS pela fadiga acumulada (PERCLOS, piscadas lentas, bocejos)
+            self.alerta_sonolencia_acionado = True
+            self.tempo_inicio_olhos_abertos = None
+            self.tempo_inicio_alerta = tempo_atual
+            self.motivo_alerta = MOTIVO_FADIGA
+            alerta_disparado = True
+            eventos.append(EventoNotificacao(tempo_atual, ratio_esq, ratio_dir, self.tempo_com_olhos_fechados,
+                                             MOTIVO_FADIGA))
+
+        # --- LÓGICA DO TIMER PARA ALERTAS ---
+        if ambos_fechados_agora:
+            estado = ESTADO_AMBOS_FECHADOS
+
+            # Se os olhos fecharem durante período de alerta ativo, reseta o contador de olhos abertos
+            if self.alerta_sonolencia_acionado and self.tempo_inicio_olhos_abertos is not None:
+                self.tempo_inicio_olhos_abertos = None  # Reseta o contador - alerta continua
+
+            # Inicia o timer se os olhos acabaram de fechar
+            if self.tempo_inicio_olhos_fechados is None:
+                self.tempo_inicio_olhos_fechados = tempo_atual
+
+            # Verifica se já passou o tempo mínimo para acionar o alerta
+            self.tempo_com_olhos_fechados = tempo_atual - self.tempo_inicio_olhos_fechados
+
+            if (self.tempo_com_olhos_fechados >= self.tempo_minimo_olhos_fechados
+                    and not self.alerta_sonolencia_acionado):
+                # ACIONA ALERTAS: Arduino e notificações
+                self.alerta_sonolencia_acionado = True
+                self.tempo_inicio_olhos_abertos = None  # Garante que está None quando alerta é acionado
+                self.tempo_inicio_alerta = tempo_atual
+                self.motivo_alerta = MOTIVO_OLHOS_FECHADOS
+                alerta_disparado = True
+                eventos.append(EventoNotificacao(tempo_atual, ratio_esq, ratio_dir, self.tempo_com_olhos_fechados))
+
+            # Mantém o alerta enquanto os olhos estiverem fechados (após ter sido acionado);
+            # antes do tempo mínimo, mantém o Arduino em estado normal
+            comando = 'F' if self.alerta_sonolencia_acionado else 'A'
+
+        elif self.alerta_sonolencia_acionado:
+            # Olhos abertos, mas o alerta continua ativo até passar o tempo com olhos abertos
+            estado = ESTADO_ALERTA_ATIVO
+            # Inicia o contador de olhos abertos se ainda não foi iniciado
+            if self.tempo_inicio_olhos_abertos is None:
+                self.tempo_inicio_olhos_abertos = tempo_atual
+
+            # Se passou o tempo com olhos abertos, desliga o alerta
+            if tempo_atual - self.tempo_inicio_olhos_abertos >= self.tempo_olhos_abertos_para_desligar:
+                # DESLIGA O ALERTA
+                estado = ESTADO_OLHOS_ABERTOS
+                comando = 'A'
+                eventos.append(EventoAlertaEncerrado(tempo_atual, tempo_atual - self.tempo_inicio_alerta))
+                self.alerta_sonolencia_acionado = False
+                self.tempo_inicio_olhos_abertos = None
+                self.tempo_inicio_olhos_fechados = None
+                self.tempo_inicio_alerta = None
+                self.motivo_alerta = None
+            else:
+                # Ainda não passou o tempo - mantém alerta ativo
+                comando = 'F'
+
+        else:
+            # Alerta não está ativo - estado normal
+            estado = ESTADO_OLHOS_ABERTOS
+            comando = 'A'
+            self.tempo_inicio_olhos_fechados = None
+            self.tempo_inicio_olhos_abertos = None
+
+        # O Arduino só precisa saber das mudanças de comando
+        if comando != self.ultimo_comando:
+            eventos.append(EventoAtuacao(tempo_atual, comando))
+            self.ultimo_comando = comando
+
+        return Decisao(estado, comando, ambos_fechados_agora, alerta_disparado, eventos)
+
+    def consumir(self, fluxo):
+        """
+        Processa um fluxo de (timestamp, ratio_esq, ratio_dir) e gera só os eventos emitidos.
+        Útil para replay de logs em velocidade máxima.
+        """
+        for timestamp, ratio_esq, ratio_dir in fluxo:
+            yield from self.processar(ratio_esq, ratio_dir, timestamp).eventos
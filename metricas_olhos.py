@@ -0,0 +1,94 @@
+"""
+Cálculo vetorizado (NumPy) da abertura dos olhos (EAR - Eye Aspect Ratio).
+
+Recebe a malha facial inteira como array e calcula os dois olhos de uma vez:
+    EAR = média(distâncias verticais) / distância horizontal * 100
+
+Aceita um quadro (landmarks x 2) ou um lote (quadros x landmarks x 2), o que permite
+pontuar milhares de quadros de uma vez no processamento offline e nos benchmarks.
+
+Com a configuração DOIS_PONTOS o resultado é idêntico ao ratio original do
+detector (159/145/33/133 e 386/374/362/263), então RATIO_THRESHOLD continua valendo.
+"""
+
+import numpy as np
+
+# Cada olho: lista de pares verticais (cima, baixo) e o par horizontal (canto, canto)
+DOIS_PONTOS = {
+    'esquerdo': {'verticais': [(159, 145)], 'horizontal': (33, 133)},
+    'direito': {'verticais': [(386, 374)], 'horizontal': (362, 263)},
+}
+
+# EAR clássico de 6 pontos por olho: três pares verticais, menos sensível a ruído de um ponto só
+SEIS_PONTOS = {
+    'esquerdo': {'verticais': [(160, 144), (159, 145), (158, 153)], 'horizontal': (33, 133)},
+    'direito': {'verticais': [(385, 380), (386, 374), (387, 373)], 'horizontal': (362, 263)},
+}
+
+CONFIGURACOES = {
+    'dois_pontos': DOIS_PONTOS,
+    'seis_pontos': SEIS_PONTOS,
+}
+
+
+class CalculadoraEAR:
+    """
+    Calcula o EAR dos dois olhos em uma única operação vetorizada.
+    Os índices dos pontos são pré-calculados na criação do objeto.
+    """
+
+    def __init__(self, configuracao=DOIS_PONTOS):
+        """
+        Args:
+            configuracao: Dicionário com 'esquerdo' e 'direito' (ver DOIS_PONTOS),
+                ou o nome de uma configuração em CONFIGURACOES
+        """
+        if isinstance(configuracao, str):
+            if configuracao not in CONFIGURACOES:
+                raise ValueError(f"Configuração de EAR desconhecida: {configuracao!r} "
+                                 f"(use uma de {sorted(CONFIGURACOES)})")
+            configuracao = CONFIGURACOES[configuracao]
+
+        olhos = [configuracao['esquerdo'], configuracao['direito']]
+        if len(olhos[0]['verticais']) != len(olhos[1]['verticais']):
+            raise ValueError("Os dois olhos precisam ter a mesma quantidade de pares verticais")
+
+        # Índices em formato (2 olhos, V pares) e (2 olhos,)
+        self._vertical_a = np.array([[a for a, _ in olho['verticais']] for olho in olhos])
+        self._vertical_b = np.array([[b for _, b in olho['verticais']] for olho in olhos])
+        self._horizontal_a = np.array([olho['horizontal'][0] for olho in olhos])
+        self._horizontal_b = np.array([olho['horizontal'][1] for olho in olhos])
+
+        # Todos os pontos usados (útil para desenhar ou para recortar a malha)
+        self.pontos_usados = np.unique(np.concatenate([
+            self._vertical_a.ravel(), self._vertical_b.ravel(), self._horizontal_a, self._horizontal_b,
+        ]))
+
+    def calcular(self, landmarks):
+        """
+        Args:
+            landmarks: Array (landmarks, 2) de um quadro ou (quadros, landmarks, 2) de um lote.
+                Listas de pontos (como as do findFaceMesh) também são aceitas.
+
+        Returns:
+            Array (..., 2) com [ratio_esq, ratio_dir]; NaN onde a largura do olho é zero
+        """
+        pontos = np.asarray(landmarks, dtype=np.float64)
+
+        distancias_verticais = np.linalg.norm(
+            pontos[..., self._vertical_a, :] - pontos[..., self._vertical_b, :], axis=-1)
+        distancias_horizontais = np.linalg.norm(
+            pontos[..., self._horizontal_a, :] - pontos[..., self._horizontal_b, :], axis=-1)
+
+        abertura = distancias_verticais.mean(axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(distancias_horizontais > 0, abertura / distancias_horizontais * 100, np.nan)
+        return ratios
+
+
+_calculadora_padrao = CalculadoraEAR(DOIS_PONTOS)
+
+
+def calcular_ear(landmarks, calculadora=None):
+    """Atalho para CalculadoraEAR.calcular (padrão: configuração DOIS_PONTOS)."""
+    return (calculadora or _calculadora_padrao).calcular(landmarks)
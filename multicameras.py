@@ -0,0 +1,491 @@
+"""
+Modo de várias câmeras (ex: motorista + salão do ônibus) numa única máquina.
+
+Cada fonte (câmera ou vídeo) tem sua thread de captura, que grava o quadro mais novo direto
+em memória compartilhada (dois espaços por fonte: um sendo inferido, outro sendo gravado).
+Um grupo de processos trabalhadores roda a malha facial para todas as fontes: a vazão
+total cresce com o número de núcleos, em vez de ficar presa a um único loop.
+
+A distribuição é justa: as fontes são atendidas em rodízio, cada uma com no máximo um quadro
+em inferência por vez. Cada fonte é fixa num trabalhador (fonte i -> trabalhador i % N), que
+só mantém os detectores das suas fontes: o rastreamento interno do detector nunca vê quadros
+fora de ordem e a memória não cresce com trabalhadores x fontes. Cada fonte tem seu próprio
+timer de alerta, monitor de fadiga, Arduino e controle de notificações.
+
+Uso:
+    python multicameras.py --fluxo motorista=0@COM6 --fluxo salao=1 --trabalhadores 2
+    python multicameras.py --fluxo a=gravacoes/cabine01.mp4 --fluxo b=gravacoes/cabine02.mp4 --trabalhadores 4
+
+Com vídeos, o tempo de cada quadro é o tempo do vídeo (o timer reproduz a gravação) e cada
+quadro só é decodificado depois que o anterior foi para a inferência: os vídeos andam na
+velocidade máxima da inferência, sem descartar quadros, o que serve para medir a vazão sem
+câmeras. Com --tempo-real os vídeos fazem o papel de câmeras ao vivo (ver captura.FonteArquivo).
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from instrumentacao import REGISTRO
+from maquina_estados import MOTIVO_FADIGA, MaquinaEstadosSonolencia
+from metricas_olhos import CONFIGURACOES
+from sinais_fadiga import MonitorFadiga
+
+_QUADROS = REGISTRO.contador('multicameras_quadros_total', 'Quadros inferidos por fonte', rotulos=('fluxo',))
+_DESCARTADOS = REGISTRO.contador('multicameras_descartados_total',
+                                 'Quadros substituídos por um mais novo antes da inferência', rotulos=('fluxo',))
+_LATENCIA = REGISTRO.histograma('multicameras_captura_decisao_segundos',
+                                'Latência entre a captura do quadro e a decisão, por fonte', rotulos=('fluxo',))
+_ALERTAS = REGISTRO.contador('multicameras_alertas_total', 'Alertas acionados por fonte', rotulos=('fluxo',))
+
+
+def _trabalhador(numero, tarefas, resultados, memorias, opcoes_backend, metodo_ratio):
+    """
+    Processo trabalhador: recebe (fluxo, espaço), roda a malha facial no quadro que está
+    na memória compartilhada e devolve os ratios. Mantém um detector para cada fonte fixa
+    neste trabalhador (`memorias` só traz essas fontes).
+
+    Toda tarefa tem resposta, mesmo com erro: (trabalhador, fluxo, espaço, sinais, duração, erro),
+    com erro = None ou (fatal, texto). Falha ao criar o detector é fatal (o trabalhador encerra);
+    falha numa inferência descarta o detector daquela fonte, que é recriado na próxima tarefa.
+    """
+    import cv2
+
+    from backends_deteccao import criar_backend
+    from sinais_fadiga import CalculadoraSinais
+
+    # Cada processo já ocupa um núcleo: evita que o OpenCV abra mais threads por processo
+    cv2.setNumThreads(1)
+    blocos = {}
+    quadros = {}
+    for fluxo, (nome_memoria, forma) in memorias.items():
+        blocos[fluxo] = shared_memory.SharedMemory(name=nome_memoria)
+        quadros[fluxo] = np.ndarray((2,) + forma, dtype=np.uint8, buffer=blocos[fluxo].buf)
+    detectores = {}
+    calculadora = CalculadoraSinais(metodo_ratio)
+
+    try:
+        while True:
+            tarefa = tarefas.get()
+            if tarefa is None:
+                break
+            fluxo, espaco = tarefa
+            inicio = time.perf_counter()
+            if fluxo not in detectores:
+                try:
+                    detectores[fluxo] = criar_backend(**opcoes_backend)
+                except Exception as e:
+                    resultados.put((numero, fluxo, espaco, None, 0.0, (True, f"{type(e).__name__}: {e}")))
+                    break
+            try:
+                _, faces = detectores[fluxo].findFaceMesh(quadros[fluxo][espaco], draw=False)
+                sinais = calculadora.calcular(faces[0]) if faces else None
+            except Exception as e:
+                detectores.pop(fluxo, None)
+                resultados.put((numero, fluxo, espaco, None, time.perf_counter() - inicio,
+                                (False, f"{type(e).__name__}: {e}")))
+                continue
+            resultados.put((numero, fluxo, espaco, sinais, time.perf_counter() - inicio, None))
+    finally:
+        quadros.clear()
+        for bloco in blocos.values():
+            bloco.close()
+
+
+class Fluxo:
+    """Uma fonte de vídeo com a captura e o estado de alerta dela."""
+
+    def __init__(self, indice, nome, fonte, porta_arduino=None, parametros_timer=None, cooldown_notificacao=30,
+                 opcoes_captura=None):
+        """
+        Args:
+            indice: Número do fluxo (usado nas mensagens entre processos)
+            nome: Nome mostrado nos relatórios e nas notificações (ex: 'motorista')
+            fonte: Índice da câmera ou caminho de um vídeo
+            porta_arduino: Porta serial do Arduino desta fonte (None = sem Arduino)
+            parametros_timer: Argumentos da MaquinaEstadosSonolencia
+            cooldown_notificacao: Segundos mínimos entre notificações desta fonte
+            opcoes_captura: Argumentos de captura.abrir_fonte (resolução, formato, tempo_real...)
+        """
+        from captura import abrir_fonte
+
+        self.indice = indice
+        self.nome = nome
+        self.fonte = fonte
+        self.cooldown_notificacao = cooldown_notificacao
+        parametros_timer = parametros_timer or {}
+
+        self.cap = abrir_fonte(fonte, **(opcoes_captura or {}))
+        sucesso, img = self.cap.read()
+        if not sucesso:
+            raise RuntimeError(f"Não foi possível ler a fonte {fonte!r} do fluxo '{nome}'")
+
+        # Dois espaços na memória compartilhada: um em inferência e outro recebendo a captura
+        self.forma = img.shape
+        self._memoria = shared_memory.SharedMemory(create=True, size=2 * img.nbytes)
+        self.quadros = np.ndarray((2,) + self.forma, dtype=np.uint8, buffer=self._memoria.buf)
+        self.quadros[0] = img
+        self._tempos = [self.cap.ultimo_tempo, 0.0]
+        self._instantes = [self.cap.ultimo_instante, 0.0]
+        self._pronto = 0
+        self._em_uso = None
+        self._ultimo_gravado = 0
+        self._trava = threading.Lock()
+        # Vídeo sem limite de velocidade: a captura espera o quadro pronto ir para a inferência
+        # em vez de decodificar (e descartar) quadros sem parar
+        self._aguardar_consumo = getattr(self.cap, 'tempo_real', True) is False
+        self._consumido = threading.Condition(self._trava)
+
+        self.timer = MaquinaEstadosSonolencia(**parametros_timer)
+        self.monitor_fadiga = MonitorFadiga(self.timer.ratio_threshold)
+        self.arduino = None
+        if porta_arduino:
+            from atuador_serial import AtuadorSerial
+            self.arduino = AtuadorSerial(porta_arduino, 9600, intervalo_heartbeat=1.0)
+            self.arduino.iniciar()
+        self.ultima_notificacao = 0.0
+        self.trabalhador = None  # Definido pelo MultiCameras
+
+        self.quadros_capturados = 1
+        self.quadros_inferidos = 0
+        self.quadros_descartados = 0
+        self.alertas = 0
+        self.terminou = False
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop_captura, name=f"captura-{nome}", daemon=True)
+
+    @property
+    def nome_memoria(self):
+        return self._memoria.name
+
+    def iniciar(self):
+        self._thread.start()
+
+    def _loop_captura(self):
+        try:
+            while not self._parar.is_set():
+                with self._trava:
+                    if self._aguardar_consumo:
+                        while self._pronto is not None and not self._parar.is_set():
+                            self._consumido.wait(0.1)
+                        if self._parar.is_set():
+                            break
+                    # Nunca grava no espaço em inferência; um quadro pronto e ainda não
+                    # inferido é substituído pelo mais novo
+                    espaco = 1 - self._em_uso if self._em_uso is not None else 1 - self._ultimo_gravado
+                    if self._pronto == espaco:
+                        self._pronto = None
+                        self.quadros_descartados += 1
+                        _DESCARTADOS.inc(fluxo=self.nome)
+                destino = self.quadros[espaco]
+                # Lê direto na memória compartilhada quando o formato bate
+                sucesso, img = self.cap.read(destino)
+                if not sucesso:
+                    break
+                if not np.shares_memory(img, destino):
+                    np.copyto(destino, img)
+                with self._trava:
+                    if self._pronto is not None:
+                        # O quadro pronto anterior não chegou a ser inferido
+                        self.quadros_descartados += 1
+                        _DESCARTADOS.inc(fluxo=self.nome)
+                    # Momento do grab: a latência inclui decodificação e espera pelo trabalhador
+                    self._tempos[espaco] = self.cap.ultimo_tempo
+                    self._instantes[espaco] = self.cap.ultimo_instante
+                    self._pronto = espaco
+                    self._ultimo_gravado = espaco
+                self.quadros_capturados += 1
+        finally:
+            self.terminou = True
+
+    def retirar_pronto(self):
+        """Reserva o quadro mais novo para inferência. Returns: espaço ou None."""
+        with self._trava:
+            if self._em_uso is not None or self._pronto is None:
+                return None
+            self._em_uso, self._pronto = self._pronto, None
+            self._consumido.notify()
+            return self._em_uso
+
+    def liberar(self, espaco):
+        """
+        Devolve o espaço depois da inferência.
+
+        Returns:
+            (tempo do quadro, instante da captura em perf_counter)
+        """
+        with self._trava:
+            self._em_uso = None
+            return self._tempos[espaco], self._instantes[espaco]
+
+    def ocioso(self):
+        """True quando a fonte acabou e não há quadro pendente."""
+        with self._trava:
+            return self.terminou and self._pronto is None and self._em_uso is None
+
+    def parar(self):
+        self._parar.set()
+        with self._trava:
+            self._consumido.notify()
+        if self._thread.ident is not None:
+            self._thread.join(timeout=2)
+        self.cap.release()
+        if self.arduino:
+            self.arduino.close()
+        self.quadros = None
+        self._memoria.close()
+        self._memoria.unlink()
+
+
+class MultiCameras:
+    """Captura de várias fontes, inferência num grupo de processos e decisão por fonte."""
+
+    def __init__(self, fluxos, trabalhadores=None, opcoes_backend=None, metodo_ratio='dois_pontos',
+                 notificador=None):
+        """
+        Args:
+            fluxos: Lista de Fluxo
+            trabalhadores: Número de processos de inferência (padrão: núcleos - 1, mínimo 1; nunca
+                mais que o número de fontes, pois cada fonte é fixa num trabalhador)
+            opcoes_backend: Argumentos de backends_deteccao.criar_backend (padrão: cvzone)
+            metodo_ratio: Configuração de pontos do ratio (ver metricas_olhos.py)
+            notificador: NotificationManager compartilhado (opcional)
+        """
+        self.fluxos = fluxos
+        self.notificador = notificador
+        numero = min(trabalhadores or max(1, (os.cpu_count() or 2) - 1), len(fluxos))
+        self.trabalhadores = numero
+        for fluxo in fluxos:
+            fluxo.trabalhador = fluxo.indice % numero
+
+        contexto = multiprocessing.get_context('spawn')
+        self._resultados = contexto.Queue()
+        self._tarefas = [contexto.Queue() for _ in range(numero)]
+        self._processos = [
+            contexto.Process(target=_trabalhador, name=f"inferencia-{i}", daemon=True,
+                             args=(i, self._tarefas[i], self._resultados, self._memorias_do_trabalhador(i),
+                                   opcoes_backend or {}, metodo_ratio))
+            for i in range(numero)
+        ]
+        self._livres = list(range(numero))
+        self._vez = 0
+        self.inferencias_por_trabalhador = [0] * numero
+        self.erros_inferencia = 0
+        self.inicio = None
+
+    def _memorias_do_trabalhador(self, numero):
+        """Memória compartilhada (nome, forma) só das fontes fixas no trabalhador `numero`."""
+        return {fluxo.indice: (fluxo.nome_memoria, fluxo.forma)
+                for fluxo in self.fluxos if fluxo.trabalhador == numero}
+
+    def executar(self, duracao=None):
+        """Roda até todas as fontes acabarem, Ctrl+C ou `duracao` segundos."""
+        for processo in self._processos:
+            processo.start()
+        for fluxo in self.fluxos:
+            fluxo.iniciar()
+        self.inicio = time.perf_counter()
+        ultimo_relatorio = time.perf_counter()
+        try:
+            while duracao is None or time.perf_counter() - self.inicio < duracao:
+                self._despachar()
+                try:
+                    self._processar_resultado(self._resultados.get(timeout=0.002))
+                    # Processa tudo que já chegou antes de despachar de novo
+                    while True:
+                        self._processar_resultado(self._resultados.get_nowait())
+                except queue.Empty:
+                    pass
+                self._verificar_trabalhadores()
+                if len(self._livres) == len(self._processos) and all(f.ocioso() for f in self.fluxos):
+                    break
+                if time.perf_counter() - ultimo_relatorio >= 10:
+                    print(self.relatorio())
+                    ultimo_relatorio = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.encerrar()
+
+    def _despachar(self):
+        """Rodízio entre as fontes com quadro novo cujo trabalhador está livre."""
+        quantidade = len(self.fluxos)
+        for passo in range(quantidade):
+            if not self._livres:
+                return
+            posicao = (self._vez + passo) % quantidade
+            fluxo = self.fluxos[posicao]
+            if fluxo.trabalhador not in self._livres:
+                continue
+            espaco = fluxo.retirar_pronto()
+            if espaco is None:
+                continue
+            self._livres.remove(fluxo.trabalhador)
+            self._tarefas[fluxo.trabalhador].put((fluxo.indice, espaco))
+            self._vez = (posicao + 1) % quantidade
+
+    def _verificar_trabalhadores(self):
+        """Um trabalhador que morreu sem responder deixaria a fonte dele presa para sempre."""
+        for numero, processo in enumerate(self._processos):
+            if not processo.is_alive():
+                raise RuntimeError(f"O trabalhador de inferência {numero} terminou inesperadamente "
+                                   f"(código {processo.exitcode})")
+
+    def _processar_resultado(self, resultado):
+        trabalhador, indice, espaco, sinais, _, erro = resultado
+        fluxo = self.fluxos[indice]
+        tempo, instante_captura = fluxo.liberar(espaco)
+        if erro is not None:
+            fatal, texto = erro
+            if fatal:
+                raise RuntimeError(f"Trabalhador {trabalhador} não conseguiu criar o detector: {texto}")
+            print(f"ERRO: inferência do fluxo '{fluxo.nome}' no trabalhador {trabalhador}: {texto}")
+            self.erros_inferencia += 1
+            self._livres.append(trabalhador)
+            return
+        self._livres.append(trabalhador)
+        self.inferencias_por_trabalhador[trabalhador] += 1
+        fluxo.quadros_inferidos += 1
+        _QUADROS.inc(fluxo=fluxo.nome)
+        if sinais is not None:
+            self._decidir(fluxo, tempo, *sinais)
+        elif fluxo.arduino:
+            fluxo.arduino.registrar_atividade()
+        _LATENCIA.observar(time.perf_counter() - instante_captura, fluxo=fluxo.nome)
+
+    def _decidir(self, fluxo, tempo, ratio_esq, ratio_dir, mar):
+        """Timer, fadiga, Arduino e notificação da fonte (mesma lógica do eyes_detector.py)."""
+        fluxo.monitor_fadiga.atualizar(tempo, ratio_esq, ratio_dir, mar)
+        decisao = fluxo.timer.processar(ratio_esq, ratio_dir, tempo,
+                                        alerta_fadiga=fluxo.monitor_fadiga.alerta_disparado)
+        if fluxo.arduino:
+            fluxo.arduino.definir_estado(decisao.comando)
+        if not decisao.alerta_disparado:
+            return
+
+        fluxo.alertas += 1
+        _ALERTAS.inc(fluxo=fluxo.nome)
+        agora = time.time()
+        if self.notificador is None or agora - fluxo.ultima_notificacao < fluxo.cooldown_notificacao:
+            return
+        fluxo.ultima_notificacao = agora
+        if fluxo.timer.motivo_alerta == MOTIVO_FADIGA:
+            detalhe = f"📈 {fluxo.monitor_fadiga.resumo()}"
+        else:
+            detalhe = f"⏱️ Tempo com olhos fechados: {fluxo.timer.tempo_com_olhos_fechados:.1f}s"
+        self.notificador.enviar_notificacao(
+            f"⚠️ <b>ALERTA DE SONOLÊNCIA - {fluxo.nome.upper()}</b>\n\n"
+            f"🕐 Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n"
+            f"👁️ Ratios: {ratio_esq:.1f} / {ratio_dir:.1f}\n"
+            f"{detalhe}"
+        )
+
+    def encerrar(self):
+        for tarefas in self._tarefas:
+            tarefas.put(None)
+        for processo in self._processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        for fluxo in self.fluxos:
+            fluxo.parar()
+
+    def relatorio(self):
+        duracao = time.perf_counter() - self.inicio if self.inicio else 0.0
+        total = sum(fluxo.quadros_inferidos for fluxo in self.fluxos)
+        linhas = [f"[Multicâmeras] {total} inferências em {duracao:.1f}s "
+                  f"({total / duracao if duracao else 0:.1f}/s) | "
+                  f"Por trabalhador: {self.inferencias_por_trabalhador} | "
+                  f"Erros de inferência: {self.erros_inferencia}"]
+        for fluxo in self.fluxos:
+            linhas.append(
+                f"  {fluxo.nome}: capturados {fluxo.quadros_capturados} | inferidos {fluxo.quadros_inferidos} "
+                f"({fluxo.quadros_inferidos / duracao if duracao else 0:.1f}/s) | "
+                f"descartados {fluxo.quadros_descartados} | alertas {fluxo.alertas}"
+            )
+        return "\n".join(linhas)
+
+
+def interpretar_fluxo(texto):
+    """'nome=fonte[@porta]' -> (nome, fonte, porta). Fonte numérica é o índice da câmera."""
+    nome, _, resto = texto.partition('=')
+    if not nome or not resto:
+        raise argparse.ArgumentTypeError(f"Use nome=fonte[@porta], recebido: {texto!r}")
+    fonte, _, porta = resto.partition('@')
+    return nome, int(fonte) if fonte.isdigit() else fonte, porta or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector de sonolência com várias câmeras.")
+    parser.add_argument('--fluxo', action='append', type=interpretar_fluxo, required=True,
+                        help="nome=fonte[@porta_arduino], ex: motorista=0@COM6 ou cabine=video.mp4 (repetível)")
+    parser.add_argument('--trabalhadores', type=int, default=None,
+                        help="Processos de inferência (padrão: núcleos - 1)")
+    parser.add_argument('--duracao', type=float, default=None, help="Segundos de execução (padrão: até acabar)")
+    parser.add_argument('--backend', default='cvzone', choices=('cvzone', 'onnx'),
+                        help="Backend da malha facial (ver backends_deteccao.py)")
+    parser.add_argument('--modelo-onnx', default='modelos/face_landmark.onnx', help="Modelo do backend onnx")
+    parser.add_argument('--detector-rosto', default='modelos/face_detection_yunet_2023mar.onnx',
+                        help="Modelo YuNet do backend onnx")
+    parser.add_argument('--motor', default='onnxruntime', choices=('onnxruntime', 'opencv'),
+                        help="Motor do backend onnx")
+    parser.add_argument('--threads', type=int, default=1, help="Threads por inferência do backend onnx")
+    parser.add_argument('--metodo', default='dois_pontos', choices=sorted(CONFIGURACOES), help="Pontos do ratio")
+    parser.add_argument('--threshold', type=float, default=23, help="RATIO_THRESHOLD")
+    parser.add_argument('--tempo-fechados', type=float, default=3.0, help="TEMPO_MINIMO_OLHOS_FECHADOS")
+    parser.add_argument('--tempo-abertos', type=float, default=3.0, help="TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR")
+    parser.add_argument('--largura', type=int, default=None, help="Largura pedida às câmeras")
+    parser.add_argument('--altura', type=int, default=None, help="Altura pedida às câmeras")
+    parser.add_argument('--fps-camera', type=float, default=None, help="Quadros/s pedidos às câmeras")
+    parser.add_argument('--formato', default=None, choices=('MJPG', 'YUYV'), help="Formato pedido às câmeras")
+    parser.add_argument('--backend-captura', default='auto', help="Backend do OpenCV (ver captura.py)")
+    parser.add_argument('--tempo-real', action='store_true',
+                        help="Vídeos na velocidade real (padrão: o mais rápido possível)")
+    parser.add_argument('--config', default='config_notificacoes.py',
+                        help="Configuração das notificações (mesmo formato do config_notificacoes.py)")
+    args = parser.parse_args()
+    opcoes_backend = {'nome': args.backend}
+    if args.backend == 'onnx':
+        for caminho in (args.modelo_onnx, args.detector_rosto):
+            if not os.path.exists(caminho):
+                parser.error(f"modelo do backend onnx não encontrado: {caminho}")
+        opcoes_backend.update(caminho_modelo=args.modelo_onnx, caminho_detector_rosto=args.detector_rosto,
+                              motor=args.motor, threads=args.threads)
+
+    from coletor_frota import carregar_notificador
+
+    parametros_timer = {
+        'ratio_threshold': args.threshold,
+        'tempo_minimo_olhos_fechados': args.tempo_fechados,
+        'tempo_olhos_abertos_para_desligar': args.tempo_abertos,
+    }
+    opcoes_captura_camera = {
+        'backend': args.backend_captura, 'largura': args.largura, 'altura': args.altura,
+        'fps': args.fps_camera, 'formato': args.formato,
+    }
+    fluxos = [Fluxo(indice, nome, fonte, porta, parametros_timer,
+                    opcoes_captura=opcoes_captura_camera if isinstance(fonte, int) else {'tempo_real': args.tempo_real})
+              for indice, (nome, fonte, porta) in enumerate(args.fluxo)]
+    notificador = carregar_notificador(args.config, caminho_caixa='output/notificacoes_multicameras.db')
+    sistema = MultiCameras(fluxos, args.trabalhadores, opcoes_backend, args.metodo, notificador)
+    print(f"✓ {len(fluxos)} fonte(s), {sistema.trabalhadores} trabalhador(es) de inferência")
+    try:
+        sistema.executar(args.duracao)
+    except RuntimeError as e:
+        print(f"ERRO: {e}")
+        raise SystemExit(1)
+    finally:
+        print(sistema.relatorio())
+        if notificador:
+            notificador.encerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,306 @@
 """
 Módulo de Notificações Remotas para o Detector de Sonolência
-Suporta múltiplos métodos de notificação: Telegram, Email, etc.
+Suporta múltiplos métodos de notificação: Telegram, Email e o coletor central da frota.
+
+Os alertas passam por uma caixa de saída em disco (ver caixa_saida.py): nada se perde
+se a rede cair ou o programa for desligado antes do envio.
 """
 
+import http.client
+import mimetypes
+import socket
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from caixa_saida import BaldeFichas, CaixaSaida
+from instrumentacao import REGISTRO
+from protocolo_frota import codificar, em_lotes, evento_alerta, evento_heartbeat
+
+URL_API_TELEGRAM = "https://api.telegram.org"
+
+# Limite de taxa por canal: (envios por segundo, rajada máxima)
+LIMITES_CANAIS = {
+    "Telegram": (1.0, 3),
+    "Email": (0.1, 2),
+    "Frota": (20.0, 50),
+}
+
+# Espera entre tentativas depois de falhas seguidas de um canal: dobra a cada falha, até o máximo
+BACKOFF_INICIAL = 2.0
+BACKOFF_MAXIMO = 300.0
+
+# Quantos alertas listar (um por linha) no resumo enviado quando a conexão volta
+MAXIMO_ALERTAS_NO_RESUMO = 20
+
+# Tamanho máximo da legenda de uma foto/vídeo no Telegram (texto maior vai numa mensagem separada)
+LIMITE_LEGENDA_TELEGRAM = 1024
+
+# Canais que entregam a evidência do alerta (a frota recebe só o texto)
+CANAIS_COM_ANEXO = ("Telegram", "Email")
+
+# Métricas de envio (expostas no endpoint /metrics do detector)
+_TEMPO_ENVIO = REGISTRO.histograma('notificacao_envio_segundos', 'Tempo de envio da notificação por canal',
+                                   rotulos=('canal',))
+_ENVIADAS = REGISTRO.contador('notificacao_enviadas_total', 'Notificações enviadas com sucesso por canal',
+                              rotulos=('canal',))
+_FALHAS = REGISTRO.contador('notificacao_falhas_total', 'Falhas de envio de notificação por canal',
+                            rotulos=('canal',))
+_PENDENTES = REGISTRO.medidor('notificacao_pendentes', 'Notificações na caixa de saída aguardando envio')
+_RESUMOS = REGISTRO.contador('notificacao_resumos_total',
+                             'Resumos enviados no lugar de vários alertas acumulados', rotulos=('canal',))
+
+
+class AnexoPendente(Exception):
+    """O texto foi entregue, mas o anexo não (falha temporária): só o anexo deve ser reenviado."""
+
+    def __init__(self, anexo, causa):
+        super().__init__(f"texto entregue, anexo pendente ({causa})")
+        self.anexo = anexo
+
+
 class NotificationManager:
     """
     Gerenciador centralizado de notificações remotas.
     Suporta múltiplos métodos de notificação simultaneamente.
+
+    enviar_notificacao() só grava a mensagem na caixa de saída em disco e retorna
+    imediatamente. Uma thread de fundo entrega as pendentes de cada canal, respeitando
+    o limite de taxa do canal e esperando cada vez mais entre tentativas que falham.
+    Se vários alertas se acumularam (ex: veículo sem sinal), o canal recebe um único
+    resumo em vez de uma rajada de mensagens.
     """
     
-    def __init__(self, cooldown_segundos=30):
+    def __init__(self, cooldown_segundos=30, caminho_caixa='output/notificacoes.db',
+                 backoff_inicial=BACKOFF_INICIAL, backoff_maximo=BACKOFF_MAXIMO):
         """
         Inicializa o gerenciador de notificações.
         
         Args:
             cooldown_segundos: Tempo mínimo entre notificações (evita spam)
+            caminho_caixa: Banco SQLite da caixa de saída (None = só em memória, sem durabilidade)
+            backoff_inicial: Espera (em segundos) depois da primeira falha de um canal
+            backoff_maximo: Maior espera entre tentativas de um canal
         """
         self.cooldown = cooldown_segundos
         self.ultima_notificacao = 0
         self.telegram_enabled = False
         self.email_enabled = False
+        self.frota_enabled = False
+
+        # Conexões reaproveitadas entre envios
+        self._sessao_http = None
+        self._conexao_smtp = None
+        self._trava_smtp = threading.Lock()
+        self._socket_frota = None
+        self._conexao_frota = None
+        self._trava_frota = threading.Lock()
+
+        # Caixa de saída + thread de envio em segundo plano; os canais são enviados em paralelo
+        self._caixa = CaixaSaida(caminho_caixa)
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self._baldes = {canal: BaldeFichas(*limite) for canal, limite in LIMITES_CANAIS.items()}
+        self._falhas_seguidas = {canal: 0 for canal in LIMITES_CANAIS}
+        self._proxima_tentativa = {canal: 0.0 for canal in LIMITES_CANAIS}
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._executor_canais = ThreadPoolExecutor(max_workers=3, thread_name_prefix="notificacao-canal")
+        self._thread_envio = threading.Thread(target=self._loop_envio, name="notificacoes", daemon=True)
+        self._thread_envio.start()
+
+        pendentes = self._caixa.total_pendentes()
+        _PENDENTES.definir(pendentes)
+        if pendentes:
+            print(f"ℹ {pendentes} notificação(ões) pendente(s) de execuções anteriores serão enviadas")
         
-    def enviar_notificacao(self, mensagem):
+    def enviar_notificacao(self, mensagem, anexo=None):
         """
-        Envia notificação usando todos os métodos habilitados.
+        Agenda o envio da notificação por todos os métodos habilitados.
+        Não bloqueia: o envio real é feito pela thread de fundo.
         
         Args:
             mensagem: Texto da notificação
+            anexo: (nome_arquivo, bytes) opcional, ex: a evidência do alerta (ver evidencias.py).
+                Vai como foto/vídeo no Telegram e como anexo no email; a frota recebe só o texto.
+
+        Returns:
+            True se a notificação foi gravada na caixa de saída
         """
         # Verifica cooldown para evitar spam
         tempo_atual = time.time()
         if tempo_atual - self.ultima_notificacao < self.cooldown:
             return False
-        
-        sucesso = False
-        
+
+        canais = [nome for nome, _ in self._canais()]
+        if not canais:
+            return False
+
+        try:
+            self._caixa.adicionar(mensagem, canais, tempo_atual, anexo, canais_anexo=CANAIS_COM_ANEXO)
+        except sqlite3.Error as e:
+            print(f"ERRO ao gravar notificação na caixa de saída: {e}")
+            return False
+
+        # O cooldown passa a contar a partir da gravação (o envio é assíncrono)
+        self.ultima_notificacao = tempo_atual
+        self._acordar.set()
+        return True
+
+    def _canais(self):
+        """Canais habilitados: lista de (nome, função de envio)."""
+        canais = []
         # Envia via Telegram se habilitado
         if self.telegram_enabled:
-            try:
-                self._enviar_telegram(mensagem)
-                sucesso = True
-            except Exception as e:
-                print(f"ERRO ao enviar notificação Telegram: {e}")
-        
+            canais.append(("Telegram", self._enviar_telegram))
         # Envia via Email se habilitado
         if self.email_enabled:
+            canais.append(("Email", self._enviar_email))
+        # Envia ao coletor da frota se habilitado
+        if self.frota_enabled:
+            canais.append(("Frota", self._enviar_frota))
+        return canais
+
+    def _loop_envio(self):
+        """Thread de fundo: entrega as pendentes e dorme até a próxima tentativa ou um novo alerta."""
+        while not self._parar.is_set():
+            self._acordar.clear()
+            espera = self._descarregar()
+            self._acordar.wait(espera)
+
+    def _descarregar(self):
+        """
+        Tenta entregar as pendentes de todos os canais habilitados, em paralelo.
+
+        Returns:
+            Segundos até a próxima tentativa necessária, ou None se não há nada pendente
+        """
+        envios = [self._executor_canais.submit(self._descarregar_canal, nome, funcao)
+                  for nome, funcao in self._canais()]
+        esperas = []
+        for envio in envios:
             try:
-                self._enviar_email(mensagem)
-                sucesso = True
+                espera = envio.result()
             except Exception as e:
-                print(f"ERRO ao enviar notificação Email: {e}")
-        
-        if sucesso:
-            self.ultima_notificacao = tempo_atual
-        
-        return sucesso
+                print(f"ERRO na caixa de saída de notificações: {e}")
+                espera = self.backoff_maximo
+            if espera is not None:
+                esperas.append(espera)
+        _PENDENTES.definir(self._caixa.total_pendentes())
+        return min(esperas) if esperas else None
+
+    def _descarregar_canal(self, canal, funcao):
+        """
+        Entrega as pendentes de um canal: a mensagem original se for só uma,
+        ou um resumo se várias se acumularam.
+
+        Returns:
+            Segundos até a próxima tentativa (0 = tentar de novo já), ou None se não há pendentes
+        """
+        agora = time.time()
+        if agora < self._proxima_tentativa[canal]:
+            return self._proxima_tentativa[canal] - agora
+
+        pendentes = self._caixa.pendentes(canal)
+        if not pendentes:
+            return None
+
+        espera = self._baldes[canal].retirar()
+        if espera > 0:
+            return espera
+
+        mensagem = self._montar_envio(canal, pendentes)
+        # No resumo vai só o anexo do último alerta
+        anexo = self._caixa.anexo(pendentes[-1][0]) if canal in CANAIS_COM_ANEXO else None
+        ids = [id_mensagem for id_mensagem, _, _ in pendentes]
+        try:
+            _enviar_medindo(canal, funcao, mensagem, anexo)
+        except AnexoPendente as e:
+            # O texto já foi confirmado: nunca é reenviado. Só a evidência volta para a
+            # caixa, numa linha sem texto deste canal
+            self._caixa.remover(ids)
+            self._caixa.adicionar('', [canal], time.time(), e.anexo)
+            atraso = self._agendar_nova_tentativa(canal)
+            print(f"⚠ Notificação {canal} entregue sem a evidência: {e} (nova tentativa em {atraso:.1f}s)")
+            return atraso
+        except Exception as e:
+            self._baldes[canal].devolver()
+            self._caixa.registrar_falha(ids)
+            atraso = self._agendar_nova_tentativa(canal)
+            print(f"ERRO ao enviar notificação {canal}: {e} "
+                  f"({len(pendentes)} pendente(s), nova tentativa em {atraso:.1f}s)")
+            return atraso
+
+        self._caixa.remover(ids)
+        self._falhas_seguidas[canal] = 0
+        if len(pendentes) > 1:
+            _RESUMOS.inc(canal=canal)
+            print(f"✓ Conexão {canal} restabelecida: {len(pendentes)} alertas acumulados enviados juntos")
+        return 0.0
+
+    def _agendar_nova_tentativa(self, canal):
+        """Backoff exponencial depois de uma falha. Returns: segundos até a próxima tentativa."""
+        self._falhas_seguidas[canal] += 1
+        atraso = min(self.backoff_maximo, self.backoff_inicial * 2 ** (self._falhas_seguidas[canal] - 1))
+        self._proxima_tentativa[canal] = time.time() + atraso
+        return atraso
+
+    def _montar_envio(self, canal, pendentes):
+        """O que enviar por um canal a partir das pendentes (id, criada, mensagem)."""
+        if canal == "Frota":
+            # O coletor recebe cada alerta com seu id (descarta reenvios) e agrupa do lado dele
+            return [evento_alerta(self.frota_veiculo, criada, mensagem) for _, criada, mensagem in pendentes]
+        # Linhas sem texto são só a evidência de um alerta cujo texto já foi entregue
+        com_texto = [pendente for pendente in pendentes if pendente[2]]
+        if len(com_texto) <= 1:
+            return com_texto[0][2] if com_texto else ''
+        return _resumir(com_texto)
+
+    def aguardar_envios(self, timeout=None):
+        """
+        Espera a caixa de saída dos canais habilitados esvaziar.
+
+        Returns:
+            True se todas as notificações pendentes foram entregues
+        """
+        limite = None if timeout is None else time.time() + timeout
+        while any(self._caixa.total_pendentes(nome) for nome, _ in self._canais()):
+            if limite is not None and time.time() >= limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def encerrar(self, timeout=10):
+        """
+        Tenta entregar as notificações pendentes, para a thread de fundo e fecha as conexões.
+        O que não foi entregue continua na caixa de saída para a próxima execução.
+
+        Args:
+            timeout: Tempo máximo (em segundos) para esperar os envios pendentes
+        """
+        self.aguardar_envios(timeout)
+        self._parar.set()
+        self._acordar.set()
+        self._thread_envio.join(timeout=5)
+        self._executor_canais.shutdown(wait=False)
+
+        if not self._thread_envio.is_alive():
+            pendentes = self._caixa.total_pendentes()
+            if pendentes:
+                print(f"ℹ {pendentes} notificação(ões) não enviada(s) ficam guardadas em {self._caixa.caminho}")
+            self._caixa.fechar()
+
+        with self._trava_smtp:
+            self._fechar_smtp()
+        if self._sessao_http is not None:
+            self._sessao_http.close()
+            self._sessao_http = None
+        with self._trava_frota:
+            self._fechar_frota()
     
-    def configurar_telegram(self, bot_token, chat_id):
+    def configurar_telegram(self, bot_token, chat_id, url_api=URL_API_TELEGRAM):
         """
         Configura notificações via Telegram.
         
@@ -71,12 +312,17 @@ class NotificationManager:
         Args:
             bot_token: Token do bot do Telegram
             chat_id: ID do chat para enviar mensagens
+            url_api: Endereço da API de bots (troque por um servidor local para testes,
+                ver servidores_locais.py)
         """
         try:
             import requests
+            self._sessao_http = requests.Session()
             self.telegram_bot_token = bot_token
             self.telegram_chat_id = chat_id
+            self.telegram_url_api = url_api.rstrip('/')
             self.telegram_enabled = True
+            self._acordar.set()  # Entrega o que ficou pendente de execuções anteriores
             print("✓ Notificações Telegram configuradas com sucesso!")
             return True
         except ImportError:
@@ -86,21 +332,63 @@ class NotificationManager:
             print(f"ERRO ao configurar Telegram: {e}")
             return False
     
-    def _enviar_telegram(self, mensagem):
-        """Envia mensagem via Telegram Bot API."""
-        import requests
-        
-        url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage"
+    def _enviar_telegram(self, mensagem, anexo=None):
+        """
+        Envia mensagem via Telegram Bot API (reaproveitando a sessão HTTP).
+
+        Texto e evidência são etapas separadas: um anexo recusado pela API (erro 4xx,
+        ex: vídeo grande demais) é descartado e o texto segue sozinho, e um texto já
+        confirmado nunca é reenviado por causa de uma falha do anexo (ver AnexoPendente).
+        """
+        if anexo is not None and len(mensagem) <= LIMITE_LEGENDA_TELEGRAM:
+            # A mensagem vai como legenda da foto/vídeo
+            try:
+                self._enviar_anexo_telegram(anexo, mensagem)
+                return
+            except Exception as e:
+                if not _erro_definitivo(e):
+                    raise  # Nada foi entregue: a próxima tentativa repete tudo
+                print(f"⚠ Telegram recusou a evidência ({e}); enviando só o texto")
+            if not mensagem:
+                return  # Linha só com a evidência: não há texto para enviar
+            anexo = None
+
+        if mensagem:
+            self._enviar_texto_telegram(mensagem)
+        if anexo is not None:
+            try:
+                self._enviar_anexo_telegram(anexo, "")
+            except Exception as e:
+                if not _erro_definitivo(e):
+                    raise AnexoPendente(anexo, e)
+                print(f"⚠ Telegram recusou a evidência ({e}); o texto já foi entregue")
+
+    def _enviar_texto_telegram(self, mensagem):
+        url = f"{self.telegram_url_api}/bot{self.telegram_bot_token}/sendMessage"
         payload = {
             "chat_id": self.telegram_chat_id,
             "text": mensagem,
             "parse_mode": "HTML"
         }
         
-        response = requests.post(url, json=payload, timeout=5)
+        response = self._sessao_http.post(url, json=payload, timeout=5)
+        response.raise_for_status()
+
+    def _enviar_anexo_telegram(self, anexo, legenda):
+        """Envia a evidência com sendVideo (.mp4) ou sendPhoto (imagem)."""
+        nome, dados = anexo
+        metodo, campo = ("sendVideo", "video") if nome.endswith('.mp4') else ("sendPhoto", "photo")
+        url = f"{self.telegram_url_api}/bot{self.telegram_bot_token}/{metodo}"
+        payload = {
+            "chat_id": self.telegram_chat_id,
+            "caption": legenda,
+            "parse_mode": "HTML"
+        }
+        tipo = mimetypes.guess_type(nome)[0] or "application/octet-stream"
+        response = self._sessao_http.post(url, data=payload, files={campo: (nome, dados, tipo)}, timeout=30)
         response.raise_for_status()
     
-    def configurar_email(self, smtp_server, smtp_port, email_from, senha, email_to):
+    def configurar_email(self, smtp_server, smtp_port, email_from, senha, email_to, usar_tls=True):
         """
         Configura notificações via Email.
         
@@ -116,6 +404,7 @@ class NotificationManager:
             email_from: Email remetente
             senha: Senha do email (ou senha de app)
             email_to: Email destinatário
+            usar_tls: Usa starttls (desligue só para servidores locais de teste)
         """
         try:
             self.email_smtp_server = smtp_server
@@ -123,16 +412,20 @@ class NotificationManager:
             self.email_from = email_from
             self.email_senha = senha
             self.email_to = email_to
+            self.email_usar_tls = usar_tls
             self.email_enabled = True
+            self._acordar.set()  # Entrega o que ficou pendente de execuções anteriores
             print("✓ Notificações Email configuradas com sucesso!")
             return True
         except Exception as e:
             print(f"ERRO ao configurar Email: {e}")
             return False
     
-    def _enviar_email(self, mensagem):
-        """Envia email usando SMTP."""
+    def _enviar_email(self, mensagem, anexo=None):
+        """Envia email usando SMTP (reaproveitando a conexão aberta)."""
         import smtplib
+        from email import encoders
+        from email.mime.base import MIMEBase
         from email.mime.text import MIMEText
         from email.mime.multipart import MIMEMultipart
         
@@ -154,11 +447,231 @@ class NotificationManager:
         """
         
         msg.attach(MIMEText(corpo, 'html'))
+
+        if anexo is not None:
+            nome, dados = anexo
+            tipo, subtipo = (mimetypes.guess_type(nome)[0] or "application/octet-stream").split('/')
+            parte = MIMEBase(tipo, subtipo)
+            parte.set_payload(dados)
+            encoders.encode_base64(parte)
+            parte.add_header('Content-Disposition', 'attachment', filename=nome)
+            msg.attach(parte)
         
-        # Conecta e envia
-        server = smtplib.SMTP(self.email_smtp_server, self.email_smtp_port)
-        server.starttls()
-        server.login(self.email_from, self.email_senha)
-        server.send_message(msg)
-        server.quit()
+        # Envia pela conexão mantida aberta; se o servidor derrubou, reconecta e tenta de novo
+        with self._trava_smtp:
+            try:
+                self._obter_conexao_smtp().send_message(msg)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._fechar_smtp()
+                self._obter_conexao_smtp().send_message(msg)
+
+    def configurar_frota(self, host, porta, id_veiculo, protocolo='udp', intervalo_heartbeat=30.0):
+        """
+        Configura o envio de eventos ao coletor central da frota (ver coletor_frota.py).
+
+        Os alertas passam pela caixa de saída como nos outros canais; o heartbeat é
+        enviado direto, a cada intervalo_heartbeat, para o coletor saber que o veículo
+        está ligado.
+
+        Args:
+            host: Endereço do coletor
+            porta: Porta UDP ou HTTP do coletor
+            id_veiculo: Identificador deste veículo (ex: a placa)
+            protocolo: 'udp' (mais leve, sem confirmação) ou 'http' (confirma cada envio)
+            intervalo_heartbeat: Segundos entre heartbeats (0 = sem heartbeat)
+        """
+        if protocolo not in ('udp', 'http'):
+            print(f"ERRO ao configurar Frota: protocolo desconhecido {protocolo!r}")
+            return False
+        self.frota_endereco = (host, porta)
+        self.frota_veiculo = id_veiculo
+        self.frota_protocolo = protocolo
+        self.frota_enabled = True
+        if intervalo_heartbeat:
+            threading.Thread(target=self._loop_heartbeat_frota, args=(intervalo_heartbeat,),
+                             name="notificacao-heartbeat-frota", daemon=True).start()
+        self._acordar.set()  # Entrega o que ficou pendente de execuções anteriores
+        print(f"✓ Eventos da frota configurados ({protocolo.upper()} {host}:{porta}, veículo {id_veiculo})")
+        return True
+
+    def _enviar_frota(self, eventos):
+        """Envia uma lista de eventos ao coletor (em datagramas ou num POST /eventos)."""
+        with self._trava_frota:
+            if self.frota_protocolo == 'udp':
+                if self._socket_frota is None:
+                    self._socket_frota = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                for lote in em_lotes(eventos):
+                    self._socket_frota.sendto(codificar(lote), self.frota_endereco)
+                return
+            self._post_frota(codificar(eventos))
+
+    def _post_frota(self, corpo):
+        # Conexão HTTP mantida aberta; se o coletor a derrubou, reconecta e tenta mais uma vez
+        for tentativa in range(2):
+            if self._conexao_frota is None:
+                self._conexao_frota = http.client.HTTPConnection(*self.frota_endereco, timeout=5)
+            try:
+                self._conexao_frota.request('POST', '/eventos', corpo, {'Content-Type': 'application/json'})
+                resposta = self._conexao_frota.getresponse()
+                resposta.read()
+            except (http.client.HTTPException, OSError):
+                self._fechar_frota()
+                if tentativa:
+                    raise
+                continue
+            if resposta.status >= 300:
+                raise RuntimeError(f"coletor respondeu HTTP {resposta.status}")
+            return
+
+    def _loop_heartbeat_frota(self, intervalo):
+        while not self._parar.wait(intervalo):
+            try:
+                evento = evento_heartbeat(self.frota_veiculo, time.time(), self._caixa.total_pendentes())
+                self._enviar_frota([evento])
+            except Exception:
+                # Sem conexão: o próximo heartbeat tenta de novo (a falta deles é o aviso no coletor)
+                _FALHAS.inc(canal="Frota-heartbeat")
+
+    def _fechar_frota(self):
+        """Fecha o socket UDP / a conexão HTTP com o coletor (se houver)."""
+        if self._socket_frota is not None:
+            self._socket_frota.close()
+            self._socket_frota = None
+        if self._conexao_frota is not None:
+            self._conexao_frota.close()
+            self._conexao_frota = None
+
+    def conectar_canais(self):
+        """
+        Abre as conexões dos canais configurados antes do primeiro alerta (TLS com o
+        Telegram, starttls + login no SMTP), para que ele não pague esse custo.
+        Falhas só geram aviso: o envio tenta conectar de novo na hora.
+        """
+        if self.telegram_enabled:
+            try:
+                self._sessao_http.head(self.telegram_url_api, timeout=5)
+            except Exception as e:
+                print(f"⚠ Não foi possível pré-conectar ao Telegram: {e}")
+        if self.email_enabled:
+            try:
+                with self._trava_smtp:
+                    self._obter_conexao_smtp()
+            except Exception as e:
+                print(f"⚠ Não foi possível pré-conectar ao servidor de email: {e}")
+
+    def _obter_conexao_smtp(self):
+        """Retorna a conexão SMTP aberta, conectando (starttls + login) se necessário."""
+        import smtplib
+
+        if self._conexao_smtp is not None:
+            try:
+                # NOOP confirma que a conexão ainda está viva
+                if self._conexao_smtp.noop()[0] == 250:
+                    return self._conexao_smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._fechar_smtp()
+
+        server = smtplib.SMTP(self.email_smtp_server, self.email_smtp_port, timeout=10)
+        if self.email_usar_tls:
+            server.starttls()
+        if self.email_senha:
+            server.login(self.email_from, self.email_senha)
+        self._conexao_smtp = server
+        return server
+
+    def _fechar_smtp(self):
+        """Fecha a conexão SMTP mantida aberta (se houver)."""
+        if self._conexao_smtp is None:
+            return
+        try:
+            self._conexao_smtp.quit()
+        except Exception:
+            pass
+        self._conexao_smtp = None
+
+
+def _erro_definitivo(erro):
+    """True para uma recusa da API (4xx, menos 429) que não adianta repetir."""
+    resposta = getattr(erro, 'response', None)
+    codigo = getattr(resposta, 'status_code', None)
+    return codigo is not None and 400 <= codigo < 500 and codigo != 429
+
+
+def _enviar_medindo(canal, funcao, mensagem, anexo=None):
+    """Executa o envio de um canal registrando tempo, sucesso e falha nas métricas."""
+    inicio = time.perf_counter()
+    try:
+        if anexo is None:
+            funcao(mensagem)
+        else:
+            funcao(mensagem, anexo)
+    except AnexoPendente:
+        _ENVIADAS.inc(canal=canal)  # O texto foi entregue
+        raise
+    except Exception:
+        _FALHAS.inc(canal=canal)
+        raise
+    finally:
+        _TEMPO_ENVIO.observar(time.perf_counter() - inicio, canal=canal)
+    _ENVIADAS.inc(canal=canal)
+
+
+def _resumir(pendentes):
+    """Junta vários alertas pendentes (id, criada, mensagem) numa única mensagem."""
+    def _formatar(instante):
+        return datetime.fromtimestamp(instante).strftime('%d/%m/%Y %H:%M:%S')
+
+    linhas = [
+        f"📋 <b>{len(pendentes)} alertas de sonolência não puderam ser enviados na hora</b>",
+        f"(entre {_formatar(pendentes[0][1])} e {_formatar(pendentes[-1][1])})",
+        "",
+    ]
+    omitidos = len(pendentes) - MAXIMO_ALERTAS_NO_RESUMO
+    if omitidos > 0:
+        linhas.append(f"... e mais {omitidos} alerta(s) anteriores")
+    linhas.extend(f"🕐 {_formatar(criada)}" for _, criada, _ in pendentes[-MAXIMO_ALERTAS_NO_RESUMO:])
+    linhas.extend(["", "<b>Último alerta:</b>", pendentes[-1][2]])
+    return "\n".join(linhas)
+
+
+if __name__ == "__main__":
+    # Teste sem internet: servidores locais fazem o papel do Telegram e do SMTP
+    import os
+    import tempfile
+
+    from servidores_locais import ServidorHttpLocal, ServidorSmtpLocal
+
+    telegram = ServidorHttpLocal().iniciar()
+    smtp = ServidorSmtpLocal().iniciar()
+    caminho = os.path.join(tempfile.mkdtemp(), 'notificacoes.db')
+
+    # Começa sem conexão: os alertas ficam na caixa de saída
+    telegram.fora_do_ar = smtp.fora_do_ar = True
+    notificador = NotificationManager(cooldown_segundos=0, caminho_caixa=caminho,
+                                      backoff_inicial=0.2, backoff_maximo=1.0)
+    notificador.configurar_telegram('token', 'chat', url_api=telegram.url)
+    notificador.configurar_email('127.0.0.1', smtp.porta, 'detector@local', '', 'frota@local', usar_tls=False)
+
+    inicio = time.perf_counter()
+    for i in range(5):
+        notificador.enviar_notificacao(f"Alerta de teste {i + 1}")
+    print(f"5 alertas gravados em {(time.perf_counter() - inicio) / 5 * 1e6:.0f}µs cada")
+
+    time.sleep(2)
+    print(f"Sem conexão: {telegram.requisicoes} tentativas HTTP, {smtp.conexoes} SMTP (com backoff)")
+
+    # Conexão volta: cada canal recebe um único resumo
+    telegram.fora_do_ar = smtp.fora_do_ar = False
+    print("Entregue:", notificador.aguardar_envios(timeout=5))
+    print(f"Telegram recebeu {len(telegram.mensagens)} mensagem(ns), Email recebeu {len(smtp.mensagens)}")
 
+    # Alerta com evidência: foto no Telegram, anexo no email
+    notificador.enviar_notificacao("Alerta com evidência", ('evidencia.jpg', b'\xff\xd8\xff\xe0 jpeg de teste'))
+    print("Entregue:", notificador.aguardar_envios(timeout=5))
+    if telegram.caminhos:
+        print(f"Telegram: {telegram.caminhos[-1].rsplit('/', 1)[-1]}")
+    print(f"Email com anexo: {b'evidencia.jpg' in smtp.mensagens[-1]}")
+    notificador.encerrar(timeout=1)
+    telegram.parar()
+    smtp.parar()
@@ -0,0 +1,237 @@
+"""
+Pipeline em threads para o Detector de Sonolência.
+Separa captura, inferência e decisão/atuação em estágios independentes,
+ligados por filas limitadas de "último valor": quando um estágio atrasa,
+os quadros antigos são descartados em vez de se acumularem.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class FilaUltimoValor:
+    """
+    Fila limitada que mantém apenas os itens mais recentes.
+    Quando está cheia, descarta o item mais antigo em vez de bloquear o produtor.
+    """
+
+    def __init__(self, capacidade=1):
+        """
+        Args:
+            capacidade: Quantidade máxima de itens guardados (1 = só o mais novo)
+        """
+        self._itens = deque(maxlen=capacidade)
+        self._condicao = threading.Condition()
+        self._fechada = False
+        self.descartados = 0
+
+    def colocar(self, item):
+        """Insere um item, descartando o mais antigo se a fila estiver cheia."""
+        with self._condicao:
+            if len(self._itens) == self._itens.maxlen:
+                self.descartados += 1
+            self._itens.append(item)
+            self._condicao.notify()
+
+    def obter(self, timeout=None):
+        """
+        Retira o próximo item da fila.
+
+        Returns:
+            O item, ou None se a fila foi fechada e está vazia ou se o timeout expirou
+        """
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._itens or self._fechada, timeout)
+            if self._itens:
+                return self._itens.popleft()
+            return None
+
+    def fechar(self):
+        """Acorda os consumidores; depois de esvaziada, obter() passa a retornar None."""
+        with self._condicao:
+            self._fechada = True
+            self._condicao.notify_all()
+
+    @property
+    def fechada(self):
+        return self._fechada
+
+    def vazia(self):
+        with self._condicao:
+            return not self._itens
+
+
+class Quadro:
+    """Um quadro da câmera e tudo que foi calculado sobre ele ao longo do pipeline."""
+
+    __slots__ = ('indice', 'img', 'tempo_captura', 'instante_captura', 'resultado', 'instante_inferencia')
+
+    def __init__(self, indice, img, tempo_captura=None, instante_captura=None):
+        """
+        Args:
+            tempo_captura, instante_captura: Momento do grab informado pela fonte (ver captura.py);
+                sem eles, vale o momento em que o quadro chegou ao pipeline
+        """
+        self.indice = indice
+        self.img = img
+        # Relógio de parede (usado pela lógica do timer)
+        self.tempo_captura = tempo_captura if tempo_captura is not None else time.time()
+        # Relógio monotônico (usado para medir latência)
+        self.instante_captura = instante_captura if instante_captura is not None else time.perf_counter()
+        self.resultado = None
+        self.instante_inferencia = None
+
+
+class PipelineDeteccao:
+    """
+    Pipeline de três estágios:
+    1. Thread de captura: lê a câmera continuamente e guarda só o quadro mais novo
+    2. Thread de inferência: roda a malha facial e o cálculo dos ratios
+    3. Decisão/atuação/renderização: roda na thread que chama proximo_resultado()
+       (o OpenCV exige que imshow/waitKey rodem na thread principal)
+    """
+
+    def __init__(self, cap, inferir, capacidade_fila=1, amostras_latencia=1000, agendador=None,
+                 buffer_quadros=None):
+        """
+        Args:
+            cap: Objeto com método read() no formato do cv2.VideoCapture. Se tiver
+                ultimo_tempo/ultimo_instante (fontes do captura.py), a latência é medida
+                desde o grab do quadro
+            inferir: Função que recebe a imagem e retorna o resultado da inferência
+            capacidade_fila: Tamanho das filas entre os estágios
+            amostras_latencia: Quantas latências recentes guardar para os percentis
+            agendador: Opcional, objeto com deve_inferir(tempo) (ver taxa_adaptativa.py);
+                quadros recusados não são inferidos nem passados adiante
+            buffer_quadros: Opcional, objeto com gravar(img, tempo) chamado na captura
+                (ver evidencias.py)
+        """
+        self.cap = cap
+        self.inferir = inferir
+        self.agendador = agendador
+        self.buffer_quadros = buffer_quadros
+        self.fila_captura = FilaUltimoValor(capacidade_fila)
+        self.fila_resultados = FilaUltimoValor(capacidade_fila)
+
+        self.quadros_capturados = 0
+        self.quadros_inferidos = 0
+        self.quadros_pulados = 0
+        self.quadros_decididos = 0
+        self.latencias = deque(maxlen=amostras_latencia)
+        self.latencia_maxima = 0.0
+        self.esperas_inferencia = deque(maxlen=amostras_latencia)
+        self.erro = None
+
+        self._parar = threading.Event()
+        self._threads = []
+
+    def iniciar(self):
+        """Inicia as threads de captura e inferência."""
+        self._threads = [
+            threading.Thread(target=self._loop_captura, name="captura", daemon=True),
+            threading.Thread(target=self._loop_inferencia, name="inferencia", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _loop_captura(self):
+        indice = 0
+        try:
+            while not self._parar.is_set():
+                success, img = self.cap.read()
+                if not success:
+                    break
+                quadro = Quadro(indice, img, getattr(self.cap, 'ultimo_tempo', None),
+                                getattr(self.cap, 'ultimo_instante', None))
+                if self.buffer_quadros is not None:
+                    self.buffer_quadros.gravar(img, quadro.tempo_captura)
+                self.fila_captura.colocar(quadro)
+                self.quadros_capturados += 1
+                indice += 1
+        except Exception as e:
+            self.erro = e
+        finally:
+            # Fim do vídeo ou falha da câmera: avisa o estágio seguinte
+            self.fila_captura.fechar()
+
+    def _loop_inferencia(self):
+        try:
+            while not self._parar.is_set():
+                quadro = self.fila_captura.obter(timeout=0.1)
+                if quadro is None:
+                    if self.fila_captura.fechada:
+                        break
+                    continue
+                if self.agendador is not None and not self.agendador.deve_inferir(quadro.tempo_captura):
+                    self.quadros_pulados += 1
+                    continue
+                # Quanto o quadro esperou desde o grab (decodificação + fila) antes da inferência
+                self.esperas_inferencia.append(time.perf_counter() - quadro.instante_captura)
+                quadro.resultado = self.inferir(quadro.img)
+                quadro.instante_inferencia = time.perf_counter()
+                self.fila_resultados.colocar(quadro)
+                self.quadros_inferidos += 1
+        except Exception as e:
+            self.erro = e
+        finally:
+            self.fila_resultados.fechar()
+
+    def proximo_resultado(self, timeout=0.1):
+        """
+        Retorna o quadro inferido mais recente.
+
+        Returns:
+            Quadro, ou None se ainda não há resultado (timeout) ou se o pipeline terminou.
+            Use ativo() para diferenciar os dois casos.
+        """
+        return self.fila_resultados.obter(timeout=timeout)
+
+    def ativo(self):
+        """False quando a captura acabou e todos os resultados já foram consumidos."""
+        return not (self.fila_resultados.fechada and self.fila_resultados.vazia())
+
+    def registrar_decisao(self, quadro):
+        """
+        Marca o momento em que a decisão sobre o quadro foi tomada.
+
+        Returns:
+            Latência captura → decisão, em segundos
+        """
+        latencia = time.perf_counter() - quadro.instante_captura
+        self.latencias.append(latencia)
+        if latencia > self.latencia_maxima:
+            self.latencia_maxima = latencia
+        self.quadros_decididos += 1
+        return latencia
+
+    def parar(self):
+        """Sinaliza as threads para pararem e espera elas terminarem."""
+        self._parar.set()
+        self.fila_captura.fechar()
+        self.fila_resultados.fechar()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def relatorio(self):
+        """Texto com latência captura → decisão e quadros descartados por estágio."""
+        return (
+            f"[Pipeline] Latência captura→decisão: {_resumir_tempos(self.latencias, self.latencia_maxima)}\n"
+            f"[Pipeline] Espera captura→inferência: {_resumir_tempos(self.esperas_inferencia)}\n"
+            f"[Pipeline] Capturados: {self.quadros_capturados} | "
+            f"Inferidos: {self.quadros_inferidos} | Pulados: {self.quadros_pulados} | "
+            f"Decididos: {self.quadros_decididos}\n"
+            f"[Pipeline] Descartados - antes da inferência: {self.fila_captura.descartados} | "
+            f"antes da decisão: {self.fila_resultados.descartados}"
+        )
+
+
+def _resumir_tempos(amostras, maximo=None):
+    """Texto com média, p95 e máximo (em ms) das amostras."""
+    if not amostras:
+        return "sem amostras"
+    ordenadas = sorted(amostras)
+    media = sum(ordenadas) / len(ordenadas)
+    p95 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+    maximo = ordenadas[-1] if maximo is None else maximo
+    return f"média {media * 1000:.1f}ms | p95 {p95 * 1000:.1f}ms | máx {maximo * 1000:.1f}ms"
@@ -0,0 +1,259 @@
+"""
+Processamento offline de vídeos gravados da cabine.
+
+Roda a mesma lógica de ratio e timer do eyes_detector.py, sem janelas e sem Arduino,
+distribuindo os vídeos entre todos os núcleos da CPU (um FaceMeshDetector por processo).
+Só a regra do fechamento longo é reproduzida: os alertas do monitor de fadiga
+(MONITOR_FADIGA, ver sinais_fadiga.py) não entram no estado do alerta do CSV.
+Para cada vídeo é gerado um CSV em output/ com, por quadro: tempo, ratio_esq, ratio_dir
+e estado do alerta. O nome do CSV inclui as pastas abaixo da pasta comum aos vídeos
+(ex: gravacoes/onibus12/dia01.mp4 e gravacoes/onibus15/dia01.mp4 geram onibus12__dia01.csv
+e onibus15__dia01.csv), e CSVs já existentes não são sobrescritos sem --sobrescrever.
+Serve para revalidar RATIO_THRESHOLD e TEMPO_MINIMO_OLHOS_FECHADOS com as gravações da
+frota inteira.
+
+Uso:
+    python processamento_offline.py gravacoes/ outro_video.mp4 --processos 8
+"""
+
+import argparse
+import csv
+import os
+import time
+from multiprocessing import Pool
+
+from deteccao import calcular_ratios
+from maquina_estados import MaquinaEstadosSonolencia
+from metricas_olhos import CONFIGURACOES, CalculadoraEAR
+
+EXTENSOES_VIDEO = ('.mp4', '.avi', '.mkv', '.mov', '.m4v', '.mpg', '.mpeg')
+PASTA_SAIDA_PADRAO = 'output'
+
+COLUNAS_CSV = ['quadro', 'tempo_s', 'rosto', 'ratio_esq', 'ratio_dir', 'estado', 'comando', 'alerta_ativo']
+
+# Detector do processo trabalhador (criado uma única vez por processo)
+_detector = None
+
+
+def listar_videos(caminhos):
+    """Expande diretórios em arquivos de vídeo, mantendo a ordem dos argumentos."""
+    videos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for nome in sorted(os.listdir(caminho)):
+                if nome.lower().endswith(EXTENSOES_VIDEO):
+                    videos.append(os.path.join(caminho, nome))
+        elif os.path.isfile(caminho):
+            videos.append(caminho)
+        else:
+            print(f"⚠ Ignorando '{caminho}': arquivo ou diretório não encontrado")
+    return videos
+
+
+def nomes_saida(videos):
+    """
+    Nome do CSV de cada vídeo: o caminho relativo à pasta comum a todos, com as pastas
+    separadas por '__' (vídeos com o mesmo nome em pastas diferentes não se sobrescrevem).
+
+    Returns:
+        Lista de nomes de arquivo, na ordem dos vídeos
+
+    Raises:
+        ValueError: Se dois vídeos ainda gerariam o mesmo nome (ex: a.mp4 e a.avi)
+    """
+    absolutos = [os.path.abspath(video) for video in videos]
+    base = os.path.commonpath([os.path.dirname(caminho) for caminho in absolutos])
+    nomes = []
+    for caminho in absolutos:
+        relativo = os.path.splitext(os.path.relpath(caminho, base))[0]
+        nomes.append(relativo.replace(os.sep, '__') + '.csv')
+
+    repetidos = {nome for nome in nomes if nomes.count(nome) > 1}
+    if repetidos:
+        raise ValueError(f"Vídeos diferentes gerariam o mesmo CSV: {', '.join(sorted(repetidos))}")
+    return nomes
+
+
+def _inicializar_trabalhador():
+    """Cria o FaceMeshDetector do processo trabalhador."""
+    global _detector
+    import cv2
+    from cvzone.FaceMeshModule import FaceMeshDetector
+
+    # Cada processo já ocupa um núcleo: evita que o OpenCV abra mais threads por processo
+    cv2.setNumThreads(1)
+    _detector = FaceMeshDetector(maxFaces=1)
+
+
+def processar_video(tarefa):
+    """
+    Processa um vídeo inteiro e grava o CSV por quadro.
+
+    Args:
+        tarefa: (caminho_video, caminho_csv, parametros_timer, metodo_ratio, sobrescrever)
+
+    Returns:
+        Dicionário com o resumo do vídeo
+    """
+    import cv2
+
+    caminho, caminho_saida, parametros_timer, metodo_ratio, sobrescrever = tarefa
+    timer = MaquinaEstadosSonolencia(**parametros_timer)
+    calculadora = CalculadoraEAR(metodo_ratio)
+
+    cap = cv2.VideoCapture(caminho)
+    if not cap.isOpened():
+        return {'video': caminho, 'erro': 'não foi possível abrir o vídeo', 'quadros': 0,
+                'alertas': 0, 'segundos': 0.0}
+
+    fps_video = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    quadros = 0
+    quadros_sem_rosto = 0
+    alertas = 0
+    inicio = time.perf_counter()
+
+    # 'x' falha se o CSV já existe (ex: outro lote gravou na mesma pasta nesse meio tempo)
+    try:
+        arquivo = open(caminho_saida, 'w' if sobrescrever else 'x', newline='', encoding='utf-8')
+    except FileExistsError:
+        cap.release()
+        return {'video': caminho, 'saida': caminho_saida, 'erro': 'o CSV de saída já existe', 'quadros': 0,
+                'alertas': 0, 'segundos': 0.0}
+
+    with arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(COLUNAS_CSV)
+
+        while True:
+            success, img = cap.read()
+            if not success:
+                break
+
+            # Usa o tempo do vídeo (e não o relógio) para o timer reproduzir a gravação fielmente
+            tempo_s = quadros / fps_video
+            _, faces = _detector.findFaceMesh(img, draw=False)
+
+            if faces:
+                ratio_esq, ratio_dir = calcular_ratios(faces[0], calculadora)
+                decisao = timer.processar(ratio_esq, ratio_dir, tempo_s)
+                if decisao.alerta_disparado:
+                    alertas += 1
+                escritor.writerow([quadros, f'{tempo_s:.3f}', 1, f'{ratio_esq:.2f}', f'{ratio_dir:.2f}',
+                                   decisao.estado, decisao.comando, int(timer.alerta_sonolencia_acionado)])
+            else:
+                # Sem rosto o detector ao vivo não altera o timer; aqui é igual
+                quadros_sem_rosto += 1
+                escritor.writerow([quadros, f'{tempo_s:.3f}', 0, '', '', 'SEM ROSTO', '',
+                                   int(timer.alerta_sonolencia_acionado)])
+
+            quadros += 1
+
+    cap.release()
+    return {
+        'video': caminho,
+        'saida': caminho_saida,
+        'quadros': quadros,
+        'quadros_sem_rosto': quadros_sem_rosto,
+        'alertas': alertas,
+        'duracao_video_s': quadros / fps_video,
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+def processar_lote(videos, pasta_saida=PASTA_SAIDA_PADRAO, processos=None, parametros_timer=None,
+                   metodo_ratio='dois_pontos', sobrescrever=False):
+    """
+    Processa vários vídeos em paralelo.
+
+    Args:
+        videos: Lista de caminhos de vídeo
+        pasta_saida: Onde gravar os CSVs
+        processos: Número de processos (padrão: todos os núcleos)
+        parametros_timer: Argumentos para MaquinaEstadosSonolencia
+        metodo_ratio: Configuração de pontos do ratio (ver metricas_olhos.CONFIGURACOES)
+        sobrescrever: Permite substituir CSVs que já existem na pasta de saída
+
+    Returns:
+        (lista de resumos por vídeo, tempo total em segundos)
+
+    Raises:
+        ValueError: Se dois vídeos gerariam o mesmo CSV
+        FileExistsError: Se algum CSV já existe e sobrescrever é False
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    saidas = [os.path.join(pasta_saida, nome) for nome in nomes_saida(videos)]
+    existentes = [saida for saida in saidas if os.path.exists(saida)]
+    if existentes and not sobrescrever:
+        raise FileExistsError(f"{len(existentes)} CSV(s) de saída já existem (ex: {existentes[0]}); "
+                              f"use outra pasta ou --sobrescrever")
+    processos = processos or os.cpu_count() or 1
+    tarefas = [(video, saida, parametros_timer or {}, metodo_ratio, sobrescrever)
+               for video, saida in zip(videos, saidas)]
+
+    resumos = []
+    inicio = time.perf_counter()
+    with Pool(processes=min(processos, len(tarefas)) or 1, initializer=_inicializar_trabalhador) as pool:
+        for resumo in pool.imap_unordered(processar_video, tarefas):
+            resumos.append(resumo)
+            if 'erro' in resumo:
+                print(f"⚠ {resumo['video']}: {resumo['erro']}")
+            else:
+                fps = resumo['quadros'] / resumo['segundos'] if resumo['segundos'] else 0
+                print(f"✓ {resumo['video']}: {resumo['quadros']} quadros, {resumo['alertas']} alertas "
+                      f"({fps:.1f} quadros/s)")
+    return resumos, time.perf_counter() - inicio
+
+
+def gravar_resumo(resumos, pasta_saida):
+    """Grava um CSV com uma linha por vídeo processado."""
+    caminho = os.path.join(pasta_saida, 'resumo_offline.csv')
+    colunas = ['video', 'saida', 'quadros', 'quadros_sem_rosto', 'alertas', 'duracao_video_s', 'segundos', 'erro']
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=colunas)
+        escritor.writeheader()
+        for resumo in sorted(resumos, key=lambda r: r['video']):
+            escritor.writerow(resumo)
+    return caminho
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processa vídeos gravados com a lógica do detector de sonolência.")
+    parser.add_argument('caminhos', nargs='+', help="Arquivos de vídeo ou diretórios com vídeos")
+    parser.add_argument('--saida', default=PASTA_SAIDA_PADRAO, help="Pasta dos CSVs (padrão: output)")
+    parser.add_argument('--processos', type=int, default=None, help="Número de processos (padrão: todos os núcleos)")
+    parser.add_argument('--threshold', type=float, default=23, help="RATIO_THRESHOLD")
+    parser.add_argument('--tempo-fechados', type=float, default=3.0, help="TEMPO_MINIMO_OLHOS_FECHADOS")
+    parser.add_argument('--tempo-abertos', type=float, default=3.0, help="TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR")
+    parser.add_argument('--metodo', default='dois_pontos', choices=sorted(CONFIGURACOES),
+                        help="Pontos usados no ratio (padrão: dois_pontos, igual ao detector)")
+    parser.add_argument('--sobrescrever', action='store_true', help="Substitui CSVs que já existem na pasta de saída")
+    args = parser.parse_args()
+
+    videos = listar_videos(args.caminhos)
+    if not videos:
+        print("Nenhum vídeo encontrado.")
+        return
+
+    parametros_timer = {
+        'ratio_threshold': args.threshold,
+        'tempo_minimo_olhos_fechados': args.tempo_fechados,
+        'tempo_olhos_abertos_para_desligar': args.tempo_abertos,
+    }
+    try:
+        resumos, tempo_total = processar_lote(videos, args.saida, args.processos, parametros_timer, args.metodo,
+                                              args.sobrescrever)
+    except (ValueError, FileExistsError) as e:
+        print(f"ERRO: {e}")
+        raise SystemExit(1)
+    caminho_resumo = gravar_resumo(resumos, args.saida)
+
+    total_quadros = sum(r['quadros'] for r in resumos)
+    total_alertas = sum(r['alertas'] for r in resumos)
+    print(f"\n{len(resumos)} vídeos | {total_quadros} quadros | {total_alertas} alertas")
+    print(f"Tempo total: {tempo_total:.1f}s | Vazão agregada: {total_quadros / tempo_total:.1f} quadros/s")
+    print(f"Resumo gravado em {caminho_resumo}")
+
+
+if __name__ == "__main__":
+    main()
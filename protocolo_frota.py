@@ -0,0 +1,58 @@
+"""
+Formato dos eventos trocados entre os detectores e o coletor da frota (coletor_frota.py).
+
+Cada evento é um objeto JSON compacto; vários eventos podem ir juntos numa lista
+(um datagrama UDP ou um POST /eventos):
+
+    {"v": "ABC1D23", "k": "a", "id": "ABC1D23-1718000000.123", "ts": 1718000000.123, "m": "texto"}
+    {"v": "ABC1D23", "k": "h", "ts": 1718000030.0, "p": 0}
+
+- v: identificador do veículo
+- k: tipo ('a' = alerta, 'h' = heartbeat)
+- id: identificador do alerta, estável entre reenvios (o coletor descarta repetidos)
+- ts: momento do evento no detector (time.time())
+- m: mensagem do alerta
+- p: alertas ainda pendentes na caixa de saída do detector (só no heartbeat)
+"""
+
+import json
+
+TIPO_ALERTA = 'a'
+TIPO_HEARTBEAT = 'h'
+
+# Eventos por datagrama: mantém cada datagrama bem abaixo do limite do UDP
+MAX_EVENTOS_POR_DATAGRAMA = 20
+
+
+def evento_alerta(veiculo, criada, mensagem):
+    return {'v': veiculo, 'k': TIPO_ALERTA, 'id': f"{veiculo}-{criada:.3f}", 'ts': criada, 'm': mensagem}
+
+
+def evento_heartbeat(veiculo, instante, pendentes=0):
+    return {'v': veiculo, 'k': TIPO_HEARTBEAT, 'ts': instante, 'p': pendentes}
+
+
+def codificar(eventos):
+    """Lista de eventos -> bytes (JSON sem espaços)."""
+    return json.dumps(eventos, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def decodificar(dados):
+    """
+    Bytes -> lista de eventos (aceita um evento só ou uma lista).
+
+    Raises:
+        ValueError: Se os dados não são JSON ou não têm o formato de eventos
+    """
+    eventos = json.loads(dados)
+    if isinstance(eventos, dict):
+        eventos = [eventos]
+    if not isinstance(eventos, list) or not all(isinstance(e, dict) and 'v' in e and 'k' in e for e in eventos):
+        raise ValueError("formato de evento inválido")
+    return eventos
+
+
+def em_lotes(eventos, tamanho=MAX_EVENTOS_POR_DATAGRAMA):
+    """Divide a lista de eventos em lotes que cabem num datagrama."""
+    for inicio in range(0, len(eventos), tamanho):
+        yield eventos[inicio:inicio + tamanho]
@@ -0,0 +1,153 @@
+"""
+Rastreamento da região do rosto para o Detector de Sonolência.
+
+Numa câmera fixa de cabine o rosto do motorista fica praticamente no mesmo lugar.
+Depois da primeira detecção, a malha facial passa a rodar só num recorte (com margem)
+em volta do último rosto, reduzido para uma resolução alvo. Os pontos são convertidos
+de volta para coordenadas do quadro inteiro, então o cálculo do ratio não muda.
+
+O quadro inteiro volta a ser analisado quando o rastreamento perde confiança
+(rosto sumiu, encostou na borda do recorte ou mudou muito de tamanho) ou a cada N quadros.
+"""
+
+import cv2
+
+
+class DetectorRastreado:
+    """
+    Envolve dois FaceMeshDetector (quadro inteiro e recorte) com a mesma interface
+    findFaceMesh(img, draw=False) -> (img, faces) do cvzone.
+    """
+
+    def __init__(self, detector_completo, detector_recorte, lado_alvo=256, margem=0.4,
+                 intervalo_redeteccao=30, variacao_tamanho_maxima=0.5):
+        """
+        Args:
+            detector_completo: FaceMeshDetector usado no quadro inteiro
+            detector_recorte: FaceMeshDetector usado no recorte (instância separada, para que o
+                rastreamento interno do MediaPipe de cada um não se misture)
+            lado_alvo: Maior lado (em pixels) do recorte enviado para a malha facial
+            margem: Margem em volta do rosto, em fração do tamanho do rosto
+            intervalo_redeteccao: A cada quantos quadros o quadro inteiro é reanalisado
+            variacao_tamanho_maxima: Variação relativa máxima do tamanho do rosto entre quadros
+                antes de considerar o rastreamento perdido
+        """
+        self.detector_completo = detector_completo
+        self.detector_recorte = detector_recorte
+        self.lado_alvo = lado_alvo
+        self.margem = margem
+        self.intervalo_redeteccao = intervalo_redeteccao
+        self.variacao_tamanho_maxima = variacao_tamanho_maxima
+
+        self._caixa = None  # (x0, y0, x1, y1) do último rosto no quadro inteiro
+        self._quadros_desde_redeteccao = 0
+
+        # Estatísticas
+        self.quadros_rastreados = 0
+        self.redeteccoes = 0
+        self.perdas_rastreamento = 0
+
+    def findFaceMesh(self, img, draw=False):
+        """
+        Mesma interface do cvzone: retorna (img, faces), com os pontos em coordenadas
+        do quadro inteiro. O parâmetro draw é ignorado (o detector nunca desenha).
+        """
+        if self._caixa is not None and self._quadros_desde_redeteccao < self.intervalo_redeteccao:
+            face = self._rastrear(img)
+            if face is not None:
+                self._quadros_desde_redeteccao += 1
+                self.quadros_rastreados += 1
+                return img, [face]
+            self.perdas_rastreamento += 1
+
+        return img, self._detectar_quadro_inteiro(img)
+
+    def reiniciar(self):
+        """Esquece o último rosto: o próximo quadro será analisado inteiro."""
+        self._caixa = None
+        self._quadros_desde_redeteccao = 0
+
+    def _detectar_quadro_inteiro(self, img):
+        self.redeteccoes += 1
+        self._quadros_desde_redeteccao = 0
+        _, faces = self.detector_completo.findFaceMesh(img, draw=False)
+        self._caixa = _caixa_dos_pontos(faces[0]) if faces else None
+        return faces
+
+    def _rastrear(self, img):
+        """Roda a malha facial no recorte. Retorna a face em coordenadas do quadro, ou None."""
+        altura_img, largura_img = img.shape[:2]
+        x0, y0, x1, y1 = self._area_recorte(largura_img, altura_img)
+        largura, altura = x1 - x0, y1 - y0
+        if largura <= 0 or altura <= 0:
+            return None
+
+        recorte = img[y0:y1, x0:x1]
+        maior_lado = max(largura, altura)
+        if maior_lado > self.lado_alvo:
+            escala = self.lado_alvo / maior_lado
+            recorte = cv2.resize(recorte, (max(1, round(largura * escala)), max(1, round(altura * escala))),
+                                 interpolation=cv2.INTER_AREA)
+
+        self.detector_recorte.findFaceMesh(recorte, draw=False)
+        resultados = self.detector_recorte.results
+        if not resultados.multi_face_landmarks:
+            return None
+
+        # Pontos normalizados (0-1) do recorte -> pixels do quadro inteiro.
+        # Arredonda como o cvzone faz no quadro inteiro, para o ratio sair igual.
+        face = [[int(x0 + ponto.x * largura), int(y0 + ponto.y * altura)]
+                for ponto in resultados.multi_face_landmarks[0].landmark]
+
+        caixa = _caixa_dos_pontos(face)
+        if not self._caixa_confiavel(caixa, (x0, y0, x1, y1), largura_img, altura_img):
+            return None
+
+        self._caixa = caixa
+        return face
+
+    def _area_recorte(self, largura_img, altura_img):
+        """Recorte quadrado em volta da última caixa do rosto, com margem, limitado ao quadro."""
+        x0, y0, x1, y1 = self._caixa
+        lado = max(x1 - x0, y1 - y0) * (1 + 2 * self.margem)
+        centro_x, centro_y = (x0 + x1) / 2, (y0 + y1) / 2
+        return (
+            max(0, int(centro_x - lado / 2)),
+            max(0, int(centro_y - lado / 2)),
+            min(largura_img, int(centro_x + lado / 2)),
+            min(altura_img, int(centro_y + lado / 2)),
+        )
+
+    def _caixa_confiavel(self, caixa, recorte, largura_img, altura_img):
+        """
+        O rastreamento é confiável se o rosto não encostou na borda do recorte
+        (a não ser que seja a borda do próprio quadro) e não mudou muito de tamanho.
+        """
+        x0, y0, x1, y1 = caixa
+        rx0, ry0, rx1, ry1 = recorte
+        if (x0 <= rx0 and rx0 > 0) or (y0 <= ry0 and ry0 > 0):
+            return False
+        if (x1 >= rx1 - 1 and rx1 < largura_img) or (y1 >= ry1 - 1 and ry1 < altura_img):
+            return False
+
+        tamanho_anterior = max(self._caixa[2] - self._caixa[0], self._caixa[3] - self._caixa[1])
+        tamanho_atual = max(x1 - x0, y1 - y0)
+        if tamanho_anterior <= 0:
+            return False
+        return abs(tamanho_atual - tamanho_anterior) / tamanho_anterior <= self.variacao_tamanho_maxima
+
+    def relatorio(self):
+        """Texto com a proporção de quadros rastreados e o número de reanálises."""
+        total = self.quadros_rastreados + self.redeteccoes
+        proporcao = self.quadros_rastreados / total * 100 if total else 0.0
+        return (
+            f"[Rastreamento] Quadros no recorte: {self.quadros_rastreados} ({proporcao:.0f}%) | "
+            f"Quadro inteiro: {self.redeteccoes} | Perdas de rastreamento: {self.perdas_rastreamento}"
+        )
+
+
+def _caixa_dos_pontos(face):
+    """(x0, y0, x1, y1) que envolve todos os pontos da face."""
+    xs = [ponto[0] for ponto in face]
+    ys = [ponto[1] for ponto in face]
+    return min(xs), min(ys), max(xs), max(ys)
@@ -0,0 +1,183 @@
+"""
+Replay de ratios gravados para varrer os parâmetros do alerta.
+
+Lê os CSVs por quadro gerados pelo processamento_offline.py (tempo_s, ratio_esq, ratio_dir)
+ou a telemetria gravada pelo detector ao vivo (output/telemetria.bin, uma sessão por fluxo,
+gravada com TELEMETRIA_HABILITADA no eyes_detector.py) e passa cada combinação de
+RATIO_THRESHOLD, TEMPO_MINIMO_OLHOS_FECHADOS e TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR pela
+MaquinaEstadosSonolencia, usando os timestamps gravados no lugar do relógio. Sem câmera e
+sem espera: meses de dados em minutos. Só a regra do fechamento longo é varrida; os alertas
+do monitor de fadiga (MONITOR_FADIGA, ver sinais_fadiga.py) não são reproduzidos.
+
+Uso:
+    python replay_ratios.py output/telemetria.bin --thresholds 20 23 26
+    python replay_ratios.py output/ --thresholds 20 23 26 --tempos-fechados 2 2.5 3 --tempos-abertos 2 3
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from maquina_estados import EventoAlertaEncerrado, EventoNotificacao, MaquinaEstadosSonolencia
+from telemetria import LeitorTelemetria
+
+PASTA_SAIDA_PADRAO = 'output'
+ARQUIVO_RESULTADO = 'varredura_parametros.csv'
+
+# Fluxos carregados no processo trabalhador (um por arquivo)
+_fluxos = None
+
+
+def carregar_fluxo(caminho):
+    """
+    Lê um CSV por quadro e retorna a lista de (tempo_s, ratio_esq, ratio_dir)
+    dos quadros com rosto detectado.
+    """
+    fluxo = []
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        for linha in csv.DictReader(arquivo):
+            if linha.get('rosto', '1') != '1' or not linha['ratio_esq']:
+                continue
+            fluxo.append((float(linha['tempo_s']), float(linha['ratio_esq']), float(linha['ratio_dir'])))
+    return fluxo
+
+
+def carregar_fluxos_telemetria(caminho):
+    """Lê um arquivo de telemetria e retorna um fluxo por sessão (só quadros com rosto)."""
+    leitor = LeitorTelemetria(caminho)
+    fluxos = []
+    for sessao in leitor.sessoes():
+        registros = leitor.sessao(sessao)
+        registros = registros[registros['rosto'] == 1]
+        fluxos.append(list(zip(registros['tempo'].tolist(), registros['ratio_esq'].tolist(),
+                               registros['ratio_dir'].tolist())))
+    return fluxos
+
+
+def listar_fluxos(caminhos):
+    """Expande diretórios nos CSVs por quadro (ignora os arquivos de resumo)."""
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            arquivos.extend(
+                os.path.join(caminho, nome) for nome in sorted(os.listdir(caminho))
+                if nome.endswith('.csv') and nome not in ('resumo_offline.csv', ARQUIVO_RESULTADO)
+            )
+        else:
+            arquivos.append(caminho)
+    return arquivos
+
+
+def _inicializar_trabalhador(arquivos):
+    global _fluxos
+    _fluxos = []
+    for arquivo in arquivos:
+        if arquivo.endswith('.bin'):
+            _fluxos.extend(carregar_fluxos_telemetria(arquivo))
+        else:
+            _fluxos.append(carregar_fluxo(arquivo))
+
+
+def simular(parametros, fluxos=None):
+    """
+    Roda uma combinação de parâmetros sobre todos os fluxos.
+
+    Args:
+        parametros: (ratio_threshold, tempo_minimo_olhos_fechados, tempo_olhos_abertos_para_desligar)
+        fluxos: Lista de fluxos (padrão: os carregados no processo trabalhador)
+
+    Returns:
+        Dicionário com os parâmetros e as estatísticas de alerta
+    """
+    fluxos = _fluxos if fluxos is None else fluxos
+    threshold, tempo_fechados, tempo_abertos = parametros
+
+    alertas = 0
+    duracoes = []
+    segundos_de_dados = 0.0
+    quadros = 0
+    for fluxo in fluxos:
+        if not fluxo:
+            continue
+        # Cada gravação começa do zero, como o detector ao ser ligado
+        maquina = MaquinaEstadosSonolencia(threshold, tempo_fechados, tempo_abertos)
+        for evento in maquina.consumir(fluxo):
+            if isinstance(evento, EventoNotificacao):
+                alertas += 1
+            elif isinstance(evento, EventoAlertaEncerrado):
+                duracoes.append(evento.duracao)
+        segundos_de_dados += fluxo[-1][0] - fluxo[0][0]
+        quadros += len(fluxo)
+
+    horas = segundos_de_dados / 3600
+    return {
+        'ratio_threshold': threshold,
+        'tempo_minimo_olhos_fechados': tempo_fechados,
+        'tempo_olhos_abertos_para_desligar': tempo_abertos,
+        'alertas': alertas,
+        'alertas_por_hora': alertas / horas if horas > 0 else 0.0,
+        'duracao_media_alerta_s': sum(duracoes) / len(duracoes) if duracoes else 0.0,
+        'horas_de_dados': horas,
+        'quadros': quadros,
+    }
+
+
+def varrer(arquivos, thresholds, tempos_fechados, tempos_abertos, processos=None):
+    """
+    Roda todas as combinações de parâmetros em paralelo.
+
+    Returns:
+        (lista de resultados, tempo total em segundos)
+    """
+    combinacoes = list(itertools.product(thresholds, tempos_fechados, tempos_abertos))
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_trabalhador,
+                             initargs=(arquivos,)) as executor:
+        resultados = list(executor.map(simular, combinacoes))
+    return resultados, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varre os parâmetros do alerta sobre ratios gravados.")
+    parser.add_argument('caminhos', nargs='+', help="CSVs por quadro, diretórios com eles ou telemetria (.bin)")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[23], help="Valores de RATIO_THRESHOLD")
+    parser.add_argument('--tempos-fechados', type=float, nargs='+', default=[3.0],
+                        help="Valores de TEMPO_MINIMO_OLHOS_FECHADOS")
+    parser.add_argument('--tempos-abertos', type=float, nargs='+', default=[3.0],
+                        help="Valores de TEMPO_OLHOS_ABERTOS_PARA_DESLIGAR")
+    parser.add_argument('--processos', type=int, default=None, help="Número de processos (padrão: todos os núcleos)")
+    parser.add_argument('--saida', default=PASTA_SAIDA_PADRAO, help="Pasta do CSV de resultado")
+    args = parser.parse_args()
+
+    arquivos = listar_fluxos(args.caminhos)
+    if not arquivos:
+        print("Nenhum CSV encontrado.")
+        return
+
+    resultados, duracao = varrer(arquivos, args.thresholds, args.tempos_fechados, args.tempos_abertos,
+                                 args.processos)
+
+    os.makedirs(args.saida, exist_ok=True)
+    caminho = os.path.join(args.saida, ARQUIVO_RESULTADO)
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(resultados[0]))
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+    print(f"{'threshold':>10}{'fechados':>10}{'abertos':>10}{'alertas':>10}{'alertas/h':>12}")
+    for r in resultados:
+        print(f"{r['ratio_threshold']:>10g}{r['tempo_minimo_olhos_fechados']:>10g}"
+              f"{r['tempo_olhos_abertos_para_desligar']:>10g}{r['alertas']:>10}{r['alertas_por_hora']:>12.2f}")
+
+    quadros = sum(r['quadros'] for r in resultados)
+    segundos_simulados = sum(r['horas_de_dados'] for r in resultados) * 3600
+    print(f"\n{len(resultados)} combinações | {quadros} quadros em {duracao:.1f}s "
+          f"({quadros / duracao:.0f} quadros/s, {segundos_simulados / duracao:.0f}x o tempo real)")
+    print(f"Resultado gravado em {caminho}")
+
+
+if __name__ == "__main__":
+    main()
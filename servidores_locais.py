@@ -0,0 +1,146 @@
+"""
+Servidores locais que fazem o papel da API do Telegram e de um servidor SMTP, para testar
+as notificações sem internet e sem credenciais reais.
+
+Os dois guardam o que receberam e podem simular uma queda de conexão (fora_do_ar = True):
+o HTTP responde 503 e o SMTP recusa a conexão com 421.
+
+Uso:
+    telegram = ServidorHttpLocal().iniciar()
+    smtp = ServidorSmtpLocal().iniciar()
+    notificador.configurar_telegram('token', 'chat', url_api=telegram.url)
+    notificador.configurar_email('127.0.0.1', smtp.porta, 'de@local', '', 'para@local', usar_tls=False)
+"""
+
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServidorHttpLocal:
+    """Imita os endpoints da API de bots do Telegram (sendMessage, sendPhoto, sendVideo)."""
+
+    def __init__(self, host='127.0.0.1', porta=0):
+        """
+        Args:
+            host: Interface de rede
+            porta: Porta HTTP (0 = escolhida pelo sistema)
+        """
+        self.fora_do_ar = False
+        self.mensagens = []  # Corpos JSON recebidos com sucesso
+        self.caminhos = []  # Caminho de cada POST aceito (ex: /bot<token>/sendPhoto)
+        # Método da API -> código de erro simulado (ex: {'sendPhoto': 400} recusa as fotos)
+        self.erros_por_metodo = {}
+        self.requisicoes = 0
+        servidor_local = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Mantém a conexão aberta, como a API real
+
+            def _responder(self, codigo, corpo):
+                dados = json.dumps(corpo).encode('utf-8')
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                tamanho = int(self.headers.get('Content-Length', 0))
+                corpo = self.rfile.read(tamanho)
+                servidor_local.requisicoes += 1
+                if servidor_local.fora_do_ar:
+                    self._responder(503, {'ok': False, 'description': 'fora do ar (simulado)'})
+                    return
+                codigo = servidor_local.erros_por_metodo.get(self.path.rsplit('/', 1)[-1])
+                if codigo:
+                    self._responder(codigo, {'ok': False, 'description': f'erro {codigo} (simulado)'})
+                    return
+                servidor_local.caminhos.append(self.path)
+                try:
+                    servidor_local.mensagens.append(json.loads(corpo or b'{}'))
+                except ValueError:
+                    servidor_local.mensagens.append({'bruto': corpo.decode('utf-8', errors='replace')})
+                self._responder(200, {'ok': True})
+
+            def log_message(self, formato, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, porta), _Handler)
+        self._servidor.daemon_threads = True
+        self.porta = self._servidor.server_address[1]
+        self.url = f"http://{host}:{self.porta}"
+
+    def iniciar(self):
+        threading.Thread(target=self._servidor.serve_forever, name="http-local", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+class ServidorSmtpLocal:
+    """SMTP mínimo (EHLO, AUTH, MAIL, RCPT, DATA, NOOP, QUIT) que guarda as mensagens recebidas."""
+
+    def __init__(self, host='127.0.0.1', porta=0):
+        self.fora_do_ar = False
+        self.mensagens = []  # Conteúdo bruto (bytes) de cada DATA
+        self.comandos = []  # Verbo de cada comando recebido (ex: 'EHLO', 'NOOP', 'DATA')
+        self.conexoes = 0
+        servidor_local = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def _responder(self, linha):
+                self.wfile.write(linha.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                servidor_local.conexoes += 1
+                if servidor_local.fora_do_ar:
+                    self._responder('421 fora do ar (simulado)')
+                    return
+                self._responder('220 smtp local')
+                while True:
+                    linha = self.rfile.readline()
+                    if not linha or servidor_local.fora_do_ar:
+                        return
+                    comando = linha.decode('ascii', errors='ignore').strip().upper()
+                    servidor_local.comandos.append(comando.split(' ', 1)[0])
+                    if comando.startswith(('EHLO', 'HELO')):
+                        self._responder('250-smtp local')
+                        self._responder('250 AUTH PLAIN LOGIN')
+                    elif comando.startswith('AUTH'):
+                        self._responder('235 autenticado')
+                    elif comando == 'DATA':
+                        self._responder('354 termine com .')
+                        corpo = []
+                        while True:
+                            linha = self.rfile.readline()
+                            if linha in (b'.\r\n', b''):
+                                break
+                            corpo.append(linha)
+                        servidor_local.mensagens.append(b''.join(corpo))
+                        self._responder('250 recebida')
+                    elif comando == 'QUIT':
+                        self._responder('221 tchau')
+                        return
+                    else:
+                        self._responder('250 ok')
+
+        self._servidor = socketserver.ThreadingTCPServer((host, porta), _Handler)
+        self._servidor.daemon_threads = True
+        self.porta = self._servidor.server_address[1]
+
+    def iniciar(self):
+        threading.Thread(target=self._servidor.serve_forever, name="smtp-local", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
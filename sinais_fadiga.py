@@ -0,0 +1,323 @@
+"""
+Sinais de fadiga acumulados ao longo do tempo, além do fechamento longo dos olhos.
+
+- PERCLOS: fração do tempo com os olhos fechados no último minuto
+- Piscadas: quantas por minuto e quanto duram (piscadas lentas indicam sonolência)
+- Bocejos: boca muito aberta (MAR, mesma fórmula do ratio dos olhos) por mais de 1,5s
+
+Os ratios dos olhos e o MAR saem da mesma malha facial numa única operação vetorizada
+(CalculadoraSinais). Cada sinal fica numa janela de tempo com memória fixa (JanelaTemporal):
+o custo por quadro é constante, não importa o tamanho da janela. Os sinais são ponderados
+pelo tempo de cada quadro, então PERCLOS e bocejos continuam corretos mesmo quando a taxa
+adaptativa pula quadros.
+
+A pontuação combinada (0 a 1) pode acionar o alerta antes da regra dos 3s de olhos fechados
+(ver MaquinaEstadosSonolencia.processar(alerta_fadiga=...)).
+"""
+
+import numpy as np
+
+from instrumentacao import REGISTRO
+from metricas_olhos import CONFIGURACOES, DOIS_PONTOS
+
+_PONTUACAO = REGISTRO.medidor('fadiga_pontuacao', 'Pontuação combinada de fadiga (0 a 1)')
+_PERCLOS = REGISTRO.medidor('fadiga_perclos', 'Fração do último minuto com os olhos fechados')
+_ALERTAS_FADIGA = REGISTRO.contador('fadiga_alertas_total', 'Alertas acionados pela pontuação de fadiga')
+
+# Boca (lábios internos): três pares verticais e os cantos
+PONTOS_BOCA = {'verticais': [(82, 87), (13, 14), (312, 317)], 'horizontal': (78, 308)}
+
+# Faixas usadas para normalizar cada sinal (valor -> 0 no início da faixa, 1 no fim)
+FAIXA_PERCLOS = (0.05, 0.20)
+FAIXA_DURACAO_PISCADA = (0.15, 0.40)  # segundos
+FAIXA_PISCADAS_POR_MINUTO = (20.0, 35.0)
+FAIXA_BOCEJOS = (0.0, 3.0)  # bocejos na janela de bocejos
+
+# Peso de cada sinal na pontuação combinada
+PESOS_SINAIS = {'perclos': 0.5, 'duracao_piscada': 0.2, 'bocejos': 0.2, 'piscadas_por_minuto': 0.1}
+
+
+class CalculadoraSinais:
+    """
+    Ratio dos dois olhos e MAR da boca numa única passada vetorizada pela malha.
+    Os ratios dos olhos são idênticos aos da CalculadoraEAR com a mesma configuração.
+    """
+
+    def __init__(self, configuracao=DOIS_PONTOS, boca=PONTOS_BOCA):
+        """
+        Args:
+            configuracao: Configuração dos olhos (ver metricas_olhos.py) ou o nome dela
+            boca: Pares verticais e horizontal da boca
+        """
+        if isinstance(configuracao, str):
+            configuracao = CONFIGURACOES[configuracao]
+        regioes = [configuracao['esquerdo'], configuracao['direito'], boca]
+
+        # Todos os pares verticais juntos, com o número da região de cada um
+        self._vertical_a = np.array([a for regiao in regioes for a, _ in regiao['verticais']])
+        self._vertical_b = np.array([b for regiao in regioes for _, b in regiao['verticais']])
+        self._regiao_vertical = np.array([i for i, regiao in enumerate(regioes) for _ in regiao['verticais']])
+        self._pares_por_regiao = np.bincount(self._regiao_vertical).astype(np.float64)
+        self._horizontal_a = np.array([regiao['horizontal'][0] for regiao in regioes])
+        self._horizontal_b = np.array([regiao['horizontal'][1] for regiao in regioes])
+
+    def calcular(self, landmarks):
+        """
+        Args:
+            landmarks: Pontos da malha de um quadro (lista do findFaceMesh ou array 468 x 2)
+
+        Returns:
+            (ratio_esq, ratio_dir, mar); NaN onde a largura é zero
+        """
+        pontos = np.asarray(landmarks, dtype=np.float64)
+        verticais = np.linalg.norm(pontos[self._vertical_a] - pontos[self._vertical_b], axis=-1)
+        horizontais = np.linalg.norm(pontos[self._horizontal_a] - pontos[self._horizontal_b], axis=-1)
+        abertura = np.bincount(self._regiao_vertical, weights=verticais) / self._pares_por_regiao
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(horizontais > 0, abertura / horizontais * 100, np.nan)
+        return float(ratios[0]), float(ratios[1]), float(ratios[2])
+
+
+class JanelaTemporal:
+    """
+    Soma ponderada dos últimos `duracao` segundos, dividida em `fatias` de tempo fixas.
+    Memória fixa; cada amostra custa O(1) (cada fatia é esvaziada uma vez por volta).
+    A janela cobre entre `duracao - duracao/fatias` e `duracao` segundos.
+    """
+
+    def __init__(self, duracao, fatias=60):
+        self.duracao = duracao
+        self.fatias = fatias
+        self.largura_fatia = duracao / fatias
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._somas = [0.0] * self.fatias
+        self._pesos = [0.0] * self.fatias
+        self.soma = 0.0
+        self.peso = 0.0
+        self._fatia_atual = None
+        self._inicio = None
+
+    def _avancar(self, tempo):
+        fatia = int(tempo // self.largura_fatia)
+        if self._fatia_atual is None:
+            self._fatia_atual = fatia
+            self._inicio = tempo
+            return
+        if fatia <= self._fatia_atual:
+            return
+        # Esvazia as fatias que saíram da janela (no máximo uma volta completa)
+        for numero in range(self._fatia_atual + 1, min(fatia, self._fatia_atual + self.fatias) + 1):
+            indice = numero % self.fatias
+            self.soma -= self._somas[indice]
+            self.peso -= self._pesos[indice]
+            self._somas[indice] = self._pesos[indice] = 0.0
+            if indice == 0:
+                # Uma vez por volta, recalcula os totais para não acumular erro de arredondamento
+                self.soma = sum(self._somas)
+                self.peso = sum(self._pesos)
+        self._fatia_atual = fatia
+
+    def adicionar(self, tempo, valor, peso=1.0):
+        """Soma valor * peso (e o peso) na fatia do instante `tempo`."""
+        self._avancar(tempo)
+        indice = self._fatia_atual % self.fatias
+        self._somas[indice] += valor * peso
+        self._pesos[indice] += peso
+        self.soma += valor * peso
+        self.peso += peso
+
+    def media(self, tempo=None):
+        """Média ponderada dentro da janela, ou None se está vazia."""
+        if tempo is not None:
+            self._avancar(tempo)
+        return self.soma / self.peso if self.peso > 0 else None
+
+    def cobertura(self, tempo):
+        """Quantos segundos de dados a janela já tem (até `duracao`)."""
+        return 0.0 if self._inicio is None else min(tempo - self._inicio, self.duracao)
+
+
+def _normalizar(valor, faixa):
+    inicio, fim = faixa
+    return min(1.0, max(0.0, (valor - inicio) / (fim - inicio)))
+
+
+class MonitorFadiga:
+    """Acompanha PERCLOS, piscadas e bocejos e combina tudo numa pontuação de 0 a 1."""
+
+    def __init__(self, ratio_threshold=23, limiar_bocejo=50.0, duracao_minima_bocejo=1.5,
+                 duracao_maxima_piscada=1.0, janela_olhos=60.0, janela_bocejos=300.0,
+                 limiar_alerta=0.5, limiar_rearme=0.35, cobertura_minima=30.0, intervalo_maximo=0.5):
+        """
+        Args:
+            ratio_threshold: Ratio abaixo do qual o olho é considerado fechado (o mesmo do timer)
+            limiar_bocejo: MAR acima do qual a boca está aberta num bocejo
+            duracao_minima_bocejo: Segundos com a boca aberta para contar um bocejo
+            duracao_maxima_piscada: Fechamentos mais longos que isso não contam como piscada
+                (continuam contando no PERCLOS)
+            janela_olhos: Janela (segundos) do PERCLOS e das piscadas
+            janela_bocejos: Janela (segundos) dos bocejos
+            limiar_alerta: Pontuação que aciona o alerta de fadiga
+            limiar_rearme: Pontuação abaixo da qual um novo alerta de fadiga pode acontecer
+            cobertura_minima: Segundos de dados antes de calcular a pontuação
+            intervalo_maximo: Maior peso (segundos) de um quadro: lacunas maiores (sem rosto,
+                câmera travada) não contam como olhos abertos ou fechados
+        """
+        self.ratio_threshold = ratio_threshold
+        self.limiar_bocejo = limiar_bocejo
+        self.duracao_minima_bocejo = duracao_minima_bocejo
+        self.duracao_maxima_piscada = duracao_maxima_piscada
+        self.limiar_alerta = limiar_alerta
+        self.limiar_rearme = limiar_rearme
+        self.cobertura_minima = cobertura_minima
+        self.intervalo_maximo = intervalo_maximo
+
+        self._perclos = JanelaTemporal(janela_olhos)
+        self._piscadas = JanelaTemporal(janela_olhos)  # Uma amostra por piscada, valor = duração
+        self._bocejos = JanelaTemporal(janela_bocejos)  # Uma amostra por bocejo
+        self.reiniciar()
+
+    def reiniciar(self):
+        for janela in (self._perclos, self._piscadas, self._bocejos):
+            janela.reiniciar()
+        self._ultimo_tempo = None
+        self._inicio_fechamento = None
+        self._inicio_boca_aberta = None
+        self._bocejo_contado = False
+        self._armado = True
+        self.pontuacao = None
+        self.alerta_disparado = False
+        self.alertas = 0
+
+    def atualizar(self, tempo, ratio_esq, ratio_dir, mar=None):
+        """
+        Processa um quadro com rosto.
+
+        Returns:
+            Pontuação de fadiga (0 a 1), ou None enquanto não há dados suficientes.
+            alerta_disparado fica True no quadro em que a pontuação cruza limiar_alerta.
+        """
+        intervalo = 0.0 if self._ultimo_tempo is None else min(tempo - self._ultimo_tempo, self.intervalo_maximo)
+        self._ultimo_tempo = tempo
+
+        # Olhos: PERCLOS ponderado pelo tempo de cada quadro e piscadas pelas transições
+        fechados = ratio_esq < self.ratio_threshold and ratio_dir < self.ratio_threshold
+        if intervalo > 0:
+            self._perclos.adicionar(tempo, 1.0 if fechados else 0.0, intervalo)
+        if fechados:
+            if self._inicio_fechamento is None:
+                self._inicio_fechamento = tempo
+        elif self._inicio_fechamento is not None:
+            duracao = tempo - self._inicio_fechamento
+            if duracao <= self.duracao_maxima_piscada:
+                self._piscadas.adicionar(tempo, duracao)
+            self._inicio_fechamento = None
+
+        # Boca: um bocejo por abertura longa
+        if mar is not None and mar > self.limiar_bocejo:
+            if self._inicio_boca_aberta is None:
+                self._inicio_boca_aberta = tempo
+            elif not self._bocejo_contado and tempo - self._inicio_boca_aberta >= self.duracao_minima_bocejo:
+                self._bocejos.adicionar(tempo, 1.0)
+                self._bocejo_contado = True
+        else:
+            self._inicio_boca_aberta = None
+            self._bocejo_contado = False
+
+        self.pontuacao = self._pontuar(tempo)
+        self.alerta_disparado = False
+        if self.pontuacao is not None:
+            _PONTUACAO.definir(self.pontuacao)
+            if self._armado and self.pontuacao >= self.limiar_alerta:
+                self._armado = False
+                self.alerta_disparado = True
+                self.alertas += 1
+                _ALERTAS_FADIGA.inc()
+            elif self.pontuacao < self.limiar_rearme:
+                self._armado = True
+        return self.pontuacao
+
+    def sinais(self, tempo=None):
+        """Valores atuais de cada sinal (None onde ainda não há dados)."""
+        tempo = self._ultimo_tempo if tempo is None else tempo
+        if tempo is None:
+            return {'perclos': None, 'piscadas_por_minuto': None, 'duracao_piscada': None, 'bocejos': 0}
+        cobertura = self._piscadas.cobertura(tempo)
+        self._piscadas.media(tempo)  # Descarta as piscadas que saíram da janela
+        self._bocejos.media(tempo)
+        return {
+            'perclos': self._perclos.media(tempo),
+            'piscadas_por_minuto': self._piscadas.peso / cobertura * 60 if cobertura > 0 else None,
+            'duracao_piscada': self._piscadas.media(),
+            'bocejos': int(round(self._bocejos.soma)),
+        }
+
+    def _pontuar(self, tempo):
+        if self._perclos.cobertura(tempo) < self.cobertura_minima:
+            return None
+        sinais = self.sinais(tempo)
+        _PERCLOS.definir(sinais['perclos'] or 0.0)
+        componentes = {
+            'perclos': _normalizar(sinais['perclos'] or 0.0, FAIXA_PERCLOS),
+            'duracao_piscada': _normalizar(sinais['duracao_piscada'] or 0.0, FAIXA_DURACAO_PISCADA),
+            'piscadas_por_minuto': _normalizar(sinais['piscadas_por_minuto'] or 0.0, FAIXA_PISCADAS_POR_MINUTO),
+            'bocejos': _normalizar(sinais['bocejos'], FAIXA_BOCEJOS),
+        }
+        return sum(PESOS_SINAIS[nome] * valor for nome, valor in componentes.items())
+
+    def resumo(self):
+        """Texto curto com os sinais atuais (usado na notificação do alerta de fadiga)."""
+        sinais = self.sinais()
+
+        def _formatar(valor, formato):
+            return '-' if valor is None else format(valor, formato)
+
+        return (
+            f"PERCLOS: {_formatar(sinais['perclos'], '.0%')} | "
+            f"Piscadas: {_formatar(sinais['piscadas_por_minuto'], '.0f')}/min "
+            f"({_formatar(sinais['duracao_piscada'], '.2f')}s) | "
+            f"Bocejos: {sinais['bocejos']} | Pontuação: {_formatar(self.pontuacao, '.2f')}"
+        )
+
+
+if __name__ == "__main__":
+    # Simulação: 2 minutos atentos, depois piscadas lentas, PERCLOS alto e bocejos
+    import time
+
+    from benchmark import FPS_SINTETICO, malha_sintetica
+
+    rng = np.random.default_rng(0)
+    quadros = int(FPS_SINTETICO * 240)
+    ratios = rng.normal(32, 2.0, size=(quadros, 2))
+    meio = quadros // 2
+    for inicio in range(0, meio, int(FPS_SINTETICO * 3.5)):
+        ratios[inicio:inicio + 4] = 12  # Piscadas normais (~0,13s)
+    for inicio in range(meio, quadros, int(FPS_SINTETICO * 2)):
+        ratios[inicio:inicio + 12] = 12  # Piscadas lentas (~0,4s), PERCLOS ~20%
+    malhas = malha_sintetica(ratios)
+    # Bocejos: boca aberta por 3s, três vezes na segunda metade
+    boca_aberta = np.zeros(quadros, dtype=bool)
+    for inicio in (meio + 300, meio + 1500, meio + 2700):
+        boca_aberta[inicio:inicio + int(FPS_SINTETICO * 3)] = True
+    malhas[:, 78] = (300.0, 320.0)
+    malhas[:, 308] = (360.0, 320.0)
+    for cima, baixo in PONTOS_BOCA['verticais']:
+        malhas[:, cima] = (330.0, 318.0)
+        malhas[:, baixo] = np.where(boca_aberta[:, None], (330.0, 360.0), (330.0, 322.0))
+
+    calculadora = CalculadoraSinais()
+    monitor = MonitorFadiga()
+    inicio = time.perf_counter()
+    for indice in range(quadros):
+        tempo = indice / FPS_SINTETICO
+        ratio_esq, ratio_dir, mar = calculadora.calcular(malhas[indice])
+        monitor.atualizar(tempo, ratio_esq, ratio_dir, mar)
+        if monitor.alerta_disparado:
+            print(f"⚠ Alerta de fadiga em {tempo:.0f}s -> {monitor.resumo()}")
+        if indice and indice % int(FPS_SINTETICO * 30) == 0:
+            print(f"{tempo:>4.0f}s  {monitor.resumo()}")
+    duracao = time.perf_counter() - inicio
+    print(f"{quadros} quadros em {duracao:.2f}s ({duracao / quadros * 1e6:.0f}µs por quadro, "
+          f"com o cálculo dos ratios e do MAR)")
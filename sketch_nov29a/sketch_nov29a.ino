@@ -5,12 +5,26 @@ const int pinoBuzzer = 10;
 
 // --- VARIÁVEIS DE CONTROLE ---
 bool modoAlerta = false;      // false = Seguro, true = Perigo
+bool modoFailSafe = false;    // true = Python parou de falar com a placa (alarme de segurança)
+bool linkAtivo = false;       // true depois do primeiro 'A'/'F' do Python; 'D' desarma
 int estadoPisca = LOW;        // Controla se o LED/Buzzer está ligado ou desligado no ciclo de piscar
 
 // --- VARIÁVEIS DE TEMPO (MILLIS) ---
 unsigned long tempoAnterior = 0;
 const long intervaloPisca = 200; // Velocidade do pisca (200ms = rápido e urgente)
 
+// O Python manda um heartbeat ('H') a cada ~1s quando o estado não muda, só enquanto a
+// detecção está decidindo. Se ficar esse tempo sem receber nada, a placa assume que a
+// detecção caiu ou travou e dispara o alarme. No encerramento normal o Python manda 'D'.
+unsigned long ultimoComando = 0;
+const unsigned long timeoutHeartbeat = 3000;
+
+void aplicarEstadoSeguro() {
+  digitalWrite(pinoLedVerde, HIGH);
+  digitalWrite(pinoLedVermelho, LOW);
+  noTone(pinoBuzzer);
+}
+
 void setup() {
   // Inicia a comunicação serial com a mesma velocidade do Python (9600)
   Serial.begin(9600);
@@ -20,9 +34,10 @@ void setup() {
   pinMode(pinoBuzzer, OUTPUT);
 
   // Estado inicial: Sistema ligado, LED Verde aceso
-  digitalWrite(pinoLedVerde, HIGH);
-  digitalWrite(pinoLedVermelho, LOW);
-  noTone(pinoBuzzer);
+  aplicarEstadoSeguro();
+
+  // Avisa o Python que a placa terminou de iniciar (ele espera isso em vez de um tempo fixo)
+  Serial.write('R');
 }
 
 void loop() {
@@ -30,24 +45,57 @@ void loop() {
   if (Serial.available() > 0) {
     char comando = Serial.read();
 
-    if (comando == 'A') { 
+    if (comando == 'A' || comando == 'F' || comando == 'H') {
+      ultimoComando = millis();
+      // Só um estado decidido arma o fail-safe (o 'H' de sondagem na conexão não arma)
+      if (comando != 'H') {
+        linkAtivo = true;
+      }
+
+      // Qualquer comando válido prova que o link voltou
+      if (modoFailSafe) {
+        modoFailSafe = false;
+        if (!modoAlerta) {
+          aplicarEstadoSeguro();
+        }
+      }
+    }
+
+    if (comando == 'A') {
       // --- COMANDO: OLHO ABERTO (SEGURO) ---
       modoAlerta = false;
-      
+
       // Reseta imediatamente para o estado seguro
-      digitalWrite(pinoLedVerde, HIGH);
-      digitalWrite(pinoLedVermelho, LOW);
-      noTone(pinoBuzzer);
-    } 
+      aplicarEstadoSeguro();
+    }
     else if (comando == 'F') {
       // --- COMANDO: OLHO FECHADO (PERIGO) ---
       modoAlerta = true;
       digitalWrite(pinoLedVerde, LOW); // Apaga o verde imediatamente
     }
+    else if (comando == 'D') {
+      // --- COMANDO: DESARMAR (PROGRAMA ENCERRADO NORMALMENTE) ---
+      // Sem alarme e sem fail-safe até o próximo 'A'/'F'
+      modoAlerta = false;
+      modoFailSafe = false;
+      linkAtivo = false;
+      aplicarEstadoSeguro();
+    }
+
+    // ACK: devolve o comando em minúsculo ('a', 'f', 'h', 'd') para o Python medir a latência
+    if (comando == 'A' || comando == 'F' || comando == 'H' || comando == 'D') {
+      Serial.write(comando + ('a' - 'A'));
+    }
   }
 
-  // 2. EXECUTAR O ALARME (Se estiver no modo alerta)
-  if (modoAlerta == true) {
+  // 2. FAIL-SAFE: sem heartbeat do Python por muito tempo, dispara o alarme
+  if (linkAtivo && !modoFailSafe && millis() - ultimoComando >= timeoutHeartbeat) {
+    modoFailSafe = true;
+    digitalWrite(pinoLedVerde, LOW);
+  }
+
+  // 3. EXECUTAR O ALARME (Se estiver no modo alerta ou em fail-safe)
+  if (modoAlerta == true || modoFailSafe == true) {
     unsigned long tempoAtual = millis();
 
     // Lógica não-bloqueante para piscar o LED e apitar
@@ -55,7 +103,7 @@ void loop() {
       tempoAnterior = tempoAtual;
 
       // Inverte o estado (Se está LOW vira HIGH, se está HIGH vira LOW)
-      estadoPisca = !estadoPisca; 
+      estadoPisca = !estadoPisca;
 
       // Aplica ao LED Vermelho
       digitalWrite(pinoLedVermelho, estadoPisca);
@@ -68,4 +116,4 @@ void loop() {
       }
     }
   }
-}
\ No newline at end of file
+}
@@ -0,0 +1,132 @@
+"""
+Taxa de inferência adaptativa do Detector de Sonolência.
+
+Enquanto os dois olhos estão claramente abertos (ratio bem acima do RATIO_THRESHOLD),
+rodar a malha facial em todo quadro é CPU e calor desperdiçados. O agendador vai
+espaçando as inferências nesse caso e volta à taxa máxima assim que o ratio se
+aproxima do threshold, o rosto some, o timer de olhos fechados começa ou o alerta
+está ativo.
+
+Garantia: o intervalo entre inferências nunca passa de `atraso_maximo`. Se os olhos
+fecharem logo depois de uma inferência, o fechamento é visto no máximo `atraso_maximo`
+segundos depois; daí em diante tudo roda na taxa máxima. Então o alerta de
+TEMPO_MINIMO_OLHOS_FECHADOS atrasa no máximo `atraso_maximo` em relação à taxa cheia.
+"""
+
+from instrumentacao import REGISTRO
+
+_QUADROS_PULADOS = REGISTRO.contador('detector_quadros_pulados_total',
+                                     'Quadros sem inferência (olhos claramente abertos)')
+_INTERVALO = REGISTRO.medidor('detector_intervalo_inferencia_segundos',
+                              'Intervalo atual entre inferências (0 = taxa máxima)')
+
+
+class AgendadorInferencia:
+    """Decide, a cada quadro, se a malha facial deve rodar."""
+
+    def __init__(self, ratio_threshold=23, margem_ratio=0.25, atraso_maximo=0.25, intervalo_inicial=0.05):
+        """
+        Args:
+            ratio_threshold: Mesmo threshold usado pela máquina de estados
+            margem_ratio: Fração acima do threshold a partir da qual o olho é "claramente aberto"
+                (0.25 com threshold 23 = ratio acima de 28.75 nos dois olhos)
+            atraso_maximo: Maior intervalo (em segundos) entre inferências; é o atraso
+                máximo que a redução de taxa pode causar na detecção do fechamento
+            intervalo_inicial: Primeiro intervalo usado ao reduzir a taxa; dobra a cada
+                inferência seguida com os olhos claramente abertos, até atraso_maximo
+        """
+        self.ratio_aberto = ratio_threshold * (1 + margem_ratio)
+        self.atraso_maximo = atraso_maximo
+        self.intervalo_inicial = min(intervalo_inicial, atraso_maximo)
+
+        self.intervalo = 0.0  # 0 = taxa máxima (todo quadro)
+        self._ultima_inferencia = None
+        self._ultimo_quadro = None
+        self._periodo_quadro = 0.0  # Intervalo entre os dois últimos quadros da câmera
+
+        # --- ESTATÍSTICAS ---
+        self.quadros_inferidos = 0
+        self.quadros_pulados = 0
+        self.tempo_inferencia = 0.0  # Soma do tempo gasto nas inferências (segundos)
+        self.maior_intervalo = 0.0  # Maior intervalo observado entre duas inferências
+        _INTERVALO.definir(0.0)
+
+    def deve_inferir(self, tempo):
+        """
+        Args:
+            tempo: Momento da captura do quadro, em segundos
+
+        Returns:
+            True se a malha facial deve rodar neste quadro
+        """
+        if self._ultimo_quadro is not None:
+            self._periodo_quadro = tempo - self._ultimo_quadro
+        self._ultimo_quadro = tempo
+
+        # Só pula se o próximo quadro ainda chegar dentro do intervalo; assim o espaço
+        # entre duas inferências não passa do intervalo (e nunca de atraso_maximo)
+        if (self._ultima_inferencia is not None
+                and tempo - self._ultima_inferencia + self._periodo_quadro <= self.intervalo):
+            self.quadros_pulados += 1
+            _QUADROS_PULADOS.inc()
+            return False
+        if self._ultima_inferencia is not None:
+            self.maior_intervalo = max(self.maior_intervalo, tempo - self._ultima_inferencia)
+        self._ultima_inferencia = tempo
+        return True
+
+    def registrar_inferencia(self, duracao):
+        """Soma o tempo de uma inferência (usado na estimativa de CPU economizada)."""
+        self.quadros_inferidos += 1
+        self.tempo_inferencia += duracao
+
+    def atualizar(self, ratio_esq, ratio_dir, timer):
+        """
+        Ajusta o intervalo depois da decisão de um quadro inferido.
+
+        Args:
+            ratio_esq: Ratio do olho esquerdo (None se nenhum rosto foi encontrado)
+            ratio_dir: Ratio do olho direito (None se nenhum rosto foi encontrado)
+            timer: MaquinaEstadosSonolencia já atualizada com este quadro
+        """
+        claramente_aberto = (
+            ratio_esq is not None
+            and min(ratio_esq, ratio_dir) >= self.ratio_aberto
+            and timer.tempo_inicio_olhos_fechados is None
+            and not timer.alerta_sonolencia_acionado
+        )
+        if not claramente_aberto:
+            # Volta na hora para a taxa máxima
+            self.intervalo = 0.0
+        else:
+            self.intervalo = min(self.atraso_maximo, self.intervalo * 2 or self.intervalo_inicial)
+        _INTERVALO.definir(self.intervalo)
+
+    def reiniciar(self):
+        """Volta à taxa máxima (ex: depois de perder o rastreamento ou trocar de câmera)."""
+        self.intervalo = 0.0
+        _INTERVALO.definir(0.0)
+        self._ultima_inferencia = None
+        self._ultimo_quadro = None
+
+    def cpu_economizada(self):
+        """
+        Estimativa da fração do tempo de inferência economizada: quadros pulados vezes
+        o tempo médio de uma inferência, sobre o total que seria gasto na taxa máxima.
+        """
+        if not self.quadros_inferidos:
+            return 0.0
+        economizado = self.quadros_pulados * (self.tempo_inferencia / self.quadros_inferidos)
+        return economizado / (economizado + self.tempo_inferencia)
+
+    def relatorio(self):
+        """Texto com quadros pulados e a CPU média economizada."""
+        total = self.quadros_inferidos + self.quadros_pulados
+        media_ms = self.tempo_inferencia / self.quadros_inferidos * 1000 if self.quadros_inferidos else 0.0
+        return (
+            f"[Taxa adaptativa] Inferidos: {self.quadros_inferidos} | Pulados: {self.quadros_pulados} "
+            f"({self.quadros_pulados / total * 100 if total else 0:.1f}%) | "
+            f"Inferência média: {media_ms:.1f}ms\n"
+            f"[Taxa adaptativa] CPU de inferência economizada (média): {self.cpu_economizada() * 100:.1f}% | "
+            f"Maior intervalo: {self.maior_intervalo * 1000:.0f}ms (limite {self.atraso_maximo * 1000:.0f}ms)"
+        )
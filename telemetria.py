@@ -0,0 +1,223 @@
+"""
+Gravador de telemetria binária do Detector de Sonolência.
+
+Cada quadro vira um registro de tamanho fixo (32 bytes) num arquivo circular pré-alocado
+e mapeado em memória (output/telemetria.bin). Gravar um registro é só copiar alguns
+números para a memória mapeada: sem objetos novos por quadro e sem fsync no loop.
+O sistema operacional descarrega as páginas para o disco em lotes; um flush periódico
+opcional roda numa thread de fundo. Quando o arquivo enche, os registros mais antigos
+são sobrescritos, então o uso de disco (e o desgaste do cartão SD) é fixo.
+
+O leitor devolve os registros como arrays NumPy que apontam direto para o arquivo (sem cópia).
+
+Uso:
+    leitor = LeitorTelemetria('output/telemetria.bin')
+    registros = leitor.sessao(leitor.sessoes()[-1])
+    registros['ratio_esq'], registros['tempo'], registros['estado']
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from maquina_estados import ESTADO_ALERTA_ATIVO, ESTADO_AMBOS_FECHADOS, ESTADO_OLHOS_ABERTOS
+
+ASSINATURA = b'SONOTEL1'
+VERSAO = 1
+TAMANHO_CABECALHO = 64
+
+CABECALHO = np.dtype([
+    ('assinatura', 'S8'),
+    ('versao', '<u4'),
+    ('tamanho_registro', '<u4'),
+    ('capacidade', '<u8'),
+    ('total', '<u8'),  # Registros já gravados desde a criação do arquivo
+    ('reservado', 'u1', 32),
+])
+
+REGISTRO = np.dtype([
+    ('tempo', '<f8'),  # time.time() do quadro
+    ('sequencia', '<u8'),  # Número do registro desde a criação do arquivo
+    ('sessao', '<u4'),  # Identificador da execução do detector (hora de início)
+    ('ratio_esq', '<f4'),
+    ('ratio_dir', '<f4'),
+    ('estado', 'u1'),  # Ver CODIGOS_ESTADO
+    ('comando', 'u1'),  # ord('A'), ord('F') ou 0 (sem rosto)
+    ('rosto', 'u1'),
+    ('alerta', 'u1'),
+])
+
+# Códigos gravados no campo 'estado'
+ESTADO_SEM_ROSTO = 0
+CODIGOS_ESTADO = {
+    ESTADO_OLHOS_ABERTOS: 1,
+    ESTADO_AMBOS_FECHADOS: 2,
+    ESTADO_ALERTA_ATIVO: 3,
+}
+
+# 3 dias a 30 quadros/s (~250MB)
+CAPACIDADE_PADRAO = 30 * 60 * 60 * 24 * 3
+
+
+class GravadorTelemetria:
+    """Grava um registro por quadro no arquivo circular mapeado em memória."""
+
+    def __init__(self, caminho='output/telemetria.bin', capacidade=CAPACIDADE_PADRAO, intervalo_flush=60.0):
+        """
+        Args:
+            caminho: Arquivo circular (reaproveitado entre execuções se a capacidade for a mesma)
+            capacidade: Quantidade máxima de registros guardados
+            intervalo_flush: Intervalo (em segundos) do flush em segundo plano; 0 = só o do sistema operacional
+        """
+        self.caminho = caminho
+        self.capacidade = capacidade
+        self.sessao = int(time.time())
+
+        _preparar_arquivo(caminho, capacidade)
+        self._cabecalho = np.memmap(caminho, dtype=CABECALHO, mode='r+', offset=0, shape=(1,))
+        self._registros = np.memmap(caminho, dtype=REGISTRO, mode='r+', offset=TAMANHO_CABECALHO,
+                                    shape=(capacidade,))
+        self._total = int(self._cabecalho['total'][0])
+
+        # Visões por campo (evitam montar uma tupla por quadro)
+        self._campo_tempo = self._registros['tempo']
+        self._campo_sequencia = self._registros['sequencia']
+        self._campo_sessao = self._registros['sessao']
+        self._campo_ratio_esq = self._registros['ratio_esq']
+        self._campo_ratio_dir = self._registros['ratio_dir']
+        self._campo_estado = self._registros['estado']
+        self._campo_comando = self._registros['comando']
+        self._campo_rosto = self._registros['rosto']
+        self._campo_alerta = self._registros['alerta']
+        self._campo_total = self._cabecalho['total']
+
+        self._parar = threading.Event()
+        self._thread_flush = None
+        if intervalo_flush:
+            self._thread_flush = threading.Thread(target=self._loop_flush, args=(intervalo_flush,),
+                                                  name="telemetria-flush", daemon=True)
+            self._thread_flush.start()
+
+    def gravar(self, tempo, ratio_esq, ratio_dir, estado, comando, alerta):
+        """Grava um quadro com rosto. estado é o texto do estado; comando é 'A' ou 'F'."""
+        posicao = self._total % self.capacidade
+        self._campo_tempo[posicao] = tempo
+        self._campo_sequencia[posicao] = self._total
+        self._campo_sessao[posicao] = self.sessao
+        self._campo_ratio_esq[posicao] = ratio_esq
+        self._campo_ratio_dir[posicao] = ratio_dir
+        self._campo_estado[posicao] = CODIGOS_ESTADO[estado]
+        self._campo_comando[posicao] = ord(comando)
+        self._campo_rosto[posicao] = 1
+        self._campo_alerta[posicao] = alerta
+        self._confirmar()
+
+    def gravar_sem_rosto(self, tempo, alerta):
+        """Grava um quadro em que nenhum rosto foi encontrado."""
+        posicao = self._total % self.capacidade
+        self._campo_tempo[posicao] = tempo
+        self._campo_sequencia[posicao] = self._total
+        self._campo_sessao[posicao] = self.sessao
+        self._campo_ratio_esq[posicao] = np.nan
+        self._campo_ratio_dir[posicao] = np.nan
+        self._campo_estado[posicao] = ESTADO_SEM_ROSTO
+        self._campo_comando[posicao] = 0
+        self._campo_rosto[posicao] = 0
+        self._campo_alerta[posicao] = alerta
+        self._confirmar()
+
+    def _confirmar(self):
+        # O contador do cabeçalho só avança depois do registro completo
+        self._total += 1
+        self._campo_total[0] = self._total
+
+    def _loop_flush(self, intervalo):
+        while not self._parar.wait(intervalo):
+            self._registros.flush()
+            self._cabecalho.flush()
+
+    def fechar(self):
+        """Para o flush periódico e descarrega o que falta para o disco."""
+        self._parar.set()
+        if self._thread_flush is not None:
+            self._thread_flush.join(timeout=5)
+        self._registros.flush()
+        self._cabecalho.flush()
+
+
+def _preparar_arquivo(caminho, capacidade):
+    """Cria (ou recria, se incompatível) o arquivo circular com o espaço todo reservado."""
+    tamanho = TAMANHO_CABECALHO + capacidade * REGISTRO.itemsize
+    if os.path.exists(caminho) and os.path.getsize(caminho) == tamanho:
+        cabecalho = np.fromfile(caminho, dtype=CABECALHO, count=1)[0]
+        if (cabecalho['assinatura'] == ASSINATURA and cabecalho['versao'] == VERSAO
+                and cabecalho['tamanho_registro'] == REGISTRO.itemsize and cabecalho['capacidade'] == capacidade):
+            return
+
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    with open(caminho, 'wb') as arquivo:
+        # Reserva o espaço de verdade (sem arquivo esparso) para não falhar com o disco cheio depois
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(arquivo.fileno(), 0, tamanho)
+        else:
+            arquivo.truncate(tamanho)
+        cabecalho = np.zeros(1, dtype=CABECALHO)
+        cabecalho['assinatura'] = ASSINATURA
+        cabecalho['versao'] = VERSAO
+        cabecalho['tamanho_registro'] = REGISTRO.itemsize
+        cabecalho['capacidade'] = capacidade
+        arquivo.seek(0)
+        arquivo.write(cabecalho.tobytes())
+
+
+class LeitorTelemetria:
+    """Lê o arquivo circular como arrays NumPy mapeados em memória (somente leitura, sem cópia)."""
+
+    def __init__(self, caminho='output/telemetria.bin'):
+        cabecalho = np.fromfile(caminho, dtype=CABECALHO, count=1)[0]
+        if cabecalho['assinatura'] != ASSINATURA or cabecalho['versao'] != VERSAO:
+            raise ValueError(f"'{caminho}' não é um arquivo de telemetria compatível")
+        self.capacidade = int(cabecalho['capacidade'])
+        self.total = int(cabecalho['total'])
+        self._registros = np.memmap(caminho, dtype=REGISTRO, mode='r', offset=TAMANHO_CABECALHO,
+                                    shape=(self.capacidade,))
+
+    def partes(self):
+        """
+        Registros válidos em ordem cronológica, como uma ou duas visões do arquivo
+        (duas quando o anel já deu a volta).
+        """
+        if self.total <= self.capacidade:
+            return [self._registros[:self.total]]
+        inicio = self.total % self.capacidade
+        return [self._registros[inicio:], self._registros[:inicio]]
+
+    def sessoes(self):
+        """Identificadores das sessões presentes no arquivo, em ordem cronológica."""
+        vistas = []
+        for parte in self.partes():
+            for sessao in np.unique(parte['sessao']):
+                if sessao not in vistas:
+                    vistas.append(int(sessao))
+        return sorted(vistas)
+
+    def sessao(self, sessao):
+        """
+        Registros de uma sessão. Sem cópia quando a sessão está contígua no arquivo;
+        se ela atravessa o fim do anel, as duas partes são concatenadas (cópia).
+        """
+        pedacos = []
+        for parte in self.partes():
+            indices = np.flatnonzero(parte['sessao'] == sessao)
+            if indices.size:
+                pedacos.append(parte[indices[0]:indices[-1] + 1])
+        if not pedacos:
+            return self._registros[:0]
+        return pedacos[0] if len(pedacos) == 1 else np.concatenate(pedacos)
+
+    def tudo(self):
+        """Todos os registros válidos em ordem cronológica (cópia se o anel já deu a volta)."""
+        partes = self.partes()
+        return partes[0] if len(partes) == 1 else np.concatenate(partes)
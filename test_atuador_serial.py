@@ -0,0 +1,271 @@
+"""
+Testes do AtuadorSerial contra um Arduino simulado do outro lado de um pty.
+
+O lado escravo do pty é lido e escrito direto pelo descritor (PortaPty), sem pyserial.
+"""
+
+import os
+import pty
+import select
+import threading
+import time
+import tty
+
+import pytest
+
+from atuador_serial import AtuadorSerial
+
+
+class PortaPty:
+    """Lado escravo de um pty com a interface usada pelo atuador (read/write/flush/close)."""
+
+    def __init__(self, fd, timeout=0.1):
+        self.fd = fd
+        self.timeout = timeout
+        self.caida = False  # Simula o cabo USB desconectado
+
+    def _verificar(self):
+        if self.caida:
+            raise OSError("porta desconectada (simulado)")
+
+    def read(self, tamanho=1):
+        self._verificar()
+        prontos, _, _ = select.select([self.fd], [], [], self.timeout)
+        self._verificar()
+        return os.read(self.fd, tamanho) if prontos else b''
+
+    def write(self, dados):
+        self._verificar()
+        return os.write(self.fd, dados)
+
+    def flush(self):
+        self._verificar()
+
+    def close(self):
+        # O descritor só é fechado no fim do teste: assim o número não é reaproveitado
+        # por uma reconexão enquanto a thread de leitura ainda o consulta
+        self.caida = True
+
+
+class ArduinoSimulado:
+    """Imita o sketch no lado mestre: manda 'R' depois do boot e responde os comandos com ack."""
+
+    def __init__(self, fd_mestre, atraso_pronto=0.1, acks='AFHD', atraso_ack=0.0):
+        self.fd = fd_mestre
+        self.acks = acks
+        self.atraso_ack = atraso_ack
+        self.recebidos = []  # (caractere, time.monotonic())
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, args=(atraso_pronto,), daemon=True)
+        self._thread.start()
+
+    def _executar(self, atraso_pronto):
+        time.sleep(atraso_pronto)
+        os.write(self.fd, b'R')
+        while not self._parar.is_set():
+            prontos, _, _ = select.select([self.fd], [], [], 0.05)
+            if not prontos:
+                continue
+            try:
+                dados = os.read(self.fd, 1)
+            except OSError:
+                break
+            caractere = dados.decode()
+            self.recebidos.append((caractere, time.monotonic()))
+            if caractere in self.acks:
+                time.sleep(self.atraso_ack)
+                os.write(self.fd, caractere.lower().encode())
+
+    def comandos(self):
+        return [caractere for caractere, _ in self.recebidos if caractere != 'H']
+
+    def instantes_heartbeat(self):
+        return [instante for caractere, instante in self.recebidos if caractere == 'H']
+
+    def reiniciar(self):
+        """A placa reiniciou sozinha: manda 'R' de novo no meio da sessão."""
+        os.write(self.fd, b'R')
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join(timeout=1)
+
+
+@pytest.fixture
+def bancada():
+    """Cria pares pty + Arduino simulado; cada abertura da porta usa um par novo."""
+    descritores = []
+    arduinos = []
+    portas = []
+
+    def conectar(**opcoes_arduino):
+        fd_mestre, fd_escravo = pty.openpty()
+        tty.setraw(fd_escravo)
+        descritores.extend([fd_mestre, fd_escravo])
+        arduinos.append(ArduinoSimulado(fd_mestre, **opcoes_arduino))
+        portas.append(PortaPty(fd_escravo))
+        return portas[-1]
+
+    yield conectar, arduinos, portas
+
+    for arduino in arduinos:
+        arduino.parar()
+    for fd in descritores:
+        os.close(fd)
+
+
+def _esperar(condicao, timeout=3.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _novo_atuador(conectar, opcoes_arduino=None, **kwargs):
+    atuador = AtuadorSerial('pty', abrir_porta=lambda: conectar(**(opcoes_arduino or {})), **kwargs)
+    atuador.iniciar()
+    assert atuador.aguardar_conexao(timeout=3)
+    return atuador
+
+
+def test_escreve_so_as_mudancas_de_estado(bancada):
+    conectar, arduinos, _ = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=60)
+    for comando in ['A', 'A', 'F', 'F', 'F', 'A', 'A']:
+        atuador.definir_estado(comando)
+        time.sleep(0.1)
+    assert _esperar(lambda: len(arduinos[0].comandos()) >= 3)
+    time.sleep(0.2)
+    atuador.close(desarmar=False)
+
+    assert arduinos[0].comandos() == ['A', 'F', 'A']
+    assert atuador.comandos_enviados == 3
+
+
+def test_comando_invalido_e_recusado(bancada):
+    conectar, _, _ = bancada
+    atuador = _novo_atuador(conectar)
+    with pytest.raises(ValueError):
+        atuador.definir_estado('X')
+    atuador.close()
+
+
+def test_heartbeat_periodico_enquanto_ha_atividade(bancada):
+    conectar, arduinos, _ = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=0.2, validade_atividade=0.5)
+    atuador.definir_estado('A')
+    fim = time.monotonic() + 1.3
+    while time.monotonic() < fim:
+        atuador.registrar_atividade()
+        time.sleep(0.05)
+    atuador.close(desarmar=False)
+
+    instantes = arduinos[0].instantes_heartbeat()
+    assert 4 <= len(instantes) <= 8
+    intervalos = [b - a for a, b in zip(instantes, instantes[1:])]
+    assert min(intervalos) >= 0.15
+    assert max(intervalos) <= 0.45
+
+
+def test_heartbeat_suspenso_sem_decisoes_da_deteccao(bancada):
+    conectar, arduinos, _ = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=0.1, validade_atividade=0.3)
+    atuador.definir_estado('A')
+    ultima_atividade = time.monotonic()
+    time.sleep(1.2)  # A detecção "travou"
+
+    instantes = arduinos[0].instantes_heartbeat()
+    assert instantes, "deveria haver heartbeats enquanto a atividade era recente"
+    assert instantes[-1] - ultima_atividade <= 0.3 + 0.1 + 0.15
+    assert atuador._heartbeat_suspenso
+
+    # A detecção voltou: os heartbeats voltam junto
+    quantidade = len(instantes)
+    fim = time.monotonic() + 0.5
+    while time.monotonic() < fim:
+        atuador.registrar_atividade()
+        time.sleep(0.05)
+    atuador.close(desarmar=False)
+    assert len(arduinos[0].instantes_heartbeat()) > quantidade
+
+
+def test_sem_atividade_nenhum_heartbeat_antes_da_primeira_decisao(bancada):
+    conectar, arduinos, _ = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=0.1)
+    time.sleep(0.6)
+    atuador.close(desarmar=False)
+    assert arduinos[0].recebidos == []
+
+
+def test_espera_o_sinal_de_pronto_em_vez_de_tempo_fixo(bancada):
+    conectar, _, _ = bancada
+    atuador = _novo_atuador(conectar, opcoes_arduino={'atraso_pronto': 0.4, 'acks': ''}, espera_reset=5.0)
+    assert 0.3 <= atuador.tempo_ate_pronto < 1.5
+    atuador.close()
+
+
+def test_reenvia_o_estado_quando_a_placa_reinicia(bancada):
+    conectar, arduinos, _ = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=60)
+    atuador.definir_estado('F')
+    assert _esperar(lambda: arduinos[0].comandos() == ['F'])
+    arduinos[0].reiniciar()
+    assert _esperar(lambda: arduinos[0].comandos() == ['F', 'F'])
+    atuador.close(desarmar=False)
+
+
+def test_desarma_ao_fechar(bancada):
+    conectar, arduinos, _ = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=60)
+    atuador.definir_estado('F')
+    assert _esperar(lambda: arduinos[0].comandos() == ['F'])
+    atuador.close()
+    assert _esperar(lambda: arduinos[0].comandos() == ['F', 'D'])
+    assert not atuador.conectado
+
+
+def test_fechar_sem_desarmar_nao_manda_d(bancada):
+    conectar, arduinos, _ = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=60)
+    atuador.definir_estado('A')
+    assert _esperar(lambda: arduinos[0].comandos() == ['A'])
+    atuador.close(desarmar=False)
+    time.sleep(0.2)
+    assert arduinos[0].comandos() == ['A']
+
+
+def test_reconecta_e_reenvia_o_estado_depois_que_a_porta_cai(bancada):
+    conectar, arduinos, portas = bancada
+    atuador = _novo_atuador(conectar, intervalo_heartbeat=0.1, intervalo_reconexao=0.1)
+    atuador.definir_estado('F')
+    assert _esperar(lambda: arduinos[0].comandos() == ['F'])
+
+    portas[0].caida = True  # Cabo desconectado
+    fim = time.monotonic() + 3
+    while time.monotonic() < fim and atuador.conexoes < 2:
+        atuador.registrar_atividade()  # O heartbeat é a escrita que percebe a queda
+        time.sleep(0.05)
+    assert atuador.conexoes == 2
+    assert _esperar(lambda: arduinos[1].comandos() == ['F'])
+    atuador.close(desarmar=False)
+
+
+def test_ack_casa_com_o_comando_enviado(bancada):
+    conectar, _, _ = bancada
+    # A placa só confirma A/F, com 50ms de atraso: heartbeats sem ack são descartados da fila
+    atuador = _novo_atuador(conectar, opcoes_arduino={'acks': 'AF', 'atraso_ack': 0.05},
+                            intervalo_heartbeat=0.05)
+    for comando in ['A', 'F', 'A']:
+        atuador.definir_estado(comando)
+        fim = time.monotonic() + 0.3
+        while time.monotonic() < fim:
+            atuador.registrar_atividade()
+            time.sleep(0.02)
+    atuador.close(desarmar=False)
+
+    assert atuador.heartbeats_enviados > 0
+    assert len(atuador.latencias_ack) == 3
+    assert min(atuador.latencias_ack) >= 0.04
+    assert 'Ida e volta: média' in atuador.relatorio()
@@ -0,0 +1,102 @@
+"""
+Testes do cronômetro de estágios e do portão de regressão do benchmark.
+"""
+
+import numpy as np
+import pytest
+
+from benchmark import Cronometro, comparar_com_baseline
+
+
+def _estagio(p95_ms, vazao_por_s):
+    return {'amostras': 10, 'media_ms': p95_ms, 'p50_ms': p95_ms, 'p95_ms': p95_ms, 'p99_ms': p95_ms,
+            'max_ms': p95_ms, 'vazao_por_s': vazao_por_s}
+
+
+def _resultado(estagios, pico_memoria_mb=100.0):
+    return {'estagios': estagios, 'pico_memoria_mb': pico_memoria_mb}
+
+
+def test_resumo_calcula_percentis_e_vazao():
+    cronometro = Cronometro()
+    for ms in range(1, 101):
+        cronometro.registrar('timer', ms * 1_000_000)
+    resumo = cronometro.resumo()['timer']
+
+    assert resumo['amostras'] == 100
+    assert resumo['media_ms'] == pytest.approx(50.5)
+    assert resumo['p50_ms'] == pytest.approx(50.5)
+    assert resumo['p95_ms'] == pytest.approx(np.percentile(np.arange(1, 101), 95))
+    assert resumo['max_ms'] == pytest.approx(100.0)
+    # 100 itens em 5,05s
+    assert resumo['vazao_por_s'] == pytest.approx(100 / 5.05)
+
+
+def test_resumo_conta_os_itens_de_cada_medida():
+    cronometro = Cronometro()
+    with cronometro.medir('ratio_lote', itens=500):
+        pass
+    with cronometro.medir('total'):
+        pass
+    cronometro.registrar('total', 2_000_000)
+    resumo = cronometro.resumo()
+
+    assert resumo['ratio_lote']['amostras'] == 1
+    assert cronometro.itens['ratio_lote'] == 500
+    assert resumo['total']['amostras'] == 2
+    assert cronometro.itens['total'] == 2
+    assert resumo['total']['vazao_por_s'] is not None
+
+
+def test_resumo_sem_tempo_medido_nao_tem_vazao():
+    cronometro = Cronometro()
+    cronometro.registrar('captura', 0)
+    assert cronometro.resumo()['captura']['vazao_por_s'] is None
+
+
+def test_sem_regressao_dentro_da_tolerancia():
+    baseline = _resultado({'total': _estagio(10.0, 1000.0)})
+    atual = _resultado({'total': _estagio(12.0, 800.0)}, pico_memoria_mb=120.0)
+    assert comparar_com_baseline(atual, baseline, tolerancia=0.25) == []
+
+
+def test_regressao_de_p95_vazao_e_memoria():
+    baseline = _resultado({'total': _estagio(10.0, 1000.0)})
+    atual = _resultado({'total': _estagio(13.0, 700.0)}, pico_memoria_mb=130.0)
+    regressoes = comparar_com_baseline(atual, baseline, tolerancia=0.25)
+
+    assert len(regressoes) == 3
+    assert regressoes[0].startswith('total: p95 13.000ms')
+    assert regressoes[1].startswith('total: vazão 700/s')
+    assert regressoes[2].startswith('memória: pico 130MB')
+
+
+def test_estagios_sem_baseline_ou_sem_vazao_sao_ignorados():
+    baseline = _resultado({'total': _estagio(10.0, None)})
+    atual = _resultado({'total': _estagio(10.0, 1.0), 'render': _estagio(999.0, 1.0)}, pico_memoria_mb=None)
+    assert comparar_com_baseline(atual, baseline, tolerancia=0.25) == []
+
+
+def test_rodar_video_mede_a_vazao_total(tmp_path):
+    cv2 = pytest.importorskip('cv2')
+    pytest.importorskip('cvzone')
+    from benchmark import rodar_video
+    from maquina_estados import MaquinaEstadosSonolencia
+    from metricas_olhos import CalculadoraEAR
+
+    caminho = str(tmp_path / 'ruido.avi')
+    escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*'MJPG'), 30, (64, 48))
+    for _ in range(5):
+        escritor.write(np.random.default_rng(0).integers(0, 255, (48, 64, 3), dtype=np.uint8))
+    escritor.release()
+
+    cronometro = Cronometro()
+    quadros, _ = rodar_video([caminho], cronometro, CalculadoraEAR(), MaquinaEstadosSonolencia(), None, None)
+    resumo = cronometro.resumo()
+
+    assert quadros == 5
+    assert cronometro.itens['total'] == 5
+    assert resumo['total']['vazao_por_s'] is not None
+    # Sem isso o portão de regressão ficaria desligado no modo vídeo
+    baseline = _resultado({'total': dict(resumo['total'], vazao_por_s=resumo['total']['vazao_por_s'] * 10)})
+    assert any('vazão' in texto for texto in comparar_com_baseline(_resultado(resumo), baseline, 0.25))
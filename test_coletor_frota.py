@@ -0,0 +1,127 @@
+"""
+Testes do coletor da frota: avisos de conexão agrupados, repasse fora do loop asyncio e
+leitura da configuração dos canais.
+"""
+
+import asyncio
+import threading
+import time
+
+from coletor_frota import MAXIMO_VEICULOS_NO_AVISO, ColetorFrota, carregar_notificador
+from protocolo_frota import evento_alerta, evento_heartbeat
+from servidores_locais import ServidorSmtpLocal
+
+
+class NotificadorFalso:
+    """Guarda as mensagens e a thread que as gravou; `atraso` imita a escrita em SQLite."""
+
+    def __init__(self, atraso=0.0):
+        self.atraso = atraso
+        self.mensagens = []
+        self.threads = []
+
+    def enviar_notificacao(self, mensagem):
+        time.sleep(self.atraso)
+        self.mensagens.append(mensagem)
+        self.threads.append(threading.current_thread().name)
+        return True
+
+
+def _heartbeats(coletor, veiculos, agora):
+    for veiculo in veiculos:
+        coletor.processar(evento_heartbeat(veiculo, agora), agora)
+
+
+def test_veiculos_sem_contato_geram_um_unico_aviso():
+    notificador = NotificadorFalso()
+    coletor = ColetorFrota(notificador, timeout_offline=10)
+    _heartbeats(coletor, ['V1', 'V2', 'V3'], agora=0.0)
+
+    coletor.verificar_offline(agora=20.0)
+    assert len(notificador.mensagens) == 1
+    assert '3 veículos' in notificador.mensagens[0]
+    assert all(f'<b>{veiculo}</b>' in notificador.mensagens[0] for veiculo in ('V1', 'V2', 'V3'))
+
+    # A volta também é avisada uma vez só, na verificação seguinte
+    _heartbeats(coletor, ['V1', 'V2'], agora=21.0)
+    assert len(notificador.mensagens) == 1
+    coletor.verificar_offline(agora=22.0)
+    assert len(notificador.mensagens) == 2
+    assert '2 veículos</b> voltaram' in notificador.mensagens[1]
+
+    coletor.verificar_offline(agora=23.0)
+    assert len(notificador.mensagens) == 2
+
+
+def test_um_unico_veiculo_mantem_o_aviso_individual():
+    notificador = NotificadorFalso()
+    coletor = ColetorFrota(notificador, timeout_offline=10)
+    _heartbeats(coletor, ['ABC1D23'], agora=0.0)
+    coletor.verificar_offline(agora=15.0)
+    _heartbeats(coletor, ['ABC1D23'], agora=16.0)
+    coletor.verificar_offline(agora=17.0)
+
+    assert notificador.mensagens == [
+        "📵 Veículo <b>ABC1D23</b> sem contato há 15s (desligado ou sem sinal).",
+        "✅ Veículo <b>ABC1D23</b> voltou a se comunicar com a central.",
+    ]
+
+
+def test_aviso_agrupado_limita_os_nomes():
+    notificador = NotificadorFalso()
+    coletor = ColetorFrota(notificador, timeout_offline=10)
+    veiculos = [f'V{numero:03d}' for numero in range(MAXIMO_VEICULOS_NO_AVISO + 5)]
+    _heartbeats(coletor, veiculos, agora=0.0)
+    coletor.verificar_offline(agora=20.0)
+
+    aviso, = notificador.mensagens
+    assert aviso.count('<b>V') == MAXIMO_VEICULOS_NO_AVISO
+    assert 'e mais 5' in aviso
+
+
+def test_repasse_nao_trava_o_loop_asyncio():
+    notificador = NotificadorFalso(atraso=0.2)
+    coletor = ColetorFrota(notificador)
+
+    async def receber_alertas():
+        inicio = time.perf_counter()
+        for numero in range(3):
+            coletor.processar(evento_alerta('V1', 1000.0 + numero, f'alerta {numero}'), time.time())
+        decorrido = time.perf_counter() - inicio
+        await asyncio.sleep(0)
+        return decorrido
+
+    decorrido = asyncio.run(receber_alertas())
+    coletor._executor_repasse.shutdown(wait=True)
+
+    assert decorrido < 0.1
+    # Gravados fora do loop, um de cada vez e na ordem de chegada
+    assert [mensagem.rsplit('\n', 1)[-1] for mensagem in notificador.mensagens] == \
+        ['alerta 0', 'alerta 1', 'alerta 2']
+    assert all(nome.startswith('coletor-repasse') for nome in notificador.threads)
+
+
+def test_configuracao_incompleta_desabilita_so_o_canal(tmp_path):
+    smtp = ServidorSmtpLocal().iniciar()
+    config = tmp_path / 'config_coletor.py'
+    config.write_text(
+        "TELEGRAM_HABILITADO = True\n"  # Sem token nem chat_id
+        "EMAIL_HABILITADO = True\n"
+        "EMAIL_SMTP_SERVER = '127.0.0.1'\n"
+        f"EMAIL_SMTP_PORT = {smtp.porta}\n"
+        "EMAIL_FROM = 'coletor@local'\n"
+        "EMAIL_TO = 'frota@local'\n"
+        "EMAIL_USAR_TLS = False\n"
+    )
+    notificador = carregar_notificador(str(config), caminho_caixa=str(tmp_path / 'caixa.db'))
+    try:
+        assert not notificador.telegram_enabled
+        assert notificador.email_enabled
+        assert notificador.email_senha == ''
+    finally:
+        notificador.encerrar(timeout=0)
+        smtp.parar()
+
+
+def test_sem_arquivo_de_configuracao(tmp_path):
+    assert carregar_notificador(str(tmp_path / 'nao_existe.py')) is None
@@ -0,0 +1,133 @@
+"""
+Testes do modo de várias câmeras usando vídeos gravados no lugar das câmeras.
+"""
+
+import queue
+import time
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from multicameras import Fluxo, MultiCameras  # noqa: E402
+
+QUADROS_POR_VIDEO = 12
+
+
+@pytest.fixture
+def videos(tmp_path):
+    """Grava vídeos curtos de ruído (sem rosto) e devolve os caminhos."""
+    def gravar(quantidade):
+        caminhos = []
+        gerador = np.random.default_rng(0)
+        for numero in range(quantidade):
+            caminho = str(tmp_path / f'cabine{numero}.avi')
+            escritor = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*'MJPG'), 30, (64, 48))
+            for _ in range(QUADROS_POR_VIDEO):
+                escritor.write(gerador.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+            escritor.release()
+            caminhos.append(caminho)
+        return caminhos
+    return gravar
+
+
+@pytest.fixture
+def criar_fluxos(videos):
+    """Fluxos lendo os vídeos o mais rápido possível; para as capturas no fim do teste."""
+    fluxos = []
+
+    def criar(quantidade):
+        for indice, caminho in enumerate(videos(quantidade)):
+            fluxos.append(Fluxo(indice, f'cabine{indice}', caminho, opcoes_captura={'tempo_real': False}))
+        return list(fluxos)
+
+    yield criar
+    for fluxo in fluxos:
+        if fluxo.quadros is not None:
+            fluxo.parar()
+
+
+def _consumir(fluxo, timeout=5.0):
+    """Faz o papel do trabalhador: retira e libera cada quadro pronto até o vídeo acabar."""
+    consumidos = 0
+    limite = time.monotonic() + timeout
+    while not fluxo.ocioso() and time.monotonic() < limite:
+        espaco = fluxo.retirar_pronto()
+        if espaco is None:
+            time.sleep(0.001)
+            continue
+        fluxo.liberar(espaco)
+        consumidos += 1
+    return consumidos
+
+
+def test_cada_fonte_fica_fixa_num_trabalhador(criar_fluxos):
+    fluxos = criar_fluxos(3)
+    sistema = MultiCameras(fluxos, trabalhadores=2)
+
+    assert [fluxo.trabalhador for fluxo in fluxos] == [0, 1, 0]
+    # Cada trabalhador só recebe (e só cria detectores para) as fontes fixas nele
+    assert set(sistema._memorias_do_trabalhador(0)) == {0, 2}
+    assert set(sistema._memorias_do_trabalhador(1)) == {1}
+
+
+def test_trabalhadores_limitados_ao_numero_de_fontes(criar_fluxos):
+    fluxos = criar_fluxos(2)
+    sistema = MultiCameras(fluxos, trabalhadores=4)
+    assert sistema.trabalhadores == 2
+    assert len(sistema._processos) == 2
+
+
+def test_despacho_so_usa_o_trabalhador_da_fonte(criar_fluxos):
+    fluxos = criar_fluxos(3)
+    sistema = MultiCameras(fluxos, trabalhadores=2)
+    sistema._livres = [0]  # O trabalhador 1 está ocupado
+
+    sistema._despachar()
+    fluxo, espaco = sistema._tarefas[0].get(timeout=2)
+    assert fluxo == 0 and espaco == 0
+    # A fonte 1 espera o trabalhador dela em vez de ir para outro
+    with pytest.raises(queue.Empty):
+        sistema._tarefas[1].get(timeout=0.2)
+    assert sistema._livres == []
+
+    # Rodízio: com o trabalhador 0 livre de novo, a vez é da fonte 2
+    fluxos[0].liberar(espaco)
+    sistema._livres = [0]
+    sistema._despachar()
+    assert sistema._tarefas[0].get(timeout=2)[0] == 2
+
+
+def test_video_sem_limite_espera_a_inferencia_sem_descartar(criar_fluxos):
+    fluxo, = criar_fluxos(1)
+    fluxo.iniciar()
+    time.sleep(0.3)
+    # O primeiro quadro ainda não foi retirado: a captura não decodifica mais nada
+    assert fluxo.quadros_capturados == 1
+
+    assert _consumir(fluxo) == QUADROS_POR_VIDEO
+    assert fluxo.quadros_capturados == QUADROS_POR_VIDEO
+    assert fluxo.quadros_descartados == 0
+
+
+def test_parar_libera_a_captura_que_espera_consumo(criar_fluxos):
+    fluxo, = criar_fluxos(1)
+    fluxo.iniciar()
+    time.sleep(0.1)
+    inicio = time.monotonic()
+    fluxo.parar()
+    assert time.monotonic() - inicio < 1.0
+    assert not fluxo._thread.is_alive()
+
+
+def test_videos_inferidos_por_todos_os_trabalhadores(criar_fluxos):
+    pytest.importorskip('cvzone')
+    fluxos = criar_fluxos(2)
+    sistema = MultiCameras(fluxos, trabalhadores=2)
+    sistema.executar(duracao=120)
+
+    assert [fluxo.quadros_inferidos for fluxo in fluxos] == [QUADROS_POR_VIDEO] * 2
+    assert sistema.inferencias_por_trabalhador == [QUADROS_POR_VIDEO] * 2
+    assert sistema.erros_inferencia == 0
+    assert all(fluxo.quadros_descartados == 0 for fluxo in fluxos)
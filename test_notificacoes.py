@@ -0,0 +1,189 @@
+"""
+Testes da caixa de saída e do NotificationManager com o SMTP local (servidores_locais.py).
+"""
+
+import email
+import time
+
+import pytest
+
+from caixa_saida import BaldeFichas, CaixaSaida
+from notifications import LIMITES_CANAIS, NotificationManager
+from servidores_locais import ServidorSmtpLocal
+
+
+@pytest.fixture
+def smtp():
+    servidor = ServidorSmtpLocal().iniciar()
+    yield servidor
+    servidor.parar()
+
+
+def _novo_gerenciador(caminho, smtp, parar_thread=False, **kwargs):
+    """Gerenciador com o canal Email apontando para o SMTP local."""
+    gerenciador = NotificationManager(cooldown_segundos=0, caminho_caixa=caminho, **kwargs)
+    if parar_thread:
+        # Sem a thread de fundo o teste decide quando cada entrega acontece
+        gerenciador._parar.set()
+        gerenciador._acordar.set()
+        gerenciador._thread_envio.join()
+    gerenciador.configurar_email('127.0.0.1', smtp.porta, 'detector@local', '', 'frota@local', usar_tls=False)
+    return gerenciador
+
+
+def _textos(servidor):
+    """Corpo HTML decodificado de cada email recebido pelo SMTP local."""
+    textos = []
+    for bruto in servidor.mensagens:
+        mensagem = email.message_from_bytes(bruto)
+        partes = [parte.get_payload(decode=True).decode() for parte in mensagem.walk()
+                  if parte.get_content_type() == 'text/html']
+        textos.append(''.join(partes))
+    return textos
+
+
+def test_caixa_saida_sobrevive_a_reinicio(tmp_path):
+    caminho = str(tmp_path / 'caixa.db')
+    caixa = CaixaSaida(caminho)
+    caixa.adicionar('alerta 1', ['Telegram', 'Email'], 100.0, ('foto.jpg', b'jpeg'),
+                    canais_anexo=('Telegram',))
+    caixa.adicionar('alerta 2', ['Email'], 200.0)
+    caixa.fechar()
+
+    caixa = CaixaSaida(caminho)
+    assert caixa.total_pendentes() == 3
+    assert [mensagem for _, _, mensagem in caixa.pendentes('Email')] == ['alerta 1', 'alerta 2']
+    (id_telegram, criada, _), = caixa.pendentes('Telegram')
+    assert criada == 100.0
+    assert caixa.anexo(id_telegram) == ('foto.jpg', b'jpeg')
+    # O anexo não é copiado para os canais que não o enviam
+    assert all(caixa.anexo(id_email) is None for id_email, _, _ in caixa.pendentes('Email'))
+
+    caixa.remover([id_telegram])
+    assert caixa.anexo(id_telegram) is None
+    assert caixa.total_pendentes() == 2
+    caixa.fechar()
+
+
+def test_alerta_nao_entregue_e_enviado_na_proxima_execucao(tmp_path, smtp):
+    caminho = str(tmp_path / 'caixa.db')
+    smtp.fora_do_ar = True
+    gerenciador = _novo_gerenciador(caminho, smtp)
+    assert gerenciador.enviar_notificacao('olhos fechados por 3s')
+    gerenciador.encerrar(timeout=0.5)
+    assert smtp.mensagens == []
+
+    # O programa foi desligado; na próxima execução o servidor voltou
+    smtp.fora_do_ar = False
+    gerenciador = _novo_gerenciador(caminho, smtp)
+    assert gerenciador.aguardar_envios(timeout=5)
+    gerenciador.encerrar()
+
+    textos = _textos(smtp)
+    assert len(textos) == 1
+    assert 'olhos fechados por 3s' in textos[0]
+    assert CaixaSaida(caminho).total_pendentes() == 0
+
+
+def test_balde_de_fichas_limita_a_taxa():
+    balde = BaldeFichas(taxa=10.0, capacidade=2)
+    assert balde.retirar() == 0.0
+    assert balde.retirar() == 0.0
+    espera = balde.retirar()
+    assert 0.05 < espera <= 0.1
+    time.sleep(espera)
+    assert balde.retirar() == 0.0
+
+    balde.devolver()  # Envio que falhou não gasta ficha
+    assert balde.retirar() == 0.0
+
+
+def test_cada_canal_tem_seu_proprio_limite(tmp_path, smtp):
+    gerenciador = _novo_gerenciador(str(tmp_path / 'caixa.db'), smtp, parar_thread=True)
+    for canal, (taxa, capacidade) in LIMITES_CANAIS.items():
+        assert (gerenciador._baldes[canal].taxa, gerenciador._baldes[canal].capacidade) == (taxa, capacidade)
+
+    # Email: rajada de até 2 envios, depois 1 a cada 10s
+    for numero in range(2):
+        gerenciador.enviar_notificacao(f'alerta {numero}')
+        assert gerenciador._descarregar_canal('Email', gerenciador._enviar_email) == 0.0
+    gerenciador.enviar_notificacao('alerta 2')
+    assert gerenciador._descarregar_canal('Email', gerenciador._enviar_email) > 5
+    assert len(smtp.mensagens) == 2
+    assert gerenciador._caixa.total_pendentes('Email') == 1
+    # O limite do Email não gasta fichas dos outros canais
+    assert gerenciador._baldes['Telegram'].retirar() == 0.0
+    gerenciador.encerrar(timeout=0)
+
+
+def test_backoff_exponencial_depois_de_falhas(tmp_path, smtp):
+    smtp.fora_do_ar = True
+    gerenciador = _novo_gerenciador(str(tmp_path / 'caixa.db'), smtp, parar_thread=True,
+                                    backoff_inicial=0.1, backoff_maximo=0.4)
+    gerenciador.enviar_notificacao('alerta')
+
+    atrasos = []
+    for _ in range(4):
+        gerenciador._proxima_tentativa['Email'] = 0.0
+        atrasos.append(gerenciador._descarregar_canal('Email', gerenciador._enviar_email))
+    assert atrasos == pytest.approx([0.1, 0.2, 0.4, 0.4])
+
+    # Antes do fim do backoff nem tenta conectar
+    conexoes = smtp.conexoes
+    assert 0 < gerenciador._descarregar_canal('Email', gerenciador._enviar_email) <= 0.4
+    assert smtp.conexoes == conexoes
+
+    # Depois de um envio bem-sucedido o backoff recomeça do início
+    smtp.fora_do_ar = False
+    gerenciador._proxima_tentativa['Email'] = 0.0
+    assert gerenciador._descarregar_canal('Email', gerenciador._enviar_email) == 0.0
+    assert gerenciador._falhas_seguidas['Email'] == 0
+    assert len(smtp.mensagens) == 1
+    gerenciador.encerrar(timeout=0)
+
+
+def test_alertas_acumulados_viram_um_unico_resumo(tmp_path, smtp):
+    smtp.fora_do_ar = True
+    gerenciador = _novo_gerenciador(str(tmp_path / 'caixa.db'), smtp, parar_thread=True)
+    for numero in range(3):
+        gerenciador.enviar_notificacao(f'alerta número {numero}')
+    gerenciador._descarregar_canal('Email', gerenciador._enviar_email)
+    assert gerenciador._caixa.total_pendentes('Email') == 3
+
+    # O sinal voltou: um único email com o resumo em vez de uma rajada
+    smtp.fora_do_ar = False
+    gerenciador._proxima_tentativa['Email'] = 0.0
+    assert gerenciador._descarregar_canal('Email', gerenciador._enviar_email) == 0.0
+    textos = _textos(smtp)
+    assert len(textos) == 1
+    assert '3 alertas de sonolência' in textos[0]
+    assert 'alerta número 2' in textos[0]
+    assert gerenciador._caixa.total_pendentes() == 0
+    gerenciador.encerrar(timeout=0)
+
+
+def test_conexao_smtp_reaproveitada_com_noop(tmp_path, smtp):
+    gerenciador = _novo_gerenciador(str(tmp_path / 'caixa.db'), smtp, parar_thread=True)
+    gerenciador._baldes['Email'] = BaldeFichas(taxa=100.0, capacidade=10)  # Aqui o limite não interessa
+    gerenciador.conectar_canais()
+    assert smtp.conexoes == 1
+
+    for numero in range(2):
+        gerenciador.enviar_notificacao(f'alerta {numero}')
+        assert gerenciador._descarregar_canal('Email', gerenciador._enviar_email) == 0.0
+    # Uma única conexão: antes de cada envio o NOOP confirma que ela continua viva
+    assert smtp.conexoes == 1
+    assert smtp.comandos.count('NOOP') == 2
+    assert smtp.comandos.count('EHLO') == 1
+    assert len(smtp.mensagens) == 2
+
+    # O servidor derrubou a conexão ociosa: o NOOP falha e o envio reconecta sozinho
+    smtp.fora_do_ar = True
+    gerenciador.enviar_notificacao('alerta com o servidor fora')
+    assert gerenciador._descarregar_canal('Email', gerenciador._enviar_email) > 0
+    smtp.fora_do_ar = False
+    gerenciador._proxima_tentativa['Email'] = 0.0
+    assert gerenciador._descarregar_canal('Email', gerenciador._enviar_email) == 0.0
+    assert len(smtp.mensagens) == 3
+    assert smtp.conexoes >= 3
+    gerenciador.encerrar(timeout=0)